@@ -10,13 +10,22 @@ from streamlit_folium import st_folium
 from datetime import datetime
 import sys
 import os
+import hashlib
+import time
 
 # Agregar directorio src al path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from data_loader import DataLoader
 from route_optimizer import RouteOptimizer
-from config import STREAMLIT_CONFIG, TEMPLATE_INFO, DEFAULT_CONFIG, OPTIMIZATION_TYPES, DISTANCE_METHODS, GEOCODING_METHODS
+from parallel_solver import solve_by_depot, solve_portfolio, solve_all_objectives, solve_regions, regions_to_split
+from solve_monitor import SolveMonitor
+from job_executor import JobExecutor, QueueFullError
+from progress import BufferSink, StreamlitSink, ThrottledSink
+from road_network import road_network_signature
+from calibration import DetourCalibration, load_calibration
+from cache import MemoryLRUCache, SolutionCache
+from config import STREAMLIT_CONFIG, TEMPLATE_INFO, DEFAULT_CONFIG, CALCULATION_CONFIG, OPTIMIZATION_TYPES, DISTANCE_METHODS, GEOCODING_METHODS, CACHE_CONFIG, SOLVER_MODES, DECOMPOSITION_CONFIG, SOLVE_MONITOR_CONFIG, ERROR_MESSAGES, ROAD_NETWORK_CONFIG, GOOGLE_DIRECTIONS_CONFIG, CALIBRATION_CONFIG
 
 # Configurar página
 st.set_page_config(**STREAMLIT_CONFIG)
@@ -29,6 +38,41 @@ if 'optimizer' not in st.session_state:
 if 'solution' not in st.session_state:
     st.session_state.solution = None
 
+
+
+def huella_coordenadas(loader) -> str:
+    """Huella (SHA-256) de las coordenadas de orígenes y destinos, que es lo único que estima Google"""
+    digest = hashlib.sha256()
+    for df in (loader.origenes, loader.destinos):
+        coordenadas = df[['latitud', 'longitud']].astype(float)
+        digest.update(pd.util.hash_pandas_object(coordenadas, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+@st.cache_data(ttl=CACHE_CONFIG['estimacion_google']['ttl_s'],
+               max_entries=CACHE_CONFIG['estimacion_google']['max_entradas'], show_spinner=False)
+def estimar_requests_google(_loader, huella: str, config, distance_method: str, considerar_trafico: bool,
+                            hora_salida_rutas, modelo_trafico: str) -> dict:
+    """
+    Estimación de requests y costo de Google, calculada una vez por entrada
+
+    La clave es la huella de las coordenadas más los parámetros de consulta,
+    así que los reruns de Streamlit no vuelven a consultar la caché de
+    distancias. Se invalida al terminar una optimización (ver más abajo),
+    que puede haber agregado pares a la caché.
+    """
+    return RouteOptimizer(
+        _loader.origenes,
+        _loader.destinos,
+        _loader.flota,
+        config,
+        distance_method=distance_method,
+        considerar_trafico=considerar_trafico,
+        hora_salida_rutas=hora_salida_rutas,
+        modelo_trafico=modelo_trafico
+    ).estimate_google_requests()
+
+
 # Título principal
 st.title("🚚 RutaFácil")
 st.markdown("### Planificador inteligente de rutas")
@@ -143,18 +187,84 @@ with st.sidebar:
                     else:
                         st.session_state.modelo_trafico = 'best_guess'
 
+            # Consultar solo pares cercanos (el resto se estima con línea recta × desvío)
+            pares_cercanos = st.checkbox(
+                "📍 Consultar solo pares cercanos",
+                key='google_pares_cercanos',
+                help="Pide a Google solo los trayectos entre cada destino y sus vecinos más cercanos, y los del depósito. "
+                     "Los trayectos lejanos se estiman con línea recta × "
+                     f"{GOOGLE_DIRECTIONS_CONFIG['factor_desvio']}. Reduce mucho el costo en días grandes"
+            )
+            if pares_cercanos:
+                st.slider("Vecinos consultados por destino", min_value=5, max_value=50, value=15, key='google_vecinos_k')
+
             # Calcular costo estimado
-            num_locations_estimate = 20  # Estimado por defecto
-            num_requests = num_locations_estimate ** 2
-            costo_base = num_requests * DISTANCE_METHODS['google_directions']['costo_por_request']
-            costo_con_trafico = costo_base * 2 if considerar_trafico else costo_base
+            loader_previo = st.session_state.get('data_loader')
+            if loader_previo is not None and loader_previo.validate_all_loaded()[0]:
+                # Con datos cargados: estimar solo los bloques que no están en la caché local
+                estimacion = estimar_requests_google(
+                    loader_previo,
+                    huella_coordenadas(loader_previo),
+                    {'google_vecinos_k': st.session_state.get('google_vecinos_k', 15)} if pares_cercanos else None,
+                    metodo_distancia,
+                    considerar_trafico,
+                    hora_salida_rutas,
+                    st.session_state.get('modelo_trafico', 'best_guess')
+                )
+                mensaje_costo = (
+                    f"💰 Costo estimado para {estimacion['ubicaciones']} ubicaciones: "
+                    f"{estimacion['requests']} requests, ${estimacion['costo_usd']:.2f} USD"
+                )
+                if estimacion['pares_en_cache'] > 0:
+                    mensaje_costo += f" ({estimacion['pares_en_cache']} de {estimacion['pares_totales']} pares ya en caché)"
+                if estimacion['pares_estimados'] > 0:
+                    mensaje_costo += f"; {estimacion['pares_estimados']} pares lejanos se estiman sin costo"
 
-            if considerar_trafico:
-                st.warning(f"💰 Costo estimado para ~{num_locations_estimate} ubicaciones: ${costo_con_trafico:.2f} USD (con tráfico)")
+                if considerar_trafico:
+                    st.warning(mensaje_costo + " (con tráfico)")
+                else:
+                    st.info(mensaje_costo)
             else:
-                st.info(f"💰 Costo estimado para ~{num_locations_estimate} ubicaciones: ${costo_base:.2f} USD")
+                num_locations_estimate = 20  # Estimado por defecto
+                num_requests = num_locations_estimate ** 2
+                costo_base = num_requests * DISTANCE_METHODS['google_directions']['costo_por_request']
+                costo_con_trafico = costo_base * 2 if considerar_trafico else costo_base
+
+                if considerar_trafico:
+                    st.warning(f"💰 Costo estimado para ~{num_locations_estimate} ubicaciones: ${costo_con_trafico:.2f} USD (con tráfico)")
+                else:
+                    st.info(f"💰 Costo estimado para ~{num_locations_estimate} ubicaciones: ${costo_base:.2f} USD")
         else:
             st.warning("⚠️ Requiere API key para usar distancias reales")
+    elif metodo_distancia == 'haversine':
+        calibracion = load_calibration()
+        if calibracion is not None:
+            resumen_calibracion = calibracion.summary()
+            st.checkbox(
+                "📐 Corregir con desvíos aprendidos",
+                value=CALIBRATION_CONFIG['aplicar_en_haversine'],
+                key='calibrar_haversine',
+                help=f"Multiplica la línea recta por la relación carretera / línea recta observada en "
+                     f"{resumen_calibracion['muestras']} trayectos reales consultados a Google, por zona"
+            )
+        else:
+            st.caption("📐 Sin desvíos aprendidos todavía: se calculan a partir de las distancias de Google en caché")
+        if st.button("🔄 Recalcular desvíos desde la caché", use_container_width=True):
+            try:
+                nueva_calibracion = DetourCalibration.from_cache()
+                if nueva_calibracion.muestras == 0:
+                    st.warning("⚠️ La caché no tiene trayectos suficientes para calibrar")
+                else:
+                    nueva_calibracion.save()
+                    st.success(f"✓ Desvíos aprendidos de {nueva_calibracion.muestras} trayectos")
+            except Exception as e:
+                st.error(f"❌ No se pudieron calcular los desvíos: {str(e)}")
+    elif metodo_distancia == 'osm_local':
+        if road_network_signature() is not None:
+            st.success("✓ Red vial local disponible")
+        else:
+            st.warning(f"⚠️ Falta preparar la red vial: `python src/road_network.py mapa.osm` "
+                       f"(se guarda en {ROAD_NETWORK_CONFIG['archivo_grafo']}). Mientras tanto se usa Haversine")
 
     st.divider()
     st.info("💡 Las coordenadas se geocodifican automáticamente si no están presentes")
@@ -165,9 +275,71 @@ current_geocoding_state = f"{metodo_geocodificacion}_{google_api_key_geocoding}"
 if 'data_loader' not in st.session_state or ('current_geocoding_state' in st.session_state and st.session_state.current_geocoding_state != current_geocoding_state):
     # Solo pasar API key si el método es Google Maps
     api_key_to_use = google_api_key_geocoding if metodo_geocodificacion == 'google_maps' else None
-    st.session_state.data_loader = DataLoader(google_api_key=api_key_to_use)
+    st.session_state.data_loader = DataLoader(google_api_key=api_key_to_use,
+                                              progress_sink=ThrottledSink(StreamlitSink()))
     st.session_state.current_geocoding_state = current_geocoding_state
 
+# Memoria de archivos ya procesados (validados y geocodificados) para los reruns de Streamlit
+if 'archivos_memo' not in st.session_state:
+    st.session_state.archivos_memo = MemoryLRUCache(CACHE_CONFIG['archivos_cargados']['max_entradas'])
+
+
+@st.cache_resource
+def obtener_ejecutor():
+    """Ejecutor de optimizaciones compartido por todas las sesiones del servidor"""
+    return JobExecutor()
+
+
+@st.cache_resource
+def obtener_cache_soluciones():
+    """Caché de soluciones compartida por todas las sesiones del servidor (None si no se puede abrir)"""
+    if not CACHE_CONFIG['soluciones']['habilitada']:
+        return None
+    try:
+        return SolutionCache()
+    except Exception:
+        return None
+
+
+def cargar_archivo_memo(tipo: str, archivo, cargar, atributo: str):
+    """
+    Carga un archivo reutilizando el resultado si ya se procesó en esta sesión
+
+    La clave es un hash del contenido del archivo más la configuración de
+    geocodificación, de modo que un rerun (mover un slider, cambiar de pestaña)
+    no vuelve a leer, validar ni geocodificar el mismo archivo.
+
+    Args:
+        tipo: Tipo de archivo (origenes/destinos/flota/config)
+        archivo: Archivo subido por Streamlit
+        cargar: Función del DataLoader que procesa el archivo
+        atributo: Atributo del DataLoader donde se guarda el resultado
+    """
+    # El hash del contenido se calcula una sola vez por archivo subido; por tipo
+    # solo se recuerda el último archivo, así que la memoria no crece con las subidas
+    file_id = getattr(archivo, 'file_id', None)
+    huellas = st.session_state.setdefault('archivos_huella', {})
+    if file_id is None or huellas.get(tipo, (None, None))[0] != file_id:
+        huella_contenido = hashlib.sha256(archivo.getvalue()).hexdigest()
+        if file_id is not None:
+            huellas[tipo] = (file_id, huella_contenido)
+    else:
+        huella_contenido = huellas[tipo][1]
+
+    huella_geocodificacion = hashlib.sha256(st.session_state.current_geocoding_state.encode('utf-8')).hexdigest()
+    clave = (tipo, huella_contenido, huella_geocodificacion)
+
+    resultado = st.session_state.archivos_memo.get(clave)
+    if resultado is not None:
+        setattr(st.session_state.data_loader, atributo, resultado)
+        return resultado
+
+    resultado = cargar(archivo)
+    if resultado is not None:
+        st.session_state.archivos_memo.put(clave, resultado)
+    return resultado
+
+
 with st.sidebar:
     # Sección de carga de archivos
     st.header("📤 Carga de Archivos")
@@ -307,6 +479,45 @@ with st.sidebar:
     # Mostrar descripción del tipo seleccionado
     st.caption(f"ℹ️ {OPTIMIZATION_TYPES[tipo_optimizacion]['descripcion']}")
 
+    # Selector de modo de resolución
+    modo_resolucion = st.selectbox(
+        "Modo de resolución:",
+        options=list(SOLVER_MODES.keys()),
+        format_func=lambda x: SOLVER_MODES[x]['nombre'],
+        index=0,
+        key='modo_resolucion',
+        help="El modo por depósito divide el problema en subproblemas más pequeños que se resuelven en paralelo"
+    )
+    st.caption(f"ℹ️ {SOLVER_MODES[modo_resolucion]['descripcion']}")
+
+    loader_actual = st.session_state.get('data_loader')
+    if (modo_resolucion == 'monolitico' and loader_actual is not None and loader_actual.destinos is not None
+            and len(loader_actual.destinos) > DECOMPOSITION_CONFIG['umbral_destinos_recomendado']):
+        st.caption(f"💡 Con {len(loader_actual.destinos)} destinos se recomienda el modo por depósito")
+
+    separar_regiones = False
+    if modo_resolucion == 'monolitico':
+        separar_regiones = st.checkbox(
+            "🗺️ Resolver por separado regiones lejanas",
+            value=DECOMPOSITION_CONFIG['separar_regiones'],
+            key='separar_regiones',
+            help=f"Si los depósitos y destinos forman grupos a más de {DECOMPOSITION_CONFIG['distancia_separacion_km']} km "
+                 "entre sí (ej. dos ciudades), cada grupo se resuelve en paralelo con su propia flota. Un vehículo ya no "
+                 "puede atender otra región, así que el resultado puede cambiar; no hay detención manual ni parada temprana"
+        )
+
+    arcos_dispersos = st.checkbox(
+        "🕸️ Solo arcos entre vecinos cercanos",
+        key='arcos_dispersos',
+        help="Cada destino solo considera como siguiente parada a sus vecinos más cercanos (y al depósito). "
+             "Acelera la búsqueda en instancias grandes; los demás arcos se eliminan del modelo"
+    )
+    if arcos_dispersos:
+        st.slider("Vecinos por destino", min_value=5, max_value=50, value=15, key='arcos_vecinos_k')
+    elif (loader_actual is not None and loader_actual.destinos is not None
+            and len(loader_actual.destinos) > CALCULATION_CONFIG['arcos_vecinos_umbral_destinos']):
+        st.caption(f"💡 Con {len(loader_actual.destinos)} destinos conviene limitar los arcos a vecinos cercanos")
+
     st.divider()
 
     st.subheader("⏱️ Tiempo de Optimización")
@@ -383,6 +594,15 @@ with st.sidebar:
 
     st.caption("💡 **Consejo:** El sistema puede terminar antes si encuentra la solución óptima. Empiece con 180 segundos (3 min) y ajuste según necesite.")
 
+    parada_temprana = st.checkbox(
+        "⏹️ Detener al estancarse",
+        value=SOLVE_MONITOR_CONFIG['parada_temprana'],
+        disabled=separar_regiones,
+        help=f"Termina antes del tiempo límite si el objetivo mejora menos de "
+             f"{SOLVE_MONITOR_CONFIG['mejora_minima_pct']}% en {SOLVE_MONITOR_CONFIG['ventana_s']} segundos"
+             + (". No aplica al resolver regiones por separado" if separar_regiones else "")
+    )
+
 # Tabs principales
 tab1, tab2, tab3, tab4 = st.tabs(["📊 Datos", "🗺️ Visualización", "🚀 Optimización", "📈 Resultados"])
 
@@ -393,7 +613,7 @@ with tab1:
     # Cargar orígenes
     if file_origenes:
         with st.spinner("Cargando orígenes..."):
-            df_origenes = st.session_state.data_loader.load_origenes(file_origenes)
+            df_origenes = cargar_archivo_memo('origenes', file_origenes, st.session_state.data_loader.load_origenes, 'origenes')
             if df_origenes is not None:
                 st.success(f"✅ Orígenes: {len(df_origenes)} puntos cargados")
                 with st.expander("Ver datos de orígenes"):
@@ -402,7 +622,7 @@ with tab1:
     # Cargar destinos
     if file_destinos:
         with st.spinner("Cargando destinos..."):
-            df_destinos = st.session_state.data_loader.load_destinos(file_destinos)
+            df_destinos = cargar_archivo_memo('destinos', file_destinos, st.session_state.data_loader.load_destinos, 'destinos')
             if df_destinos is not None:
                 st.success(f"✅ Destinos: {len(df_destinos)} puntos cargados")
                 with st.expander("Ver datos de destinos"):
@@ -411,7 +631,7 @@ with tab1:
     # Cargar flota
     if file_flota:
         with st.spinner("Cargando flota..."):
-            df_flota = st.session_state.data_loader.load_flota(file_flota)
+            df_flota = cargar_archivo_memo('flota', file_flota, st.session_state.data_loader.load_flota, 'flota')
             if df_flota is not None:
                 st.success(f"✅ Flota: {len(df_flota)} vehículos cargados")
                 with st.expander("Ver datos de flota"):
@@ -419,7 +639,7 @@ with tab1:
 
     # Cargar configuración
     if file_config:
-        config = st.session_state.data_loader.load_config(file_config)
+        config = cargar_archivo_memo('config', file_config, st.session_state.data_loader.load_config, 'config')
         if config is not None:
             st.info("✅ Configuración personalizada cargada")
             with st.expander("Ver configuración"):
@@ -524,6 +744,7 @@ with tab2:
         st.warning("Por favor cargue todos los archivos para visualizar el mapa")
 
 # TAB 3: Optimización
+refrescar_optimizacion = False  # Se activa mientras hay una búsqueda en segundo plano
 with tab3:
     st.header("Optimización de Rutas")
 
@@ -544,32 +765,275 @@ with tab3:
             st.write(f"📊 Demanda: {summary['destinos']['demanda_total']}")
             st.write(f"📦 Capacidad: {summary['flota']['capacidad_total']}")
 
-            if st.button("🚀 Iniciar Optimización", type="primary", use_container_width=True):
-                with st.spinner("Optimizando rutas... Esto puede tomar unos momentos"):
+            # Arranque en caliente: partir de las rutas de la solución anterior
+            usar_solucion_previa = False
+            if st.session_state.solution and st.session_state.get('modo_resolucion', 'monolitico') == 'monolitico':
+                usar_solucion_previa = st.checkbox(
+                    "♻️ Partir de la solución anterior",
+                    value=True,
+                    help="Usa las rutas actuales como punto de partida. Útil cuando solo cambiaron algunos vehículos o demandas"
+                )
+
+            trabajo = st.session_state.get('trabajo_optimizacion')
+            ejecutor = obtener_ejecutor()
+
+            # Recoger el trabajo terminado antes de dibujar los botones (así quedan habilitados)
+            estado_trabajo = ejecutor.status(trabajo['job_id']) if trabajo is not None else None
+            if trabajo is not None and (estado_trabajo is None or estado_trabajo['estado'] not in ('en_cola', 'ejecutando')):
+                del st.session_state.trabajo_optimizacion
+                job = ejecutor.pop(trabajo['job_id'])
+                optimizer = trabajo['optimizer']
+                # Mensajes del trabajo (se escribieron desde otro hilo) y de vuelta a la interfaz
+                trabajo['mensajes'].replay(StreamlitSink(), con_avance=False)
+                optimizer.sink = ThrottledSink(StreamlitSink())
+                # La optimización pudo guardar pares nuevos en la caché de distancias
+                estimar_requests_google.clear()
+                if job is None:
+                    # El servidor se reinició o el resultado venció sin recogerse
+                    st.warning("⚠️ Se perdió el trabajo de optimización; vuelve a iniciarlo")
+                elif job.estado == 'cancelado':
+                    st.info("Optimización cancelada")
+                elif job.estado == 'error':
+                    st.error(f"{ERROR_MESSAGES['optimization_error']}: {job.error}")
+                elif trabajo['tipo'] == 'comparacion':
+                    st.session_state.comparacion_objetivos = {
+                        'optimizer': optimizer,
+                        'resultados': job.resultado
+                    }
+                elif job.resultado:
+                    solution = job.resultado
+                    st.session_state.solution = solution
+                    st.session_state.optimizer = optimizer
+                    # Guardar las matrices para reutilizarlas si solo cambian algunos destinos
+                    st.session_state.matrices_previas = optimizer.get_matrix_snapshot()
+                    detenido_por = (optimizer.search_stats or {}).get('detenido_por')
+                    segundos = estado_trabajo['segundos_en_ejecucion']
+                    # Solo se guardan búsquedas completas (no las detenidas por el usuario)
+                    cache_soluciones = obtener_cache_soluciones()
+                    if cache_soluciones and detenido_por != 'cancelado':
+                        cache_soluciones.put(trabajo['clave_solucion'], solution)
+                    if detenido_por == 'cancelado':
+                        st.success(f"✅ Optimización detenida a los {segundos:.0f}s con la mejor solución encontrada")
+                    elif detenido_por == 'estancamiento':
+                        st.success(f"✅ Optimización completada en {segundos:.0f}s (el objetivo dejó de mejorar)")
+                    else:
+                        st.success("✅ Optimización completada")
+                    if solution.get('regiones'):
+                        st.info(f"🗺️ {len(solution['regiones'])} regiones independientes resueltas por separado: " + "; ".join(
+                            f"{', '.join(map(str, region['origenes']))} ({region['destinos']} destinos)"
+                            for region in solution['regiones']
+                        ))
+                else:
+                    st.error(ERROR_MESSAGES['no_solution'])
+                trabajo = None
+
+            carga = ejecutor.stats()
+            if trabajo is None and carga['ejecutando'] >= carga['max_trabajos']:
+                st.caption(f"🖥️ Servidor ocupado: {carga['ejecutando']} optimizaciones en curso, "
+                           f"{carga['en_cola']} en cola. La tuya esperará su turno.")
+
+            if st.button("🚀 Iniciar Optimización", type="primary", use_container_width=True,
+                         disabled=trabajo is not None):
+                with st.spinner("Preparando la optimización..."):
                     # Crear optimizador
-                    config = st.session_state.data_loader.config or DEFAULT_CONFIG
+                    config = dict(st.session_state.data_loader.config or DEFAULT_CONFIG)
+                    if st.session_state.get('arcos_dispersos'):
+                        config['arcos_vecinos_k'] = st.session_state.get('arcos_vecinos_k', 15)
+                    if st.session_state.get('google_pares_cercanos'):
+                        config['google_vecinos_k'] = st.session_state.get('google_vecinos_k', 15)
+                    if 'calibrar_haversine' in st.session_state:
+                        config['calibrar_haversine'] = st.session_state.calibrar_haversine
+                    config['separar_regiones'] = separar_regiones
+                    destinos = st.session_state.data_loader.destinos
+                    if st.session_state.get('pedidos_tardios') is not None:
+                        destinos = pd.concat([destinos, st.session_state.pedidos_tardios], ignore_index=True)
+                        destinos = destinos.drop_duplicates('destino_id', keep='first', ignore_index=True)
                     optimizer = RouteOptimizer(
                         st.session_state.data_loader.origenes,
-                        st.session_state.data_loader.destinos,
+                        destinos,
                         st.session_state.data_loader.flota,
                         config,
                         optimization_type=st.session_state.get('tipo_optimizacion', 'balanced'),
                         distance_method=metodo_distancia,
                         google_api_key_directions=google_api_key_directions,
                         considerar_trafico=considerar_trafico,
-                        hora_salida_rutas=hora_salida_rutas
+                        hora_salida_rutas=hora_salida_rutas,
+                        previous_matrices=st.session_state.get('matrices_previas'),
+                        modelo_trafico=st.session_state.get('modelo_trafico', 'best_guess'),
+                        progress_sink=ThrottledSink(StreamlitSink())
                     )
 
-                    # Resolver
-                    solution = optimizer.solve(time_limit_seconds=tiempo_limite)
-
-                    if solution:
-                        st.session_state.solution = solution
+                    # Si el mismo problema ya se resolvió (en cualquier sesión), reutilizar la solución
+                    cache_soluciones = obtener_cache_soluciones()
+                    clave_solucion = optimizer.get_problem_fingerprint(tiempo_limite, extra={
+                        'modo_resolucion': st.session_state.get('modo_resolucion', 'monolitico'),
+                        'parada_temprana': parada_temprana
+                    })
+                    solucion_guardada = cache_soluciones.get(clave_solucion) if cache_soluciones else None
+
+                    if solucion_guardada is not None:
+                        optimizer.solution = solucion_guardada
+                        st.session_state.solution = solucion_guardada
                         st.session_state.optimizer = optimizer
-                        st.success("✅ Optimización completada")
+                        st.session_state.mensaje_optimizacion = "⚡ Solución recuperada de la caché (mismo problema y parámetros)"
+                        st.rerun()
+
+                    # Las matrices se calculan aquí (pueden mostrar mensajes); la búsqueda
+                    # se encola en el ejecutor del servidor y la interfaz consulta su avance
+                    optimizer.create_distance_matrix()
+                    monitor = None
+                    regiones = []
+                    if st.session_state.get('modo_resolucion') == 'descomposicion':
+                        funcion, argumentos = solve_by_depot, {'optimizer': optimizer}
+                    elif st.session_state.get('modo_resolucion') == 'portafolio':
+                        funcion, argumentos = solve_portfolio, {'optimizer': optimizer}
+                    else:
+                        # Regiones independientes (ej. dos ciudades, si se pidió): una resolución por región
+                        regiones = regions_to_split(optimizer)
+                        initial_solution = st.session_state.solution if usar_solucion_previa else None
+                        if regiones:
+                            funcion, argumentos = solve_regions, {'optimizer': optimizer, 'grupos': regiones,
+                                                                  'initial_solution': initial_solution}
+                        else:
+                            monitor = SolveMonitor(parada_temprana=parada_temprana)
+                            funcion, argumentos = optimizer.solve, {'initial_solution': initial_solution, 'monitor': monitor}
+
+                    # El trabajo corre en otro hilo, sin acceso a Streamlit: sus mensajes se
+                    # guardan y la página los muestra en cada rerun
+                    mensajes = BufferSink()
+                    optimizer.sink = mensajes
+                    try:
+                        job_id = ejecutor.submit(funcion, time_limit_seconds=tiempo_limite,
+                                                 etiqueta='optimizacion', **argumentos)
+                    except QueueFullError as e:
+                        st.error(f"❌ {str(e)}")
+                    else:
+                        st.session_state.trabajo_optimizacion = {
+                            'job_id': job_id,
+                            'tipo': 'optimizacion',
+                            'optimizer': optimizer,
+                            'clave_solucion': clave_solucion,
+                            'monitor': monitor,
+                            'regiones': len(regiones),
+                            'mensajes': mensajes
+                        }
+                        st.rerun()
+
+            # Comparación: resolver todos los objetivos en paralelo con las mismas matrices
+            if st.button("⚖️ Comparar todos los objetivos", use_container_width=True, disabled=trabajo is not None,
+                         help="Resuelve distancia, tiempo, costo, vehículos y balanceado al mismo tiempo"):
+                with st.spinner("Preparando la comparación..."):
+                    config = dict(st.session_state.data_loader.config or DEFAULT_CONFIG)
+                    if st.session_state.get('arcos_dispersos'):
+                        config['arcos_vecinos_k'] = st.session_state.get('arcos_vecinos_k', 15)
+                    if st.session_state.get('google_pares_cercanos'):
+                        config['google_vecinos_k'] = st.session_state.get('google_vecinos_k', 15)
+                    if 'calibrar_haversine' in st.session_state:
+                        config['calibrar_haversine'] = st.session_state.calibrar_haversine
+                    destinos = st.session_state.data_loader.destinos
+                    if st.session_state.get('pedidos_tardios') is not None:
+                        destinos = pd.concat([destinos, st.session_state.pedidos_tardios], ignore_index=True)
+                        destinos = destinos.drop_duplicates('destino_id', keep='first', ignore_index=True)
+                    optimizer = RouteOptimizer(
+                        st.session_state.data_loader.origenes,
+                        destinos,
+                        st.session_state.data_loader.flota,
+                        config,
+                        distance_method=metodo_distancia,
+                        google_api_key_directions=google_api_key_directions,
+                        considerar_trafico=considerar_trafico,
+                        hora_salida_rutas=hora_salida_rutas,
+                        previous_matrices=st.session_state.get('matrices_previas'),
+                        modelo_trafico=st.session_state.get('modelo_trafico', 'best_guess'),
+                        progress_sink=ThrottledSink(StreamlitSink())
+                    )
+                    optimizer.create_distance_matrix()
+                    st.session_state.matrices_previas = optimizer.get_matrix_snapshot()
+                    mensajes = BufferSink()
+                    optimizer.sink = mensajes
+                    try:
+                        job_id = ejecutor.submit(solve_all_objectives, optimizer,
+                                                 time_limit_seconds=tiempo_limite, etiqueta='comparacion')
+                    except QueueFullError as e:
+                        st.error(f"❌ {str(e)}")
+                    else:
+                        st.session_state.trabajo_optimizacion = {
+                            'job_id': job_id,
+                            'tipo': 'comparacion',
+                            'optimizer': optimizer,
+                            'monitor': None,
+                            'mensajes': mensajes
+                        }
                         st.rerun()
 
+            if st.session_state.get('mensaje_optimizacion'):
+                st.success(st.session_state.pop('mensaje_optimizacion'))
+
+            # Trabajo en segundo plano: posición en la cola, avance en vivo y botones para detenerlo
+            if trabajo is not None:
+                monitor = trabajo['monitor']
+                trabajo['mensajes'].replay(StreamlitSink())
+
+                if estado_trabajo['estado'] == 'en_cola':
+                    st.info(f"🕒 En cola: posición {estado_trabajo['posicion_en_cola']} · "
+                            f"{carga['ejecutando']} de {carga['max_trabajos']} optimizaciones en curso en el servidor")
+                    if st.button("✖️ Cancelar", use_container_width=True):
+                        ejecutor.cancel(trabajo['job_id'])
+                    refrescar_optimizacion = True
+                elif estado_trabajo['estado'] == 'ejecutando':
+                    if monitor is not None:
+                        estado = monitor.snapshot()
+                        st.info(f"⏳ Optimizando... {estado['transcurrido_s']:.0f}s de {tiempo_limite}s · "
+                                f"{estado['soluciones']} soluciones encontradas")
+                        if estado['historial']:
+                            st.line_chart(pd.DataFrame(estado['historial']).set_index('t'), height=150)
+                        if st.button("⏹️ Detener y usar la mejor solución", use_container_width=True):
+                            monitor.cancel()
+                    else:
+                        st.info(f"⏳ Optimizando... {estado_trabajo['segundos_en_ejecucion']:.0f}s de {tiempo_limite}s")
+                        if trabajo.get('regiones'):
+                            st.caption("Las regiones se resuelven en procesos separados: no se pueden detener "
+                                       "antes del tiempo límite")
+                    refrescar_optimizacion = True
+
         with col2:
+            comparacion = st.session_state.get('comparacion_objetivos')
+            if comparacion:
+                st.subheader("⚖️ Comparación de Objetivos")
+                filas = []
+                for tipo, resultado in comparacion['resultados'].items():
+                    metricas = resultado['metricas'] or {}
+                    filas.append({
+                        'Objetivo': OPTIMIZATION_TYPES[tipo]['nombre'],
+                        'Distancia (km)': round(metricas.get('distancia_km', 0), 2) if metricas else None,
+                        'Tiempo (h)': round(metricas.get('tiempo_h', 0), 2) if metricas else None,
+                        'Costo': round(metricas.get('costo', 0), 2) if metricas else None,
+                        'Vehículos': metricas.get('vehiculos'),
+                        'No asignados': metricas.get('no_asignados')
+                    })
+                st.dataframe(pd.DataFrame(filas), use_container_width=True, hide_index=True)
+
+                tipos_con_solucion = [t for t, r in comparacion['resultados'].items() if r['solution']]
+                if tipos_con_solucion:
+                    col_tipo, col_usar = st.columns([2, 1])
+                    with col_tipo:
+                        tipo_elegido = st.selectbox(
+                            "Solución a usar:",
+                            options=tipos_con_solucion,
+                            format_func=lambda x: OPTIMIZATION_TYPES[x]['nombre'],
+                            key='tipo_comparacion_elegido'
+                        )
+                    with col_usar:
+                        st.write("")
+                        if st.button("Usar esta solución", use_container_width=True):
+                            optimizer = comparacion['optimizer']
+                            optimizer.optimization_type = tipo_elegido
+                            optimizer.solution = comparacion['resultados'][tipo_elegido]['solution']
+                            st.session_state.solution = optimizer.solution
+                            st.session_state.optimizer = optimizer
+                            del st.session_state.comparacion_objetivos
+                            st.rerun()
+
             if st.session_state.solution:
                 st.subheader("📊 Resultados de Optimización")
 
@@ -587,13 +1051,67 @@ with tab3:
                     st.metric("Vehículos Usados", num_routes)
 
                 with metric_col3:
-                    destinos_asignados = len(st.session_state.data_loader.destinos) - len(st.session_state.solution.get('unassigned', []))
+                    destinos_asignados = len(st.session_state.optimizer.destinos) - len(st.session_state.solution.get('unassigned', []))
                     st.metric("Destinos Atendidos", destinos_asignados)
 
                 # Advertencia si hay destinos no asignados
                 if st.session_state.solution.get('unassigned'):
                     st.warning(f"⚠️ {len(st.session_state.solution['unassigned'])} destinos NO fueron asignados. "
                              "Revisa la capacidad de la flota o aumenta el tiempo límite.")
+                    with st.expander("Ver destinos no asignados y el motivo"):
+                        st.dataframe(pd.DataFrame([
+                            {'ID': dest['id'], 'Nombre': dest['nombre'], 'Demanda': dest['demanda'],
+                             'Motivo': dest.get('motivo', '')}
+                            for dest in st.session_state.solution['unassigned']
+                        ]), use_container_width=True, hide_index=True)
+
+                # Preproceso: flota que entró al modelo y cota inferior de vehículos
+                presolve = st.session_state.solution.get('presolve')
+                if presolve:
+                    cota = presolve['cota_inferior_vehiculos']
+                    st.caption(
+                        f"🧮 Preproceso: {presolve['vehiculos_modelo']} de {presolve['vehiculos_flota']} vehículos en el modelo"
+                        + (f" · se necesitan al menos {cota} vehículos" if cota is not None else " · la flota no alcanza para toda la demanda")
+                        + (f" · {presolve['destinos_infactibles']} destinos exceden la capacidad de cualquier vehículo"
+                           if presolve['destinos_infactibles'] else "")
+                    )
+
+                # Resultado del portafolio: configuración ganadora y comparación
+                if st.session_state.solution.get('portfolio'):
+                    ganadora = st.session_state.solution['solver_config']
+                    st.caption(f"🏆 Configuración ganadora: {ganadora['estrategia_inicial']} + {ganadora['metaheuristica']}")
+                    with st.expander("Ver resultados del portafolio"):
+                        st.dataframe(pd.DataFrame(st.session_state.solution['portfolio']),
+                                     use_container_width=True, hide_index=True)
+
+                # Pedidos tardíos: insertarlos en el plan actual sin re-optimizar
+                with st.expander("➕ Insertar pedidos tardíos"):
+                    st.caption("Carga un archivo con el formato de destinos. Cada pedido se inserta en la posición "
+                               "más barata que respete la capacidad, sin volver a optimizar todo el plan.")
+                    file_pedidos = st.file_uploader("Archivo de pedidos nuevos", type=['xlsx'], key='file_pedidos_tardios')
+                    if file_pedidos and st.session_state.optimizer and st.button("Insertar pedidos"):
+                        loader = st.session_state.data_loader
+                        destinos_actuales = loader.destinos
+                        nuevos = loader.load_destinos(file_pedidos)
+                        loader.destinos = destinos_actuales
+
+                        if nuevos is not None:
+                            solution = st.session_state.optimizer.insert_orders(st.session_state.solution, nuevos)
+                            # Conservar los pedidos para incluirlos en la próxima optimización
+                            st.session_state.pedidos_tardios = pd.concat(
+                                [st.session_state.get('pedidos_tardios'), nuevos], ignore_index=True
+                            )
+                            st.session_state.solution = solution
+                            st.session_state.matrices_previas = st.session_state.optimizer.get_matrix_snapshot()
+                            st.rerun()
+
+                    insercion = st.session_state.solution.get('insercion')
+                    if insercion:
+                        st.success(f"✅ {len(insercion['insertados'])} pedidos insertados en {insercion['tiempo_ms']:.0f} ms")
+                        if insercion['requieren_reoptimizar']:
+                            st.warning(f"⚠️ {len(insercion['requieren_reoptimizar'])} pedidos requieren re-optimizar el plan")
+                            st.dataframe(pd.DataFrame(insercion['requieren_reoptimizar']),
+                                         use_container_width=True, hide_index=True)
 
                 # Detalle por vehículo
                 st.subheader("Detalle de Rutas")
@@ -750,3 +1268,8 @@ with col_footer2:
         for key in list(st.session_state.keys()):
             del st.session_state[key]
         st.rerun()
+
+# Mientras la búsqueda sigue en segundo plano, refrescar la página para mostrar su avance
+if refrescar_optimizacion:
+    time.sleep(SOLVE_MONITOR_CONFIG['intervalo_actualizacion_s'])
+    st.rerun()
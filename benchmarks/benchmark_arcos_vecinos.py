@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark: arcos completos vs. arcos entre vecinos cercanos
+
+Resuelve la misma instancia con el mismo tiempo límite usando todos los arcos
+('arcos_vecinos_k' = 0) y limitando el sucesor de cada destino a sus k vecinos
+más cercanos, y compara el trabajo de búsqueda y la calidad de la solución.
+Cada modo usa su estrategia inicial por defecto (ver get_search_config).
+
+Uso:
+    python benchmarks/benchmark_arcos_vecinos.py --destinos 300 --tiempo 10 --k 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from route_optimizer import RouteOptimizer
+from instancias import generar_instancia
+
+
+def ejecutar(origenes, destinos, flota, k: int, tiempo: int):
+    """Resuelve una vez y retorna (estadísticas de búsqueda, solución, segundos)"""
+    optimizer = RouteOptimizer(origenes, destinos, flota,
+                               config={'separar_regiones': False, 'arcos_vecinos_k': k})
+    inicio = time.time()
+    solution = optimizer.solve(time_limit_seconds=tiempo)
+    return optimizer.search_stats, solution, time.time() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara arcos completos con arcos entre vecinos cercanos")
+    parser.add_argument('--destinos', type=int, default=300, help="Número de destinos")
+    parser.add_argument('--vehiculos', type=int, default=8, help="Vehículos por origen")
+    parser.add_argument('--tiempo', type=int, default=10, help="Tiempo límite por ejecución (s)")
+    parser.add_argument('--k', type=int, default=10, help="Vecinos candidatos por destino")
+    args = parser.parse_args()
+
+    origenes, destinos, flota = generar_instancia(args.destinos, args.vehiculos)
+    n = len(origenes) + len(destinos)
+
+    print(f"Instancia: {len(origenes)} orígenes, {len(destinos)} destinos, {len(flota)} vehículos")
+    print(f"Tiempo límite por ejecución: {args.tiempo}s\n")
+    print(f"{'Modo':<12} {'Arcos':>10} {'Ramas':>10} {'Vecinos':>10} {'Distancia km':>13} {'Sin asignar':>12} {'Tiempo s':>9}")
+    print("-" * 81)
+
+    for k in (0, args.k):
+        stats, solution, segundos = ejecutar(origenes, destinos, flota, k, args.tiempo)
+        modo = f"k = {k}" if k else 'completo'
+        arcos = stats.get('arcos_candidatos') or n * n
+        distancia = f"{solution['total_distance']:.2f}" if solution else '-'
+        sin_asignar = len(solution['unassigned']) if solution else '-'
+        print(f"{modo:<12} {arcos:>10} {stats.get('ramas', 0):>10} "
+              f"{stats.get('vecinos_aceptados', 0):>10} {distancia:>13} {sin_asignar:>12} {segundos:>9.1f}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
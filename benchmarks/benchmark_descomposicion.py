@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark: resolución por depósito (descomposición) vs modelo único
+
+Resuelve la misma instancia con el modelo monolítico y con la descomposición
+por depósito, con el mismo tiempo límite, y reporta la brecha de calidad
+(distancia total) y los destinos sin asignar de cada modo.
+
+Uso:
+    python benchmarks/benchmark_descomposicion.py --destinos 200 400 800 --tiempo 30
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from route_optimizer import RouteOptimizer
+from parallel_solver import solve_by_depot
+from instancias import generar_instancia
+
+
+def ejecutar(origenes, destinos, flota, tipo: str, tiempo: int, descomponer: bool):
+    """Resuelve una vez y retorna (solución, segundos)"""
+    optimizer = RouteOptimizer(origenes, destinos, flota, optimization_type=tipo)
+    optimizer.create_distance_matrix()
+
+    inicio = time.perf_counter()
+    if descomponer:
+        solution = solve_by_depot(optimizer, time_limit_seconds=tiempo)
+    else:
+        solution = optimizer.solve(time_limit_seconds=tiempo)
+    return solution, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la descomposición por depósito con el modelo único")
+    parser.add_argument('--destinos', type=int, nargs='+', default=[200, 400], help="Tamaños de instancia")
+    parser.add_argument('--vehiculos', type=int, default=10, help="Vehículos por origen")
+    parser.add_argument('--capacidad', type=int, default=2000, help="Capacidad por vehículo")
+    parser.add_argument('--tiempo', type=int, default=30, help="Tiempo límite por ejecución (s)")
+    parser.add_argument('--tipo', default='distancia', help="Tipo de optimización")
+    args = parser.parse_args()
+
+    print(f"Tiempo límite por ejecución: {args.tiempo}s, objetivo: {args.tipo}\n")
+    print(f"{'Destinos':>8} {'Modo':<14} {'Distancia':>12} {'Sin asignar':>12} {'Segundos':>9} {'Brecha':>8}")
+    print("-" * 68)
+
+    for num_destinos in args.destinos:
+        origenes, destinos, flota = generar_instancia(num_destinos, args.vehiculos, args.capacidad)
+
+        monolitica, seg_mono = ejecutar(origenes, destinos, flota, args.tipo, args.tiempo, False)
+        descompuesta, seg_desc = ejecutar(origenes, destinos, flota, args.tipo, args.tiempo, True)
+
+        for nombre, solution, segundos in (('monolítico', monolitica, seg_mono),
+                                           ('por depósito', descompuesta, seg_desc)):
+            if solution is None:
+                print(f"{num_destinos:>8} {nombre:<14} {'-':>12} {'-':>12} {segundos:>9.1f} {'-':>8}")
+                continue
+
+            brecha = '-'
+            if monolitica and monolitica['total_distance'] > 0:
+                gap = (solution['total_distance'] - monolitica['total_distance']) / monolitica['total_distance'] * 100
+                brecha = f"{gap:+.2f}%"
+            print(f"{num_destinos:>8} {nombre:<14} {solution['total_distance']:>12.2f} "
+                  f"{len(solution.get('unassigned', [])):>12} {segundos:>9.1f} {brecha:>8}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
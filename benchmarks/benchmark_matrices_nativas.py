@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: matrices nativas de OR-Tools vs callbacks de Python
+
+Resuelve la misma instancia con ambos modos de registro y con el mismo
+tiempo límite, y compara cuánto trabajo de búsqueda alcanza a hacer el solver
+(ramas, soluciones y vecinos aceptados) y el objetivo final.
+
+Uso:
+    python benchmarks/benchmark_matrices_nativas.py --destinos 150 --tiempo 10
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from route_optimizer import RouteOptimizer
+from config import OPTIMIZATION_TYPES
+from instancias import generar_instancia
+
+
+def ejecutar(origenes, destinos, flota, tipo: str, nativas: bool, tiempo: int):
+    """Resuelve una vez y retorna (estadísticas de búsqueda, solución)"""
+    optimizer = RouteOptimizer(
+        origenes, destinos, flota,
+        config={'usar_matrices_nativas': nativas},
+        optimization_type=tipo
+    )
+    solution = optimizer.solve(time_limit_seconds=tiempo)
+    return optimizer.search_stats, solution
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara matrices nativas vs callbacks de Python")
+    parser.add_argument('--destinos', type=int, default=150, help="Número de destinos")
+    parser.add_argument('--vehiculos', type=int, default=6, help="Vehículos por origen")
+    parser.add_argument('--tiempo', type=int, default=10, help="Tiempo límite por ejecución (s)")
+    parser.add_argument('--tipos', nargs='+', default=list(OPTIMIZATION_TYPES.keys()),
+                        help="Tipos de optimización a evaluar")
+    args = parser.parse_args()
+
+    origenes, destinos, flota = generar_instancia(args.destinos, args.vehiculos)
+
+    print(f"Instancia: {len(origenes)} orígenes, {len(destinos)} destinos, {len(flota)} vehículos")
+    print(f"Tiempo límite por ejecución: {args.tiempo}s\n")
+    print(f"{'Objetivo':<12} {'Modo':<10} {'Ramas':>10} {'Soluciones':>11} {'Vecinos':>10} {'Distancia km':>13}")
+    print("-" * 70)
+
+    for tipo in args.tipos:
+        resultados = {}
+        for nativas in (False, True):
+            stats, solution = ejecutar(origenes, destinos, flota, tipo, nativas, args.tiempo)
+            resultados[nativas] = stats
+            modo = 'nativo' if nativas else 'callback'
+            distancia = f"{solution['total_distance']:.2f}" if solution else '-'
+            print(f"{tipo:<12} {modo:<10} {stats['ramas']:>10} {stats['soluciones']:>11} "
+                  f"{stats['vecinos_aceptados']:>10} {distancia:>13}")
+
+        if resultados[False]['ramas'] > 0:
+            factor = resultados[True]['ramas'] / resultados[False]['ramas']
+            print(f"{'':<12} -> {factor:.1f}x más ramas exploradas con matrices nativas")
+        print()
+
+
+if __name__ == '__main__':
+    main()
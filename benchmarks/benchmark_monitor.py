@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: costo del SolveMonitor sobre la búsqueda
+
+Resuelve la misma instancia con el mismo tiempo límite sin monitor y con
+monitor (sin parada temprana, para que ambas corran el tiempo completo), y
+compara cuánto trabajo de búsqueda alcanza a hacer el solver. El monitor
+actúa en cada solución nueva y en un hilo vigilante que revisa cancelación y
+estancamiento cada 'intervalo_vigilancia_s'; si alguno de los dos se volviera
+costoso se notaría como menos ramas y vecinos aceptados.
+
+Uso:
+    python benchmarks/benchmark_monitor.py --destinos 150 --tiempo 5
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from route_optimizer import RouteOptimizer
+from solve_monitor import SolveMonitor
+from instancias import generar_instancia
+
+
+def ejecutar(origenes, destinos, flota, con_monitor: bool, tiempo: int):
+    """Resuelve una vez y retorna (estadísticas de búsqueda, solución)"""
+    optimizer = RouteOptimizer(origenes, destinos, flota, config={'separar_regiones': False})
+    monitor = SolveMonitor(parada_temprana=False) if con_monitor else None
+    solution = optimizer.solve(time_limit_seconds=tiempo, monitor=monitor)
+    return optimizer.search_stats, solution
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el costo del monitor de búsqueda")
+    parser.add_argument('--destinos', type=int, default=150, help="Número de destinos")
+    parser.add_argument('--vehiculos', type=int, default=6, help="Vehículos por origen")
+    parser.add_argument('--tiempo', type=int, default=5, help="Tiempo límite por ejecución (s)")
+    parser.add_argument('--tolerancia', type=float, default=0.8,
+                        help="Fracción mínima de ramas con monitor respecto a sin monitor")
+    args = parser.parse_args()
+
+    origenes, destinos, flota = generar_instancia(args.destinos, args.vehiculos)
+
+    print(f"Instancia: {len(origenes)} orígenes, {len(destinos)} destinos, {len(flota)} vehículos")
+    print(f"Tiempo límite por ejecución: {args.tiempo}s\n")
+    print(f"{'Modo':<14} {'Ramas':>10} {'Soluciones':>11} {'Vecinos':>10} {'Distancia km':>13}")
+    print("-" * 62)
+
+    resultados = {}
+    for con_monitor in (False, True):
+        stats, solution = ejecutar(origenes, destinos, flota, con_monitor, args.tiempo)
+        resultados[con_monitor] = stats
+        modo = 'con monitor' if con_monitor else 'sin monitor'
+        distancia = f"{solution['total_distance']:.2f}" if solution else '-'
+        print(f"{modo:<14} {stats['ramas']:>10} {stats['soluciones']:>11} "
+              f"{stats['vecinos_aceptados']:>10} {distancia:>13}")
+
+    factor = resultados[True]['ramas'] / max(1, resultados[False]['ramas'])
+    print(f"\n-> El monitor conserva {factor:.0%} de las ramas exploradas")
+    if factor < args.tolerancia:
+        print(f"❌ Regresión: menos del {args.tolerancia:.0%} de las ramas sin monitor")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
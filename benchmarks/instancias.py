@@ -0,0 +1,72 @@
+"""
+Generador de instancias sintéticas para benchmarks
+Crea orígenes, destinos y flota con el mismo formato que las plantillas de Excel
+"""
+import numpy as np
+import pandas as pd
+
+# Centros urbanos de referencia (mismos que usan las plantillas)
+CIUDADES = {
+    'Medellin': (6.2442, -75.5812),
+    'Bogota': (4.6867, -74.0548),
+}
+
+
+def generar_instancia(num_destinos: int = 100, vehiculos_por_origen: int = 5,
+                      capacidad: int = 1000, radio_grados: float = 0.08,
+                      ciudades=None, semilla: int = 42):
+    """
+    Genera una instancia con un origen por ciudad y destinos distribuidos alrededor
+
+    Args:
+        num_destinos: Número total de destinos (repartidos entre las ciudades)
+        vehiculos_por_origen: Vehículos asignados a cada origen
+        capacidad: Capacidad de cada vehículo
+        radio_grados: Dispersión de los destinos alrededor del centro de la ciudad
+        ciudades: Lista de ciudades a usar (por defecto todas las de CIUDADES)
+        semilla: Semilla aleatoria para reproducibilidad
+
+    Returns:
+        Tupla (origenes, destinos, flota) como DataFrames
+    """
+    rng = np.random.default_rng(semilla)
+    ciudades = ciudades or list(CIUDADES.keys())
+
+    origenes = pd.DataFrame({
+        'origen_id': [f'ORG_{i + 1:02d}' for i in range(len(ciudades))],
+        'nombre_origen': [f'Bodega {ciudad}' for ciudad in ciudades],
+        'direccion': ['Calle 1 #1-1'] * len(ciudades),
+        'ciudad': ciudades,
+        'pais': ['Colombia'] * len(ciudades),
+        'latitud': [CIUDADES[c][0] for c in ciudades],
+        'longitud': [CIUDADES[c][1] for c in ciudades],
+    })
+
+    ciudad_destino = [ciudades[i % len(ciudades)] for i in range(num_destinos)]
+    centros = np.array([CIUDADES[c] for c in ciudad_destino])
+    coords = centros + rng.normal(0, radio_grados / 2, size=(num_destinos, 2))
+
+    destinos = pd.DataFrame({
+        'destino_id': [f'CLI_{i + 1:04d}' for i in range(num_destinos)],
+        'nombre_cliente': [f'Cliente {i + 1}' for i in range(num_destinos)],
+        'direccion': ['Calle 2 #2-2'] * num_destinos,
+        'ciudad': ciudad_destino,
+        'pais': ['Colombia'] * num_destinos,
+        'demanda': rng.integers(20, 150, size=num_destinos),
+        'latitud': coords[:, 0],
+        'longitud': coords[:, 1],
+    })
+
+    filas_flota = []
+    for _, origen in origenes.iterrows():
+        for v in range(vehiculos_por_origen):
+            filas_flota.append({
+                'vehiculo_id': f"V_{origen['origen_id']}_{v + 1:02d}",
+                'tipo_vehiculo': 'Camion',
+                'capacidad': capacidad,
+                'origen_id': origen['origen_id'],
+                'costo_km': 2.5,
+            })
+    flota = pd.DataFrame(filas_flota)
+
+    return origenes, destinos, flota
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Verificación del preproceso (presolve) sobre instancias sintéticas
+
+Comprueba, sin resolver el VRP, que:
+- En una instancia factible con varios depósitos la cota inferior de vehículos
+  de cada depósito existe y no supera su flota.
+- Un destino con demanda mayor que cualquier vehículo se marca infactible.
+- El recorte de flota conserva al menos la cota de cada depósito.
+
+Uso:
+    python benchmarks/verificar_presolve.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from route_optimizer import RouteOptimizer
+from presolve import run_presolve
+from instancias import generar_instancia
+
+
+def verificar_multideposito() -> list:
+    """Errores encontrados en una instancia factible de dos depósitos"""
+    errores = []
+    origenes, destinos, flota = generar_instancia(200, 10)
+    destinos.loc[0, 'demanda'] = 5000
+
+    optimizer = RouteOptimizer(origenes, destinos, flota)
+    presolve = run_presolve(destinos, flota, deposito_de_destino=optimizer.get_depot_assignment())
+    resumen = presolve['resumen']
+    print(f"Cotas por depósito: {resumen['cota_por_deposito']} (global {resumen['cota_inferior_vehiculos']})")
+    print(f"Vehículos en el modelo: {resumen['vehiculos_modelo']} de {resumen['vehiculos_flota']}")
+
+    if list(presolve['infactibles']) != [0]:
+        errores.append(f"Destinos infactibles esperados [0], obtenidos {list(presolve['infactibles'])}")
+
+    flota_modelo = flota.iloc[presolve['vehiculos_modelo']]
+    for origen_id, cota in resumen['cota_por_deposito'].items():
+        disponibles = int((flota['origen_id'] == origen_id).sum())
+        en_modelo = int((flota_modelo['origen_id'] == origen_id).sum())
+        if cota is None:
+            errores.append(f"{origen_id}: sin cota en una instancia factible")
+        elif not 0 < cota <= disponibles:
+            errores.append(f"{origen_id}: cota {cota} fuera de rango (flota {disponibles})")
+        elif en_modelo < cota:
+            errores.append(f"{origen_id}: el recorte dejó {en_modelo} vehículos, menos que la cota {cota}")
+    return errores
+
+
+def main():
+    errores = verificar_multideposito()
+    for error in errores:
+        print(f"❌ {error}")
+    if not errores:
+        print("✅ Preproceso correcto")
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
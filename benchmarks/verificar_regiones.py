@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Verificación de la detección de regiones independientes
+
+Comprueba, sin resolver el VRP, que:
+- Dos ciudades con flota suficiente se separan en dos regiones.
+- Una ciudad cuya capacidad total alcanza pero cuyos pedidos no caben en sus
+  vehículos (bin packing) se une a la otra, para no perder pedidos.
+
+Uso:
+    python benchmarks/verificar_regiones.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from route_optimizer import RouteOptimizer
+from parallel_solver import find_independent_regions
+from instancias import generar_instancia
+
+
+def regiones(origenes, destinos, flota) -> list:
+    """Orígenes de cada región detectada"""
+    optimizer = RouteOptimizer(origenes, destinos, flota)
+    return [grupo['origen_indices'] for grupo in find_independent_regions(optimizer)]
+
+
+def main():
+    errores = []
+    origenes, destinos, flota = generar_instancia(40, 4, capacidad=1000)
+
+    separadas = regiones(origenes, destinos, flota)
+    print(f"Flota suficiente: regiones {separadas}")
+    if len(separadas) != 2:
+        errores.append(f"Se esperaban 2 regiones, se obtuvieron {len(separadas)}")
+
+    # Medellín: 3 pedidos de 60 con 2 vehículos de 100 (200 >= 180, pero se necesitan 3 vehículos)
+    medellin = destinos['ciudad'] == 'Medellin'
+    destinos = destinos[~medellin | (destinos.index < destinos[medellin].index[3])].copy()
+    destinos.loc[destinos['ciudad'] == 'Medellin', 'demanda'] = 60
+    flota = flota[(flota['origen_id'] != 'ORG_01') | (flota.index < 2)].copy()
+    flota.loc[flota['origen_id'] == 'ORG_01', 'capacidad'] = 100
+
+    unidas = regiones(origenes, destinos.reset_index(drop=True), flota.reset_index(drop=True))
+    print(f"Pedidos que no caben en la flota de ORG_01: regiones {unidas}")
+    if len(unidas) != 1:
+        errores.append(f"Se esperaba 1 región (ORG_01 no puede atender sus pedidos), se obtuvieron {len(unidas)}")
+
+    for error in errores:
+        print(f"❌ {error}")
+    if not errores:
+        print("✅ Detección de regiones correcta")
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
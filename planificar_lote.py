@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Planificación por lotes sin interfaz (línea de comandos)
+
+Resuelve varios planes (por ejemplo, uno por depósito y día) en un pool de
+procesos y escribe los resultados en output/. Cada plan es una carpeta con
+los archivos de orígenes, destinos y flota (Excel o CSV) y, opcionalmente,
+el de configuración:
+
+    entrada/
+    ├── medellin_2024-06-03/
+    │   ├── origenes.xlsx
+    │   ├── destinos.csv
+    │   ├── flota.xlsx          (también: vehiculos.xlsx)
+    │   └── configuracion.xlsx  (opcional)
+    └── bogota_2024-06-03/
+        └── ...
+
+Si la carpeta de entrada contiene directamente los archivos, se trata como un solo plan.
+
+Uso:
+    python planificar_lote.py entrada/ --tiempo 120 --procesos 8 --objetivo distancia
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from config import OPTIMIZATION_TYPES, DISTANCE_METHODS, DEFAULT_CONFIG
+from progress import LoggingSink
+
+# Nombres aceptados para cada archivo (sin extensión); también con prefijo 'plantilla_'
+NOMBRES_ARCHIVOS = {
+    'origenes': ['origenes'],
+    'destinos': ['destinos'],
+    'flota': ['flota', 'vehiculos'],
+    'config': ['configuracion', 'config'],
+}
+EXTENSIONES = ('.xlsx', '.xls', '.csv')
+
+
+def buscar_archivo(carpeta: str, tipo: str):
+    """Retorna la ruta del archivo de un tipo dentro de la carpeta, o None"""
+    for nombre in NOMBRES_ARCHIVOS[tipo]:
+        for prefijo in ('', 'plantilla_'):
+            for extension in EXTENSIONES:
+                ruta = os.path.join(carpeta, f"{prefijo}{nombre}{extension}")
+                if os.path.isfile(ruta):
+                    return ruta
+    return None
+
+
+def descubrir_planes(entrada: str):
+    """
+    Lista los planes de la carpeta de entrada: cada subcarpeta con archivo de
+    orígenes es un plan; si la carpeta misma lo tiene, es un único plan
+    """
+    if buscar_archivo(entrada, 'origenes'):
+        return [(os.path.basename(os.path.normpath(entrada)), entrada)]
+
+    planes = []
+    for nombre in sorted(os.listdir(entrada)):
+        carpeta = os.path.join(entrada, nombre)
+        if os.path.isdir(carpeta) and buscar_archivo(carpeta, 'origenes'):
+            planes.append((nombre, carpeta))
+    return planes
+
+
+def a_json(valor):
+    """Convierte tipos de NumPy/pandas a tipos nativos para serializar"""
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return str(valor)
+
+
+def planificar(tarea: dict) -> dict:
+    """
+    Carga, resuelve y exporta un plan (se ejecuta en un proceso del pool)
+
+    Returns:
+        Resumen del plan: estado, métricas y archivos generados
+    """
+    from data_loader import DataLoader
+    from route_optimizer import RouteOptimizer
+    from parallel_solver import solve_standard
+
+    inicio = time.perf_counter()
+    resumen = {'plan': tarea['nombre'], 'estado': 'error', 'archivos': []}
+
+    # Advertencias y errores de los módulos de cálculo, identificados por plan
+    sink = LoggingSink(logging.getLogger(f"rutafacil.{tarea['nombre']}"))
+
+    try:
+        loader = DataLoader(progress_sink=sink)
+        archivos = {tipo: buscar_archivo(tarea['carpeta'], tipo) for tipo in NOMBRES_ARCHIVOS}
+        for tipo in ('origenes', 'destinos', 'flota'):
+            if archivos[tipo] is None:
+                raise ValueError(f"Falta el archivo de {tipo}")
+
+        if loader.load_origenes(archivos['origenes']) is None:
+            raise ValueError("No se pudo cargar el archivo de orígenes")
+        if loader.load_destinos(archivos['destinos']) is None:
+            raise ValueError("No se pudo cargar el archivo de destinos")
+        if loader.load_flota(archivos['flota']) is None:
+            raise ValueError("No se pudo cargar el archivo de flota")
+        if archivos['config'] is not None:
+            loader.load_config(archivos['config'])
+
+        valido, mensaje = loader.validate_all_loaded()
+        if not valido:
+            raise ValueError(mensaje)
+
+        optimizer = RouteOptimizer(
+            loader.origenes,
+            loader.destinos,
+            loader.flota,
+            loader.config or DEFAULT_CONFIG,
+            optimization_type=tarea['objetivo'],
+            distance_method=tarea['metodo_distancia'],
+            google_api_key_directions=os.getenv('GOOGLE_MAPS_API_KEY'),
+            progress_sink=sink
+        )
+        # Los planes ya corren en paralelo: las regiones independientes se resuelven en serie
+        solution = solve_standard(optimizer, time_limit_seconds=tarea['tiempo'], max_workers=1)
+        if not solution:
+            raise ValueError("No se encontró solución factible")
+
+        base = os.path.join(tarea['salida'], f"{tarea['nombre']}_{tarea['marca_tiempo']}")
+        if tarea['formato'] in ('excel', 'ambos'):
+            if optimizer.export_to_excel(f"{base}.xlsx"):
+                resumen['archivos'].append(f"{base}.xlsx")
+        if tarea['formato'] in ('json', 'ambos'):
+            with open(f"{base}.json", 'w', encoding='utf-8') as f:
+                json.dump(solution, f, ensure_ascii=False, indent=2, default=a_json)
+            resumen['archivos'].append(f"{base}.json")
+
+        metricas = optimizer.compute_solution_metrics(solution)
+        resumen.update({
+            'estado': 'ok',
+            'distancia_km': round(metricas['distancia_km'], 2),
+            'vehiculos': metricas['vehiculos'],
+            'no_asignados': metricas['no_asignados']
+        })
+
+    except Exception as e:
+        resumen['error'] = str(e)
+
+    resumen['segundos'] = round(time.perf_counter() - inicio, 1)
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planificación de rutas por lotes sin interfaz")
+    parser.add_argument('entrada', help="Carpeta con un plan o con una subcarpeta por plan")
+    parser.add_argument('--salida', default='output', help="Carpeta de resultados (por defecto output/)")
+    parser.add_argument('--tiempo', type=int, default=60, help="Tiempo límite por plan en segundos")
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1, help="Planes resueltos en paralelo")
+    parser.add_argument('--objetivo', default='distancia', choices=list(OPTIMIZATION_TYPES.keys()),
+                        help="Tipo de optimización")
+    parser.add_argument('--metodo-distancia', default='haversine', choices=list(DISTANCE_METHODS.keys()),
+                        help="Método de cálculo de distancias (google_directions usa GOOGLE_MAPS_API_KEY)")
+    parser.add_argument('--formato', default='ambos', choices=['excel', 'json', 'ambos'],
+                        help="Formato de los resultados")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='⚠️ %(name)s: %(message)s')
+
+    if not os.path.isdir(args.entrada):
+        print(f"❌ No existe la carpeta de entrada: {args.entrada}")
+        return 1
+
+    planes = descubrir_planes(args.entrada)
+    if not planes:
+        print(f"❌ No se encontraron planes en {args.entrada}")
+        return 1
+
+    os.makedirs(args.salida, exist_ok=True)
+    marca_tiempo = datetime.now().strftime('%Y%m%d_%H%M%S')
+    tareas = [{
+        'nombre': nombre,
+        'carpeta': carpeta,
+        'salida': args.salida,
+        'tiempo': args.tiempo,
+        'objetivo': args.objetivo,
+        'metodo_distancia': args.metodo_distancia,
+        'formato': args.formato,
+        'marca_tiempo': marca_tiempo
+    } for nombre, carpeta in planes]
+
+    print(f"🚚 {len(tareas)} planes, {args.procesos} procesos, {args.tiempo}s por plan\n")
+
+    resumenes = []
+    with ProcessPoolExecutor(max_workers=max(1, args.procesos)) as executor:
+        futures = [executor.submit(planificar, tarea) for tarea in tareas]
+        for future in as_completed(futures):
+            resumen = future.result()
+            resumenes.append(resumen)
+            if resumen['estado'] == 'ok':
+                print(f"✅ {resumen['plan']}: {resumen['distancia_km']} km, {resumen['vehiculos']} vehículos, "
+                      f"{resumen['no_asignados']} sin asignar ({resumen['segundos']}s)")
+            else:
+                print(f"❌ {resumen['plan']}: {resumen['error']} ({resumen['segundos']}s)")
+
+    resumenes.sort(key=lambda r: r['plan'])
+    ruta_resumen = os.path.join(args.salida, f"resumen_lote_{marca_tiempo}.json")
+    with open(ruta_resumen, 'w', encoding='utf-8') as f:
+        json.dump(resumenes, f, ensure_ascii=False, indent=2)
+
+    fallidos = sum(1 for r in resumenes if r['estado'] != 'ok')
+    print(f"\n📄 Resumen: {ruta_resumen}")
+    print(f"Planes resueltos: {len(resumenes) - fallidos}/{len(resumenes)}")
+    return 1 if fallidos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
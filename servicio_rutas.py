@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Servicio HTTP local de ruteo (sin interfaz)
+
+Recibe orígenes, destinos y flota en JSON, encola el trabajo en una cola
+persistente (SQLite) y un pool de procesos lo resuelve con DataLoader +
+RouteOptimizer. No necesita servicios externos: un solo equipo Linux.
+
+Endpoints:
+    POST /trabajos                 Encola un plan; responde 202 con el id
+    GET  /trabajos/<id>            Estado, avance y resultado (al terminar)
+    GET  /trabajos/<id>/eventos    Avance en vivo (Server-Sent Events)
+    GET  /salud                    Trabajos por estado y workers vivos
+
+Cuerpo de POST /trabajos:
+    {
+        "origenes": [{"origen_id": "O1", "nombre_origen": "...", "direccion": "...",
+                      "ciudad": "...", "pais": "...", "latitud": 6.25, "longitud": -75.56}],
+        "destinos": [{"destino_id": "D1", "nombre_cliente": "...", ..., "demanda": 10}],
+        "flota": [{"vehiculo_id": "V1", "capacidad": 100, "origen_id": "O1"}],
+        "configuracion": {"velocidad_promedio_kmh": 30},      (opcional)
+        "objetivo": "distancia",                              (opcional)
+        "modo": "monolitico",                                 (opcional)
+        "metodo_distancia": "haversine",                      (opcional)
+        "tiempo_limite": 60                                   (opcional)
+    }
+
+Uso:
+    python servicio_rutas.py --puerto 8600 --workers 4
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from config import OPTIMIZATION_TYPES, DISTANCE_METHODS, SOLVER_MODES, DEFAULT_CONFIG, SERVICE_CONFIG
+from job_queue import JobQueue, JobProgressSink
+from progress import ThrottledSink
+
+RUTA_TRABAJO = re.compile(r'^/trabajos/([0-9a-f]{32})(/eventos)?$')
+ESTADOS_FINALES = ('terminado', 'error')
+
+logger = logging.getLogger('rutafacil.servicio')
+
+
+def validar_solicitud(solicitud) -> dict:
+    """
+    Valida el cuerpo de POST /trabajos y completa los valores por defecto
+
+    Raises:
+        ValueError: Si falta un campo o un valor no es válido
+    """
+    if not isinstance(solicitud, dict):
+        raise ValueError("El cuerpo debe ser un objeto JSON")
+
+    for campo in ('origenes', 'destinos', 'flota'):
+        registros = solicitud.get(campo)
+        if not isinstance(registros, list) or not registros or not all(isinstance(r, dict) for r in registros):
+            raise ValueError(f"'{campo}' debe ser una lista no vacía de objetos")
+
+    configuracion = solicitud.get('configuracion') or {}
+    if not isinstance(configuracion, dict):
+        raise ValueError("'configuracion' debe ser un objeto")
+
+    objetivo = solicitud.get('objetivo', 'distancia')
+    if objetivo not in OPTIMIZATION_TYPES:
+        raise ValueError(f"'objetivo' debe ser uno de {list(OPTIMIZATION_TYPES)}")
+
+    modo = solicitud.get('modo', 'monolitico')
+    if modo not in SOLVER_MODES:
+        raise ValueError(f"'modo' debe ser uno de {list(SOLVER_MODES)}")
+
+    metodo = solicitud.get('metodo_distancia', 'haversine')
+    if metodo not in DISTANCE_METHODS:
+        raise ValueError(f"'metodo_distancia' debe ser uno de {list(DISTANCE_METHODS)}")
+
+    try:
+        tiempo = int(solicitud.get('tiempo_limite', 60))
+    except (TypeError, ValueError):
+        raise ValueError("'tiempo_limite' debe ser un número entero de segundos")
+    if not 1 <= tiempo <= SERVICE_CONFIG['tiempo_limite_max_s']:
+        raise ValueError(f"'tiempo_limite' debe estar entre 1 y {SERVICE_CONFIG['tiempo_limite_max_s']} segundos")
+
+    return {
+        'origenes': solicitud['origenes'],
+        'destinos': solicitud['destinos'],
+        'flota': solicitud['flota'],
+        'configuracion': configuracion,
+        'objetivo': objetivo,
+        'modo': modo,
+        'metodo_distancia': metodo,
+        'tiempo_limite': tiempo
+    }
+
+
+def resolver(solicitud: dict, sink: JobProgressSink) -> dict:
+    """
+    Carga, valida y resuelve un plan; publica el avance en el trabajo
+
+    Returns:
+        {'solucion': ..., 'metricas': ...}
+    """
+    from data_loader import DataLoader
+    from route_optimizer import RouteOptimizer
+    from parallel_solver import solve_by_depot, solve_portfolio, solve_standard
+    from solve_monitor import SolveMonitor
+
+    receptor = ThrottledSink(sink)
+
+    sink.set(etapa='carga')
+    loader = DataLoader(progress_sink=receptor)
+    for tipo, cargar in (('origenes', loader.load_origenes), ('destinos', loader.load_destinos),
+                         ('flota', loader.load_flota)):
+        if cargar(solicitud[tipo]) is None:
+            errores = [m['mensaje'] for m in sink.estado['mensajes'] if m['nivel'] == 'error']
+            raise ValueError(errores[-1] if errores else f"No se pudieron cargar los {tipo}")
+
+    valido, mensaje = loader.validate_all_loaded()
+    if not valido:
+        raise ValueError(mensaje)
+
+    optimizer = RouteOptimizer(
+        loader.origenes,
+        loader.destinos,
+        loader.flota,
+        {**DEFAULT_CONFIG, **solicitud['configuracion']},
+        optimization_type=solicitud['objetivo'],
+        distance_method=solicitud['metodo_distancia'],
+        google_api_key_directions=os.getenv('GOOGLE_MAPS_API_KEY'),
+        progress_sink=receptor
+    )
+
+    sink.set(etapa='matrices')
+    optimizer.create_distance_matrix()
+
+    sink.set(etapa='optimizacion', fraccion=None)
+    tiempo = solicitud['tiempo_limite']
+    if solicitud['modo'] == 'descomposicion':
+        solution = solve_by_depot(optimizer, time_limit_seconds=tiempo)
+    elif solicitud['modo'] == 'portafolio':
+        solution = solve_portfolio(optimizer, time_limit_seconds=tiempo)
+    else:
+        monitor = SolveMonitor(progress_callback=lambda estado: sink.set(
+            transcurrido_s=round(estado['transcurrido_s'], 1),
+            soluciones=estado['soluciones'],
+            mejor_objetivo=estado['mejor_objetivo']
+        ))
+        solution = solve_standard(optimizer, time_limit_seconds=tiempo, monitor=monitor)
+
+    if not solution:
+        raise ValueError("No se encontró solución factible")
+
+    return {'solucion': solution, 'metricas': optimizer.compute_solution_metrics(solution)}
+
+
+def ciclo_worker(ruta_cola: str, nombre: str):
+    """Proceso de trabajo: toma trabajos de la cola y los resuelve hasta que lo terminen"""
+    cola = JobQueue(ruta_cola)
+    while True:
+        tomado = cola.claim(nombre)
+        if tomado is None:
+            time.sleep(SERVICE_CONFIG['intervalo_sondeo_s'])
+            continue
+
+        job_id, solicitud = tomado
+        sink = JobProgressSink(cola, job_id)
+        try:
+            cola.complete(job_id, resolver(solicitud, sink))
+        except Exception as e:
+            logger.debug(traceback.format_exc())
+            cola.fail(job_id, str(e))
+
+
+class WorkerPool:
+    """
+    Procesos de trabajo; un hilo vigilante reinicia los que mueren y reencola su trabajo
+
+    Los workers no son daemon: los modos paralelos (por depósito, portafolio,
+    regiones) abren su propio pool de procesos, y un proceso daemon no puede
+    tener hijos. Por eso se detienen explícitamente con stop().
+    """
+
+    def __init__(self, ruta_cola: str, cantidad: int):
+        self.ruta_cola = ruta_cola
+        self.cola = JobQueue(ruta_cola)
+        self.procesos = {}
+        self.detenido = threading.Event()
+        for i in range(cantidad):
+            self._iniciar(f"worker-{i + 1}")
+        threading.Thread(target=self._vigilar, daemon=True).start()
+
+    def _iniciar(self, nombre: str):
+        proceso = multiprocessing.Process(target=ciclo_worker, args=(self.ruta_cola, nombre),
+                                          name=nombre, daemon=False)
+        proceso.start()
+        self.procesos[nombre] = proceso
+
+    def _vigilar(self):
+        while not self.detenido.wait(5):
+            for nombre, proceso in list(self.procesos.items()):
+                if not proceso.is_alive() and not self.detenido.is_set():
+                    reencolados = self.cola.requeue(nombre)
+                    logger.warning("%s terminó (código %s); %d trabajos reencolados", nombre, proceso.exitcode, reencolados)
+                    self._iniciar(nombre)
+
+    def vivos(self) -> int:
+        return sum(1 for p in self.procesos.values() if p.is_alive())
+
+    def stop(self, espera_s: float = 5):
+        """Termina los workers (y los fuerza si no salen a tiempo) sin reiniciarlos"""
+        self.detenido.set()
+        for proceso in self.procesos.values():
+            proceso.terminate()
+        for proceso in self.procesos.values():
+            proceso.join(espera_s)
+            if proceso.is_alive():
+                proceso.kill()
+                proceso.join()
+
+
+class RutasHandler(BaseHTTPRequestHandler):
+    """Atiende la API JSON; la cola y el pool se asignan como atributos del servidor"""
+
+    server_version = 'RutaFacil/2.2'
+
+    def log_message(self, formato, *args):
+        logger.info("%s %s", self.address_string(), formato % args)
+
+    def _json(self, codigo: int, cuerpo: dict):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/trabajos':
+            return self._json(404, {'error': 'Ruta no encontrada'})
+
+        longitud = int(self.headers.get('Content-Length') or 0)
+        if longitud > SERVICE_CONFIG['max_solicitud_mb'] * 1024 * 1024:
+            return self._json(413, {'error': f"El cuerpo supera {SERVICE_CONFIG['max_solicitud_mb']} MB"})
+
+        try:
+            solicitud = validar_solicitud(json.loads(self.rfile.read(longitud) or b'null'))
+        except json.JSONDecodeError:
+            return self._json(400, {'error': 'El cuerpo no es JSON válido'})
+        except ValueError as e:
+            return self._json(400, {'error': str(e)})
+
+        job_id = self.server.cola.enqueue(solicitud)
+        self._json(202, {
+            'id': job_id,
+            'estado': 'en_cola',
+            'estado_url': f"/trabajos/{job_id}",
+            'eventos_url': f"/trabajos/{job_id}/eventos"
+        })
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/salud':
+            return self._json(200, {
+                'estado': 'ok',
+                'trabajos': self.server.cola.stats(),
+                'workers_vivos': self.server.pool.vivos()
+            })
+
+        coincidencia = RUTA_TRABAJO.match(self.path)
+        if coincidencia is None:
+            return self._json(404, {'error': 'Ruta no encontrada'})
+
+        job_id, eventos = coincidencia.groups()
+        trabajo = self.server.cola.get(job_id, incluir_resultado=not eventos)
+        if trabajo is None:
+            return self._json(404, {'error': 'Trabajo no encontrado'})
+
+        if eventos:
+            self._stream(job_id)
+        else:
+            self._json(200, trabajo)
+
+    def _stream(self, job_id: str):
+        """
+        Envía el avance como Server-Sent Events hasta que el trabajo termina
+        Si el trabajo desaparece de la cola se envía un evento 'error' y se cierra
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        anterior = None
+        ultimo_envio = time.monotonic()
+        try:
+            while True:
+                trabajo = self.server.cola.get(job_id, incluir_resultado=False)
+                if trabajo is None:
+                    # Se purgó (o se eliminó) mientras se transmitía
+                    datos = json.dumps({'error': 'Trabajo no encontrado'}, ensure_ascii=False)
+                    self.wfile.write(f"event: error\ndata: {datos}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    return
+                estado = {k: trabajo[k] for k in ('estado', 'posicion_en_cola', 'progreso', 'error')}
+                if estado != anterior:
+                    evento = 'fin' if trabajo['estado'] in ESTADOS_FINALES else 'progreso'
+                    datos = json.dumps(estado, ensure_ascii=False)
+                    self.wfile.write(f"event: {evento}\ndata: {datos}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    anterior, ultimo_envio = estado, time.monotonic()
+                    if evento == 'fin':
+                        return
+                elif time.monotonic() - ultimo_envio > 15:
+                    # Comentario SSE para mantener viva la conexión a través de proxies
+                    self.wfile.write(b": latido\n\n")
+                    self.wfile.flush()
+                    ultimo_envio = time.monotonic()
+                time.sleep(SERVICE_CONFIG['intervalo_sondeo_s'])
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de ruteo con cola persistente")
+    parser.add_argument('--host', default=SERVICE_CONFIG['host'], help="Interfaz de red (por defecto solo local)")
+    parser.add_argument('--puerto', type=int, default=SERVICE_CONFIG['puerto'], help="Puerto HTTP")
+    parser.add_argument('--workers', type=int, default=SERVICE_CONFIG['workers'], help="Procesos que resuelven trabajos")
+    parser.add_argument('--cola', default=None, help="Archivo SQLite de la cola (por defecto en data/cache/)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s: %(message)s')
+
+    cola = JobQueue(args.cola)
+    reencolados = cola.requeue()
+    purgados = cola.purge()
+    if reencolados or purgados:
+        logger.info("%d trabajos interrumpidos reencolados, %d trabajos antiguos eliminados", reencolados, purgados)
+
+    pool = WorkerPool(cola.path, max(1, args.workers))
+    servidor = ThreadingHTTPServer((args.host, args.puerto), RutasHandler)
+    servidor.daemon_threads = True
+    servidor.cola = cola
+    servidor.pool = pool
+
+    print(f"🚚 Servicio de rutas en http://{args.host}:{args.puerto} ({args.workers} workers, cola {cola.path})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        pool.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,473 @@
+"""
+Cachés persistentes en disco (SQLite) para RutaFácil
+Evitan repetir consultas a servicios externos (Google, Nominatim) entre cargas y sesiones
+"""
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import CACHE_CONFIG
+from address_validator import validate_and_standardize_address
+
+
+class _SQLiteCache:
+    """
+    Base común para cachés en SQLite con expiración (TTL) y desalojo LRU
+
+    Cada subclase define su tabla en SCHEMA; la tabla debe tener las columnas
+    'creado' y 'ultimo_acceso' (timestamps epoch) para aplicar las políticas.
+    """
+
+    TABLE = ''
+    SCHEMA = ''
+
+    def __init__(self, path: str, ttl_dias: float, max_entradas: int):
+        self.path = path
+        self.ttl_segundos = float(ttl_dias) * 24 * 3600 if ttl_dias else None
+        self.max_entradas = int(max_entradas) if max_entradas else None
+        self.hits = 0
+        self.misses = 0
+
+        directorio = os.path.dirname(self.path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """
+        Abre una conexión nueva por operación (seguro entre hilos y sesiones)
+        Confirma la transacción al salir sin errores y siempre cierra la conexión
+        """
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _min_creado(self) -> float:
+        """Timestamp mínimo de creación para que una entrada siga vigente"""
+        if self.ttl_segundos is None:
+            return 0.0
+        return time.time() - self.ttl_segundos
+
+    def evict(self) -> int:
+        """
+        Aplica las políticas de desalojo: elimina entradas vencidas (TTL) y,
+        si se supera max_entradas, las menos usadas recientemente (LRU)
+        Retorna el número de entradas eliminadas
+        """
+        eliminadas = 0
+        with self._connect() as conn:
+            if self.ttl_segundos is not None:
+                cur = conn.execute(f"DELETE FROM {self.TABLE} WHERE creado < ?", (self._min_creado(),))
+                eliminadas += cur.rowcount
+
+            if self.max_entradas is not None:
+                total = conn.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+                exceso = total - self.max_entradas
+                if exceso > 0:
+                    cur = conn.execute(
+                        f"DELETE FROM {self.TABLE} WHERE rowid IN ("
+                        f"SELECT rowid FROM {self.TABLE} ORDER BY ultimo_acceso ASC LIMIT ?)",
+                        (exceso,)
+                    )
+                    eliminadas += cur.rowcount
+        return eliminadas
+
+    def clear(self):
+        """Elimina todas las entradas de la caché"""
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.TABLE}")
+
+    def count(self) -> int:
+        """Número de entradas almacenadas"""
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+
+    def stats(self) -> Dict:
+        """Retorna estadísticas de uso de la caché"""
+        consultas = self.hits + self.misses
+        return {
+            'entradas': self.count(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'tasa_aciertos': (self.hits / consultas * 100) if consultas > 0 else 0.0
+        }
+
+
+class DistanceCache(_SQLiteCache):
+    """
+    Caché persistente de resultados de Google Distance Matrix
+
+    La clave es (origen, destino, modo, franja de tráfico), donde origen y
+    destino son coordenadas redondeadas. Solo se guardan elementos con estado OK.
+    """
+
+    TABLE = 'distancias'
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS distancias (
+            origen TEXT NOT NULL,
+            destino TEXT NOT NULL,
+            modo TEXT NOT NULL,
+            trafico TEXT NOT NULL,
+            distancia_m INTEGER NOT NULL,
+            duracion_s INTEGER NOT NULL,
+            creado REAL NOT NULL,
+            ultimo_acceso REAL NOT NULL,
+            PRIMARY KEY (origen, destino, modo, trafico)
+        );
+        CREATE INDEX IF NOT EXISTS idx_distancias_acceso ON distancias (ultimo_acceso);
+    """
+
+    # Máximo de parámetros por consulta IN (...) que acepta SQLite de forma segura
+    _CHUNK = 500
+
+    def __init__(self, path: Optional[str] = None, ttl_dias: Optional[float] = None,
+                 max_entradas: Optional[int] = None, decimales: Optional[int] = None):
+        cfg = CACHE_CONFIG['distancias']
+        self.decimales = int(decimales if decimales is not None else cfg['decimales_coordenadas'])
+        super().__init__(
+            path or os.path.join(CACHE_CONFIG['directorio'], cfg['archivo']),
+            ttl_dias if ttl_dias is not None else cfg['ttl_dias'],
+            max_entradas if max_entradas is not None else cfg['max_entradas']
+        )
+
+    def coord_key(self, lat: float, lon: float) -> str:
+        """Clave de una coordenada redondeada (5 decimales ≈ 1 metro)"""
+        return f"{round(float(lat), self.decimales):.{self.decimales}f},{round(float(lon), self.decimales):.{self.decimales}f}"
+
+    def lookup_matrix(self, coords: Sequence[Tuple[float, float]], modo: str, trafico: str,
+                      coords_destino: Optional[Sequence[Tuple[float, float]]] = None,
+                      registrar_estadisticas: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Busca en caché todos los pares (origen, destino) de una matriz
+
+        Args:
+            coords: Lista de (latitud, longitud) de las filas
+            modo: Modo de viaje (ej. 'driving')
+            trafico: Franja de tráfico (ver RouteOptimizer.get_traffic_bucket)
+            coords_destino: Coordenadas de las columnas (por defecto las mismas filas)
+            registrar_estadisticas: False para consultas de solo estimación (no cuentan
+                hits/misses ni actualizan el último acceso)
+
+        Returns:
+            Tupla (distancias_m, duraciones_s, encontrados) de forma filas × columnas;
+            'encontrados' es una máscara booleana de los pares presentes en caché
+        """
+        square = coords_destino is None
+        coords_destino = coords if square else coords_destino
+        n, m = len(coords), len(coords_destino)
+        distance = np.zeros((n, m), dtype=np.int64)
+        duration = np.zeros((n, m), dtype=np.int64)
+        found = np.zeros((n, m), dtype=bool)
+
+        row_positions: Dict[str, List[int]] = {}
+        for idx, (lat, lon) in enumerate(coords):
+            row_positions.setdefault(self.coord_key(lat, lon), []).append(idx)
+        col_positions: Dict[str, List[int]] = {}
+        for idx, (lat, lon) in enumerate(coords_destino):
+            col_positions.setdefault(self.coord_key(lat, lon), []).append(idx)
+
+        unique_keys = list(row_positions.keys())
+        hit_keys = []
+
+        with self._connect() as conn:
+            for start in range(0, len(unique_keys), self._CHUNK):
+                chunk = unique_keys[start:start + self._CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f"SELECT origen, destino, distancia_m, duracion_s FROM distancias "
+                    f"WHERE modo = ? AND trafico = ? AND creado >= ? AND origen IN ({placeholders})",
+                    [modo, trafico, self._min_creado()] + chunk
+                )
+                for origen, destino, distancia_m, duracion_s in rows:
+                    if destino not in col_positions:
+                        continue
+                    for i in row_positions[origen]:
+                        for j in col_positions[destino]:
+                            distance[i, j] = distancia_m
+                            duration[i, j] = duracion_s
+                            found[i, j] = True
+                    hit_keys.append((origen, destino))
+
+            # Actualizar último acceso para la política LRU (solo en consultas reales)
+            if hit_keys and registrar_estadisticas:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE distancias SET ultimo_acceso = ? WHERE origen = ? AND destino = ? AND modo = ? AND trafico = ?",
+                    [(now, o, d, modo, trafico) for o, d in hit_keys]
+                )
+
+        if not registrar_estadisticas:
+            return distance, duration, found
+
+        # Los pares de un punto consigo mismo no se consultan
+        consultables = ~np.eye(n, dtype=bool) if square else np.ones((n, m), dtype=bool)
+        hits = int((found & consultables).sum())
+        self.hits += hits
+        self.misses += int(consultables.sum()) - hits
+
+        return distance, duration, found
+
+    def export_pairs(self, modo: str = 'driving') -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Todos los pares vigentes de un modo de viaje (para calibrar la línea recta)
+
+        Returns:
+            Tupla (coords_origen (m × 2), coords_destino (m × 2), distancias_m, duraciones_s)
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT origen, destino, distancia_m, duracion_s FROM distancias WHERE modo = ? AND creado >= ?",
+                (modo, self._min_creado())
+            ).fetchall()
+
+        origenes = np.array([[float(v) for v in r[0].split(',')] for r in rows], dtype=float).reshape(-1, 2)
+        destinos = np.array([[float(v) for v in r[1].split(',')] for r in rows], dtype=float).reshape(-1, 2)
+        distancias = np.array([r[2] for r in rows], dtype=float)
+        duraciones = np.array([r[3] for r in rows], dtype=float)
+        return origenes, destinos, distancias, duraciones
+
+    def store(self, entries: List[Tuple[Tuple[float, float], Tuple[float, float], int, int]],
+              modo: str, trafico: str):
+        """
+        Guarda resultados en la caché
+
+        Args:
+            entries: Lista de (coord_origen, coord_destino, distancia_m, duracion_s)
+            modo: Modo de viaje
+            trafico: Franja de tráfico
+        """
+        if not entries:
+            return
+
+        now = time.time()
+        rows = [
+            (self.coord_key(*o), self.coord_key(*d), modo, trafico, int(dist), int(dur), now, now)
+            for o, d, dist, dur in entries
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO distancias "
+                "(origen, destino, modo, trafico, distancia_m, duracion_s, creado, ultimo_acceso) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+        self.evict()
+
+
+class GeocodeCache(_SQLiteCache):
+    """
+    Caché persistente de geocodificación
+
+    La clave es la dirección estandarizada por address_validator más la ciudad
+    y el país, de modo que variantes como 'Cl 80 # 70-15' y 'Calle 80 #70-15'
+    comparten entrada. Se registra el proveedor que resolvió la dirección, la
+    fecha de creación y cuántas veces se ha reutilizado cada entrada.
+    Solo se guardan geocodificaciones exitosas.
+    """
+
+    TABLE = 'geocodificacion'
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS geocodificacion (
+            clave TEXT PRIMARY KEY,
+            direccion TEXT NOT NULL,
+            ciudad TEXT NOT NULL,
+            pais TEXT NOT NULL,
+            latitud REAL NOT NULL,
+            longitud REAL NOT NULL,
+            proveedor TEXT NOT NULL,
+            creado REAL NOT NULL,
+            ultimo_acceso REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_geocodificacion_acceso ON geocodificacion (ultimo_acceso);
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_dias: Optional[float] = None,
+                 max_entradas: Optional[int] = None):
+        cfg = CACHE_CONFIG['geocodificacion']
+        super().__init__(
+            path or os.path.join(CACHE_CONFIG['directorio'], cfg['archivo']),
+            ttl_dias if ttl_dias is not None else cfg['ttl_dias'],
+            max_entradas if max_entradas is not None else cfg['max_entradas']
+        )
+
+    @staticmethod
+    def make_key(direccion: str, ciudad: str, pais: str) -> str:
+        """
+        Construye la clave a partir de la dirección estandarizada, ciudad y país
+        (sin distinguir mayúsculas ni espacios repetidos)
+        """
+        direccion_std, _ = validate_and_standardize_address(str(direccion), str(ciudad), str(pais))
+
+        def normalizar(texto: str) -> str:
+            return ' '.join(str(texto).lower().split())
+
+        return f"{normalizar(direccion_std)}|{normalizar(ciudad)}|{normalizar(pais)}"
+
+    def get(self, direccion: str, ciudad: str, pais: str) -> Optional[Tuple[float, float]]:
+        """
+        Busca una dirección en la caché
+        Retorna (latitud, longitud) o None si no está (o está vencida)
+        """
+        clave = self.make_key(direccion, ciudad, pais)
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT latitud, longitud FROM geocodificacion WHERE clave = ? AND creado >= ?",
+                (clave, self._min_creado())
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            conn.execute(
+                "UPDATE geocodificacion SET ultimo_acceso = ?, hits = hits + 1 WHERE clave = ?",
+                (time.time(), clave)
+            )
+
+        self.hits += 1
+        return row[0], row[1]
+
+    def put(self, direccion: str, ciudad: str, pais: str, latitud: float, longitud: float, proveedor: str):
+        """Guarda una geocodificación exitosa junto con el proveedor que la resolvió"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geocodificacion "
+                "(clave, direccion, ciudad, pais, latitud, longitud, proveedor, creado, ultimo_acceso, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (self.make_key(direccion, ciudad, pais), str(direccion), str(ciudad), str(pais),
+                 float(latitud), float(longitud), proveedor, now, now)
+            )
+
+        self.evict()
+
+    def stats(self) -> Dict:
+        """Estadísticas de uso, incluyendo el número de entradas por proveedor"""
+        stats = super().stats()
+        with self._connect() as conn:
+            stats['por_proveedor'] = dict(conn.execute(
+                "SELECT proveedor, COUNT(*) FROM geocodificacion GROUP BY proveedor"
+            ).fetchall())
+        return stats
+
+
+class SolutionCache(_SQLiteCache):
+    """
+    Caché persistente de soluciones del optimizador
+
+    La clave es la huella del problema completo (ver RouteOptimizer.get_problem_fingerprint)
+    y el valor es el diccionario de extract_solution serializado en JSON. Al ser
+    un archivo SQLite, la comparten todas las sesiones de Streamlit del servidor.
+    """
+
+    TABLE = 'soluciones'
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS soluciones (
+            clave TEXT PRIMARY KEY,
+            solucion TEXT NOT NULL,
+            creado REAL NOT NULL,
+            ultimo_acceso REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_soluciones_acceso ON soluciones (ultimo_acceso);
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_dias: Optional[float] = None,
+                 max_entradas: Optional[int] = None):
+        cfg = CACHE_CONFIG['soluciones']
+        super().__init__(
+            path or os.path.join(CACHE_CONFIG['directorio'], cfg['archivo']),
+            ttl_dias if ttl_dias is not None else cfg['ttl_dias'],
+            max_entradas if max_entradas is not None else cfg['max_entradas']
+        )
+
+    @staticmethod
+    def _to_json(value):
+        """Convierte tipos de NumPy/pandas a tipos nativos para serializar"""
+        if hasattr(value, 'item'):
+            return value.item()
+        return str(value)
+
+    def get(self, clave: str) -> Optional[Dict]:
+        """Retorna la solución guardada para la huella, o None si no está (o está vencida)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT solucion FROM soluciones WHERE clave = ? AND creado >= ?",
+                (clave, self._min_creado())
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            conn.execute(
+                "UPDATE soluciones SET ultimo_acceso = ?, hits = hits + 1 WHERE clave = ?",
+                (time.time(), clave)
+            )
+
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, clave: str, solucion: Dict):
+        """Guarda una solución bajo la huella del problema"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO soluciones (clave, solucion, creado, ultimo_acceso, hits) "
+                "VALUES (?, ?, ?, ?, 0)",
+                (clave, json.dumps(solucion, default=self._to_json), now, now)
+            )
+
+        self.evict()
+
+
+class MemoryLRUCache:
+    """
+    Caché en memoria con desalojo LRU y número máximo de entradas
+    Pensada para guardarse en st.session_state (una por sesión)
+    """
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max(1, int(max_entradas))
+        self._data: 'OrderedDict[object, object]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Retorna el valor y lo marca como usado recientemente"""
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """Guarda un valor y desaloja los menos usados si se supera el máximo"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entradas:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def clear(self):
+        self._data.clear()
@@ -0,0 +1,278 @@
+"""
+Factores de desvío aprendidos de las distancias reales ya pagadas a Google
+La línea recta subestima la distancia por carretera en proporciones muy
+distintas según la ciudad (y entre ciudades). Este módulo aprende, por zona
+de la cuadrícula y por tipo de trayecto (urbano o interurbano), la relación
+carretera / línea recta y la velocidad observadas en la caché de Google, y las
+aplica al método Haversine sin llamadas externas al resolver.
+
+Recalcular los factores desde la caché:
+    python src/calibration.py
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import CACHE_CONFIG, CALCULATION_CONFIG, CALIBRATION_CONFIG
+from distance_engine import haversine_km, haversine_matrix_m
+
+# Tipos de trayecto según la distancia en línea recta
+BANDAS = ('urbano', 'interurbano')
+
+# Calibraciones ya cargadas en este proceso: ruta -> (fecha de modificación, DetourCalibration)
+_CALIBRACIONES_CARGADAS: Dict[str, Tuple[float, 'DetourCalibration']] = {}
+
+
+def default_path() -> str:
+    """Ruta del archivo de calibración dentro de la carpeta de cachés"""
+    return os.path.join(CACHE_CONFIG['directorio'], CALIBRATION_CONFIG['archivo'])
+
+
+class DetourCalibration:
+    """
+    Relación carretera / línea recta y velocidad por zona y tipo de trayecto
+
+    Cada zona es una celda de 'celda_grados' identificada por 'fila,columna'.
+    Un par (i, j) usa el promedio de los factores de las zonas de sus dos
+    extremos; las zonas con pocas muestras usan el valor general del tipo de
+    trayecto y, si tampoco lo hay, factor 1 y la velocidad promedio configurada.
+    """
+
+    def __init__(self, celdas: Dict[str, Dict[str, Dict]], general: Dict[str, Optional[Dict]],
+                 muestras: int, creado: Optional[float] = None, celda_grados: Optional[float] = None,
+                 distancia_interurbana_km: Optional[float] = None):
+        self.celdas = celdas
+        self.general = general
+        self.muestras = muestras
+        self.creado = time.time() if creado is None else creado
+        self.celda_grados = float(celda_grados or CALIBRATION_CONFIG['celda_grados'])
+        self.distancia_interurbana_km = float(distancia_interurbana_km or CALIBRATION_CONFIG['distancia_interurbana_km'])
+
+    @property
+    def firma(self) -> str:
+        """Identifica la versión de la calibración para huellas y reutilización de matrices"""
+        return f"{self.muestras}@{self.creado:.0f}"
+
+    def cell_keys(self, lats, lons) -> np.ndarray:
+        """Clave 'fila,columna' de la zona de cada coordenada"""
+        filas = np.floor(np.asarray(lats, dtype=float) / self.celda_grados).astype(np.int64)
+        columnas = np.floor(np.asarray(lons, dtype=float) / self.celda_grados).astype(np.int64)
+        return np.array([f"{f},{c}" for f, c in zip(filas, columnas)], dtype=object)
+
+    @classmethod
+    def fit(cls, origenes: np.ndarray, destinos: np.ndarray, distancias_m: np.ndarray,
+            duraciones_s: np.ndarray) -> 'DetourCalibration':
+        """
+        Aprende los factores a partir de pares con distancia y duración reales
+
+        Se usa la mediana (robusta frente a rodeos atípicos) de cada zona; cada par
+        cuenta para la zona de su origen y, si es distinta, la de su destino.
+
+        Args:
+            origenes, destinos: Coordenadas (m × 2) de cada par
+            distancias_m, duraciones_s: Distancia y duración por carretera de cada par
+        """
+        cfg = CALIBRATION_CONFIG
+        calibracion = cls({banda: {} for banda in BANDAS}, {banda: None for banda in BANDAS}, 0)
+
+        origenes = np.asarray(origenes, dtype=float).reshape(-1, 2)
+        destinos = np.asarray(destinos, dtype=float).reshape(-1, 2)
+        distancias_m = np.asarray(distancias_m, dtype=float)
+        duraciones_s = np.asarray(duraciones_s, dtype=float)
+
+        recta_m = haversine_km(origenes[:, 0], origenes[:, 1], destinos[:, 0], destinos[:, 1]) * 1000
+        validos = (recta_m >= cfg['min_distancia_m']) & (distancias_m > 0) & (duraciones_s > 0)
+        if not validos.any():
+            return calibracion
+
+        origenes, destinos = origenes[validos], destinos[validos]
+        recta_m, distancias_m, duraciones_s = recta_m[validos], distancias_m[validos], duraciones_s[validos]
+
+        muestras = pd.DataFrame({
+            'banda': np.where(recta_m >= calibracion.distancia_interurbana_km * 1000, BANDAS[1], BANDAS[0]),
+            'factor': np.clip(distancias_m / recta_m, cfg['factor_min'], cfg['factor_max']),
+            'velocidad_kmh': np.clip((distancias_m / 1000) / (duraciones_s / 3600),
+                                     cfg['velocidad_min_kmh'], cfg['velocidad_max_kmh']),
+            'celda_origen': calibracion.cell_keys(origenes[:, 0], origenes[:, 1]),
+            'celda_destino': calibracion.cell_keys(destinos[:, 0], destinos[:, 1])
+        })
+        calibracion.muestras = len(muestras)
+
+        for banda, grupo in muestras.groupby('banda'):
+            calibracion.general[banda] = {
+                'factor': float(grupo['factor'].median()),
+                'velocidad_kmh': float(grupo['velocidad_kmh'].median()),
+                'muestras': int(len(grupo))
+            }
+
+        por_celda = pd.concat([
+            muestras.rename(columns={'celda_origen': 'celda'}),
+            muestras[muestras['celda_destino'] != muestras['celda_origen']].rename(columns={'celda_destino': 'celda'})
+        ], ignore_index=True)
+        resumen = por_celda.groupby(['banda', 'celda']).agg(
+            factor=('factor', 'median'), velocidad_kmh=('velocidad_kmh', 'median'), muestras=('factor', 'size')
+        ).reset_index()
+        resumen = resumen[resumen['muestras'] >= cfg['min_muestras_celda']]
+
+        for fila in resumen.itertuples(index=False):
+            calibracion.celdas[fila.banda][fila.celda] = {
+                'factor': float(fila.factor),
+                'velocidad_kmh': float(fila.velocidad_kmh),
+                'muestras': int(fila.muestras)
+            }
+
+        return calibracion
+
+    @classmethod
+    def from_cache(cls, cache=None, modo: str = 'driving') -> 'DetourCalibration':
+        """Aprende los factores de todos los pares vigentes de la caché de distancias"""
+        if cache is None:
+            from cache import DistanceCache
+            cache = DistanceCache()
+        return cls.fit(*cache.export_pairs(modo))
+
+    def save(self, path: Optional[str] = None):
+        path = path or default_path()
+        directorio = os.path.dirname(path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'creado': self.creado,
+                'muestras': self.muestras,
+                'celda_grados': self.celda_grados,
+                'distancia_interurbana_km': self.distancia_interurbana_km,
+                'general': self.general,
+                'celdas': self.celdas
+            }, f, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> 'DetourCalibration':
+        with open(path or default_path(), encoding='utf-8') as f:
+            datos = json.load(f)
+        return cls(datos['celdas'], datos['general'], datos['muestras'], datos['creado'],
+                   datos['celda_grados'], datos['distancia_interurbana_km'])
+
+    def node_parameters(self, lats, lons, velocidad_defecto_kmh: float) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Factor y velocidad de cada nodo por tipo de trayecto
+
+        Returns:
+            {banda: (factores (n,), velocidades_kmh (n,))}
+        """
+        claves = self.cell_keys(lats, lons)
+        parametros = {}
+        for banda in BANDAS:
+            general = self.general.get(banda) or {'factor': 1.0, 'velocidad_kmh': velocidad_defecto_kmh}
+            celdas = self.celdas.get(banda, {})
+            valores = [celdas.get(clave, general) for clave in claves]
+            parametros[banda] = (
+                np.array([v['factor'] for v in valores], dtype=float),
+                np.array([v['velocidad_kmh'] for v in valores], dtype=float)
+            )
+        return parametros
+
+    def apply(self, lats, lons, lats_dest=None, lons_dest=None, velocidad_defecto_kmh: Optional[float] = None,
+              block_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distancias y duraciones estimadas (línea recta × factor de cada zona)
+
+        Args:
+            lats, lons: Coordenadas de las filas
+            lats_dest, lons_dest: Coordenadas de las columnas (por defecto las filas)
+            velocidad_defecto_kmh: Velocidad para zonas sin datos
+            block_size: Filas por bloque
+
+        Returns:
+            (distancias_m, duraciones_s) enteras de forma filas × columnas
+        """
+        if velocidad_defecto_kmh is None:
+            velocidad_defecto_kmh = CALCULATION_CONFIG['velocidad_promedio_kmh']
+        cuadrada = lats_dest is None
+        if cuadrada:
+            lats_dest, lons_dest = lats, lons
+
+        filas = self.node_parameters(lats, lons, velocidad_defecto_kmh)
+        columnas = filas if cuadrada else self.node_parameters(lats_dest, lons_dest, velocidad_defecto_kmh)
+        recta_m = haversine_matrix_m(lats, lons, None if cuadrada else lats_dest, None if cuadrada else lons_dest,
+                                     block_size=block_size)
+
+        distancias = np.empty(recta_m.shape, dtype=np.int64)
+        duraciones = np.empty(recta_m.shape, dtype=np.int64)
+        umbral_m = self.distancia_interurbana_km * 1000
+
+        for inicio in range(0, len(recta_m), block_size):
+            fin = inicio + block_size
+            recta = recta_m[inicio:fin].astype(float)
+            interurbano = recta >= umbral_m
+            factor = np.empty_like(recta)
+            velocidad = np.empty_like(recta)
+            for banda, seleccion in ((BANDAS[0], ~interurbano), (BANDAS[1], interurbano)):
+                factor_fila, velocidad_fila = filas[banda]
+                factor_columna, velocidad_columna = columnas[banda]
+                promedio = (factor_fila[inicio:fin, None] + factor_columna[None, :]) / 2
+                factor[seleccion] = promedio[seleccion]
+                promedio = (velocidad_fila[inicio:fin, None] + velocidad_columna[None, :]) / 2
+                velocidad[seleccion] = promedio[seleccion]
+
+            distancia_m = recta * factor
+            distancias[inicio:fin] = distancia_m.astype(np.int64)
+            duraciones[inicio:fin] = (distancia_m / 1000 / velocidad * 3600).astype(np.int64)
+
+        return distancias, duraciones
+
+    def summary(self) -> Dict:
+        """Resumen para mostrar: muestras, zonas con factor propio y factores generales"""
+        return {
+            'muestras': self.muestras,
+            'zonas': {banda: len(self.celdas.get(banda, {})) for banda in BANDAS},
+            'general': self.general
+        }
+
+
+def load_calibration(path: Optional[str] = None) -> Optional[DetourCalibration]:
+    """
+    Carga la calibración guardada (una vez por proceso mientras el archivo no cambie)
+    Retorna None si todavía no se ha calculado
+    """
+    path = path or default_path()
+    if not os.path.isfile(path):
+        return None
+    modificado = os.path.getmtime(path)
+    cargada = _CALIBRACIONES_CARGADAS.get(path)
+    if cargada is None or cargada[0] != modificado:
+        cargada = (modificado, DetourCalibration.load(path))
+        _CALIBRACIONES_CARGADAS[path] = cargada
+    return cargada[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aprende factores de desvío por zona desde la caché de distancias de Google")
+    parser.add_argument('--cache', default=None, help="Archivo SQLite de la caché de distancias (por defecto el configurado)")
+    parser.add_argument('--salida', default=default_path(), help="Archivo JSON de salida")
+    args = parser.parse_args()
+
+    from cache import DistanceCache
+    calibracion = DetourCalibration.from_cache(DistanceCache(path=args.cache))
+    if calibracion.muestras == 0:
+        print("⚠️ La caché no tiene pares suficientes para calibrar")
+        return 1
+
+    calibracion.save(args.salida)
+    resumen = calibracion.summary()
+    print(f"✅ Calibración guardada en {args.salida} con {resumen['muestras']} pares")
+    for banda in BANDAS:
+        general = resumen['general'].get(banda)
+        if general:
+            print(f"   {banda}: factor {general['factor']:.2f}, {general['velocidad_kmh']:.0f} km/h, "
+                  f"{resumen['zonas'][banda]} zonas con factor propio")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -120,7 +120,98 @@ CALCULATION_CONFIG = {
     'velocidad_promedio_kmh': 40,  # Velocidad promedio urbana en km/h
     'tiempo_servicio_min': 10,  # Tiempo promedio por parada en minutos
     'costo_km_default': 2.5,  # Costo por km si no está especificado en el vehículo (en unidad monetaria local)
-    'costo_fijo_vehiculo': 50  # Costo fijo por usar un vehículo
+    'costo_fijo_vehiculo': 50,  # Costo fijo por usar un vehículo
+    'haversine_dtype': 'float64',  # Precisión del cálculo Haversine: 'float64' (exacto) o 'float32' (menos memoria)
+    'haversine_block_size': 1024,  # Filas por bloque al construir la matriz Haversine
+    'usar_matrices_nativas': True,  # Registrar matrices en OR-Tools (C++) en lugar de callbacks de Python
+    'estrategia_inicial': 'PATH_CHEAPEST_ARC',  # FirstSolutionStrategy de OR-Tools
+    'estrategia_inicial_arcos_vecinos': 'SAVINGS',  # Estrategia inicial por defecto con arcos_vecinos_k > 0
+    'metaheuristica': 'GUIDED_LOCAL_SEARCH',  # LocalSearchMetaheuristic de OR-Tools
+    'insercion_factor_desvio': 1.0,  # Pedidos tardíos: desvío máximo relativo a ida y vuelta desde el depósito más cercano
+    'arcos_vecinos_k': 0,  # Sucesores posibles de cada destino (k vecinos más cercanos + depósito); 0 = todos los arcos
+    'arcos_vecinos_umbral_destinos': 500  # A partir de este tamaño se sugiere limitar los arcos a vecinos cercanos
+}
+
+# Preproceso del modelo (antes de construirlo en OR-Tools)
+PRESOLVE_CONFIG = {
+    'activo': True,  # Detectar destinos infactibles y calcular cotas de vehículos
+    'podar_flota': True,  # Quitar vehículos idénticos sobrantes (más allá de la cota + margen)
+    'margen_vehiculos': 2,  # Vehículos extra que se conservan por grupo idéntico, además de la cota
+    'margen_relativo': 0.2,  # Margen adicional proporcional a la cota (se usa el mayor de los dos)
+    'romper_simetria': True  # Entre vehículos idénticos, usar uno solo si el anterior ya se usa
+}
+
+# Modos de resolución del VRP
+SOLVER_MODES = {
+    'monolitico': {
+        'nombre': 'Estándar',
+        'descripcion': 'Un solo modelo con todos los orígenes, destinos y vehículos'
+    },
+    'descomposicion': {
+        'nombre': 'Por depósito (paralelo)',
+        'descripcion': 'Agrupa los destinos por depósito según cercanía y capacidad, y resuelve cada grupo en un proceso separado. Recomendado con más de 300 destinos'
+    },
+    'portafolio': {
+        'nombre': 'Portafolio (multi-inicio)',
+        'descripcion': 'Ejecuta varias estrategias de búsqueda al mismo tiempo en procesos separados y se queda con la mejor'
+    }
+}
+
+# Parámetros de la resolución por descomposición (un subproblema por depósito)
+DECOMPOSITION_CONFIG = {
+    'max_procesos': None,  # Procesos simultáneos (None = número de CPUs)
+    'umbral_destinos_recomendado': 300,  # A partir de este tamaño se sugiere el modo por depósito
+    'separar_regiones': False,  # Modo estándar: resolver por separado regiones independientes (ej. dos ciudades); heurística, un vehículo no cruza de región
+    'distancia_separacion_km': 50  # Dos regiones son independientes si ningún par de sus puntos está más cerca
+}
+
+# Portafolio de estrategias (modo multi-inicio): se ejecutan en orden de prioridad
+# hasta completar el número de procesos disponibles
+PORTFOLIO_CONFIG = {
+    'max_procesos': None,  # Procesos simultáneos (None = número de CPUs)
+    'configuraciones': [
+        {'estrategia_inicial': 'PATH_CHEAPEST_ARC', 'metaheuristica': 'GUIDED_LOCAL_SEARCH'},
+        {'estrategia_inicial': 'PARALLEL_CHEAPEST_INSERTION', 'metaheuristica': 'GUIDED_LOCAL_SEARCH'},
+        {'estrategia_inicial': 'SAVINGS', 'metaheuristica': 'GUIDED_LOCAL_SEARCH'},
+        {'estrategia_inicial': 'PATH_CHEAPEST_ARC', 'metaheuristica': 'SIMULATED_ANNEALING'},
+        {'estrategia_inicial': 'LOCAL_CHEAPEST_INSERTION', 'metaheuristica': 'TABU_SEARCH'},
+        {'estrategia_inicial': 'CHRISTOFIDES', 'metaheuristica': 'GUIDED_LOCAL_SEARCH'},
+        {'estrategia_inicial': 'PATH_MOST_CONSTRAINED_ARC', 'metaheuristica': 'GENERIC_TABU_SEARCH'},
+        {'estrategia_inicial': 'AUTOMATIC', 'metaheuristica': 'AUTOMATIC'},
+    ]
+}
+
+# Monitor de la búsqueda: actualizaciones en vivo y parada por estancamiento
+SOLVE_MONITOR_CONFIG = {
+    'parada_temprana': True,  # Detener cuando el objetivo deja de mejorar
+    'mejora_minima_pct': 0.5,  # Mejora mínima (%) exigida dentro de la ventana
+    'ventana_s': 30,  # Segundos sin mejora suficiente antes de detener
+    'intervalo_actualizacion_s': 1.0,  # Frecuencia máxima de actualización de la interfaz
+    'intervalo_vigilancia_s': 0.5  # Revisión de cancelación y estancamiento sin esperar soluciones
+}
+
+# Ejecutor de optimizaciones en segundo plano (compartido por todas las sesiones del servidor)
+JOB_EXECUTOR_CONFIG = {
+    'max_trabajos_simultaneos': 2,  # Optimizaciones ejecutándose a la vez
+    'max_cola': 20,  # Optimizaciones en espera antes de rechazar nuevas
+    'retener_resultados_s': 3600  # Resultados no recogidos se descartan después de este tiempo
+}
+
+# Servicio HTTP de ruteo (servicio_rutas.py)
+SERVICE_CONFIG = {
+    'host': '127.0.0.1',  # Solo acceso local; usar 0.0.0.0 para exponerlo en la red
+    'puerto': 8600,
+    'workers': 2,  # Procesos que resuelven trabajos en paralelo
+    'archivo_cola': 'trabajos.sqlite',  # Cola persistente (en CACHE_CONFIG['directorio'])
+    'retener_dias': 7,  # Trabajos finalizados que se conservan para consulta
+    'max_solicitud_mb': 5,  # Tamaño máximo del cuerpo JSON
+    'tiempo_limite_max_s': 600,  # Tiempo límite máximo aceptado por trabajo
+    'intervalo_sondeo_s': 1.0  # Espera de los workers con la cola vacía y de los eventos SSE
+}
+
+# Reporte de avance (barras de progreso de geocodificación y matrices de Google)
+PROGRESS_CONFIG = {
+    'actualizaciones_por_segundo': 4  # Máximo de actualizaciones de la barra por segundo
 }
 
 # Métodos de cálculo de distancia
@@ -139,9 +230,67 @@ DISTANCE_METHODS = {
         'desventajas': 'Requiere API key, tiene costos, más lento',
         'requiere_api': True,
         'costo_por_request': 0.005  # $5 USD por 1000 requests
+    },
+    'osm_local': {
+        'nombre': 'Red vial local (OpenStreetMap)',
+        'descripcion': 'Calcula la ruta más corta sobre un mapa de OpenStreetMap guardado en el equipo',
+        'ventajas': 'Distancias por carretera, sin costos ni internet, rápido con miles de paradas',
+        'desventajas': 'Requiere preparar el mapa de la ciudad; tiempos estimados por tipo de vía (sin tráfico)',
+        'requiere_api': False
     }
 }
 
+# Red vial local construida desde un extracto de OpenStreetMap (src/road_network.py)
+ROAD_NETWORK_CONFIG = {
+    'archivo_grafo': 'data/osm/red_vial.npz',  # Grafo preprocesado (python src/road_network.py mapa.osm)
+    'velocidades_kmh': {  # Vías transitables y su velocidad cuando no tienen 'maxspeed'
+        'motorway': 80, 'motorway_link': 50,
+        'trunk': 70, 'trunk_link': 45,
+        'primary': 50, 'primary_link': 35,
+        'secondary': 40, 'secondary_link': 30,
+        'tertiary': 35, 'tertiary_link': 25,
+        'unclassified': 30, 'residential': 25,
+        'living_street': 10, 'service': 15
+    },
+    'velocidad_acceso_kmh': 15,  # Tramo en línea recta entre la parada y el nodo vial más cercano
+    'max_distancia_snap_m': 3000,  # Paradas más lejos de la red se consideran fuera del mapa
+    'factor_desvio_sin_ruta': 1.4,  # Pares sin ruta en el grafo: línea recta × este factor
+    'celda_indice_grados': 0.01,  # Tamaño de celda del índice espacial (~1.1 km)
+    'min_fuentes_paralelo': 64,  # Desde cuántos orígenes de Dijkstra se reparte en procesos
+    'max_procesos': None  # Procesos para Dijkstra (None = número de CPUs)
+}
+
+# Parámetros de la Distance Matrix API (Google Directions)
+GOOGLE_DIRECTIONS_CONFIG = {
+    'max_origenes_por_request': 25,  # Límite de Google por request
+    'max_destinos_por_request': 25,  # Límite de Google por request
+    'max_elementos_por_request': 100,  # Límite de Google: orígenes × destinos por request
+    'workers': 4,  # Bloques descargados en paralelo
+    'max_requests_por_segundo': 10,
+    'max_elementos_por_segundo': 1000,  # Límite de Google de elementos por segundo
+    'max_reintentos': 3,  # Intentos por bloque ante errores transitorios
+    'backoff_base_s': 1,
+    'backoff_max_s': 16,
+    'vecinos_k': 0,  # Pares consultados por destino (k vecinos más cercanos + depósitos); 0 = todos los pares
+    'factor_desvio': 1.3  # Pares no consultados: distancia en línea recta × factor de desvío
+}
+
+# Factores de desvío aprendidos de la caché de Google (src/calibration.py)
+# Corrigen la línea recta (Haversine) con la relación carretera / línea recta y la
+# velocidad observadas en cada zona, sin llamadas externas al resolver
+CALIBRATION_CONFIG = {
+    'archivo': 'calibracion_desvios.json',  # Dentro de CACHE_CONFIG['directorio']
+    'aplicar_en_haversine': True,  # Usar los factores con el método Haversine si existen
+    'celda_grados': 0.1,  # Tamaño de la zona (~11 km)
+    'distancia_interurbana_km': 30,  # Pares más largos usan los factores interurbanos
+    'min_distancia_m': 300,  # Pares más cortos distorsionan la relación y se ignoran
+    'min_muestras_celda': 30,  # Zonas con menos pares usan el factor general
+    'factor_min': 1.0,
+    'factor_max': 3.0,
+    'velocidad_min_kmh': 5,
+    'velocidad_max_kmh': 120
+}
+
 # Métodos de geocodificación
 GEOCODING_METHODS = {
     'nominatim': {
@@ -173,12 +322,51 @@ GEOCODING_CONFIG = {
     'google_maps': {
         'api_key_env_var': 'GOOGLE_MAPS_API_KEY',  # Variable de entorno
         'region': 'CO',  # Código del país por defecto
-        'timeout': 10
+        'timeout': 10,
+        'max_qps': 40,  # Consultas por segundo permitidas (Google tolera tasas altas)
+        'workers': 8,  # Hilos concurrentes en la geocodificación por lotes
+        'max_retries': 3,
+        'backoff_base_s': 0.5,  # Espera inicial del backoff exponencial
+        'backoff_max_s': 8
     },
     'nominatim': {
         'user_agent': 'mvp_ruteo_app',
         'timeout': 10,
         'max_retries': 3,
-        'delay_between_requests': 1
+        'delay_between_requests': 1,  # Política de uso de Nominatim: máximo 1 consulta por segundo
+        'workers': 1,
+        'backoff_base_s': 1,
+        'backoff_max_s': 16
+    }
+}
+
+# Configuración de cachés persistentes (SQLite)
+CACHE_CONFIG = {
+    'directorio': 'data/cache',  # Carpeta local (ignorada por Git junto con data/)
+    'distancias': {
+        'habilitada': True,
+        'archivo': 'distancias_google.sqlite',
+        'ttl_dias': 30,  # Las distancias por carretera cambian poco; se refrescan cada mes
+        'max_entradas': 500000,  # Desalojo LRU por encima de este número de pares
+        'decimales_coordenadas': 5  # ~1 metro de precisión en la clave
+    },
+    'geocodificacion': {
+        'habilitada': True,
+        'archivo': 'geocodificacion.sqlite',
+        'ttl_dias': 180,  # Las coordenadas de una dirección casi nunca cambian
+        'max_entradas': 100000  # Desalojo LRU por encima de este número de direcciones
+    },
+    'archivos_cargados': {
+        'max_entradas': 12  # Archivos ya procesados que se conservan en memoria por sesión
+    },
+    'estimacion_google': {
+        'ttl_s': 600,  # La hora de salida "ahora" cambia de franja de tráfico con el tiempo
+        'max_entradas': 32  # Estimaciones de costo de Google memorizadas entre reruns
+    },
+    'soluciones': {
+        'habilitada': True,
+        'archivo': 'soluciones.sqlite',
+        'ttl_dias': 7,  # Los planes se rehacen a diario; una semana cubre las repeticiones
+        'max_entradas': 200  # Desalojo LRU por encima de este número de soluciones
     }
 }
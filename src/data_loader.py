@@ -3,15 +3,18 @@ Módulo para cargar y validar archivos maestros de Excel
 Versión 2.1 - Soporta geocodificación con Google Maps y fallback a Nominatim
 """
 import pandas as pd
-import streamlit as st
 from typing import Dict, Tuple, Optional
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-import time
 import os
 from dotenv import load_dotenv
-from security import validate_and_sanitize_file, SecurityError
+from security import validate_and_sanitize_file, safe_log, SecurityError
 from address_validator import validate_address_dataframe, get_address_validation_summary
+from cache import GeocodeCache
+from config import CACHE_CONFIG, GEOCODING_CONFIG
+from rate_limiter import TokenBucket
+from geocoding_pipeline import GeocodingPipeline, GeocodingStage
+from progress import NullSink, ProgressSink
 
 # Cargar variables de entorno
 load_dotenv()
@@ -20,26 +23,39 @@ load_dotenv()
 try:
     import googlemaps
     GOOGLEMAPS_AVAILABLE = True
+    # Errores de red de Google Maps que justifican reintentar
+    GOOGLE_TRANSIENT_ERRORS = (googlemaps.exceptions.Timeout, googlemaps.exceptions.TransportError)
 except ImportError:
     GOOGLEMAPS_AVAILABLE = False
+    GOOGLE_TRANSIENT_ERRORS = ()
 
 
 class DataLoader:
     """Clase para cargar y validar archivos Excel de entrada"""
 
-    def __init__(self, google_api_key: Optional[str] = None):
+    def __init__(self, google_api_key: Optional[str] = None, progress_sink: Optional[ProgressSink] = None):
         """
         Inicializa el DataLoader con configuración de geocodificación
 
         Args:
             google_api_key: API key de Google Maps (opcional). Si no se proporciona,
                           intenta cargar desde variable de entorno GOOGLE_MAPS_API_KEY
+            progress_sink: Receptor de mensajes y avance (por defecto no muestra nada)
         """
+        self.sink = progress_sink or NullSink()
         self.origenes = None
         self.destinos = None
         self.flota = None
         self.config = None
 
+        # Caché persistente de geocodificación (evita consultar direcciones ya resueltas)
+        self.geocode_cache = None
+        if CACHE_CONFIG['geocodificacion']['habilitada']:
+            try:
+                self.geocode_cache = GeocodeCache()
+            except Exception as e:
+                self.sink.warning(f"⚠️ No se pudo abrir la caché de geocodificación: {str(e)}")
+
         # Configurar geocodificadores
         # Prioridad: 1) API key pasada como parámetro, 2) Variable de entorno
         self.google_api_key = google_api_key or os.getenv('GOOGLE_MAPS_API_KEY')
@@ -60,87 +76,147 @@ class DataLoader:
                         # Si falla el test, mostrar error específico
                         error_msg = str(test_error)
                         if "REQUEST_DENIED" in error_msg or "Invalid" in error_msg:
-                            st.error("❌ API key de Google Maps inválida o sin permisos")
-                            st.info("Verifica que:\n- La API key sea correcta\n- La Geocoding API esté habilitada\n- La facturación esté configurada")
+                            self.sink.error("❌ API key de Google Maps inválida o sin permisos")
+                            self.sink.info("Verifica que:\n- La API key sea correcta\n- La Geocoding API esté habilitada\n- La facturación esté configurada")
                         else:
-                            st.warning(f"⚠️ Error al validar Google Maps: {error_msg}")
+                            safe_log(f"⚠️ Error al validar Google Maps: {error_msg}", "warning", self.sink)
 
-                        st.info("🌍 Usando Nominatim (OpenStreetMap) como alternativa")
+                        self.sink.info("🌍 Usando Nominatim (OpenStreetMap) como alternativa")
                         self.use_google_maps = False
                         self.geocoder_nominatim = Nominatim(user_agent="mvp_ruteo_app", timeout=10)
             except Exception as e:
                 # Error al crear el cliente
                 if google_api_key and google_api_key != '':
-                    st.error(f"❌ No se pudo inicializar Google Maps: {str(e)}")
-                    st.info("🌍 Usando Nominatim (OpenStreetMap) como alternativa")
+                    safe_log(f"❌ No se pudo inicializar Google Maps: {str(e)}", "error", self.sink)
+                    self.sink.info("🌍 Usando Nominatim (OpenStreetMap) como alternativa")
                 self.use_google_maps = False
                 self.geocoder_nominatim = Nominatim(user_agent="mvp_ruteo_app", timeout=10)
         else:
             # Usar Nominatim como alternativa
             self.geocoder_nominatim = Nominatim(user_agent="mvp_ruteo_app", timeout=10)
 
-    def geocode_address_google(self, direccion: str, ciudad: str, pais: str) -> Tuple[Optional[float], Optional[float]]:
+        # Nominatim siempre disponible como fallback de Google Maps
+        if not hasattr(self, 'geocoder_nominatim'):
+            self.geocoder_nominatim = Nominatim(
+                user_agent=GEOCODING_CONFIG['nominatim']['user_agent'],
+                timeout=GEOCODING_CONFIG['nominatim']['timeout']
+            )
+
+        # Límites de tasa por proveedor (compartidos por todas las consultas de este loader)
+        self.rate_limiters = {
+            'google_maps': TokenBucket(GEOCODING_CONFIG['google_maps']['max_qps']),
+            'nominatim': TokenBucket(1.0 / GEOCODING_CONFIG['nominatim']['delay_between_requests'])
+        }
+
+    def query_google(self, direccion: str, ciudad: str, pais: str) -> Tuple[Optional[float], Optional[float]]:
         """
-        Geocodifica una dirección usando Google Maps API
-        Retorna (latitud, longitud) o (None, None) si falla
+        Consulta Google Maps sin manejo de errores (las excepciones se propagan)
+        Retorna (latitud, longitud) o (None, None) si no hay resultados
         """
         full_address = f"{direccion}, {ciudad}, {pais}"
+        result = self.gmaps_client.geocode(full_address, region=pais.lower()[:2])
 
-        try:
-            result = self.gmaps_client.geocode(full_address, region=pais.lower()[:2])
+        if result and len(result) > 0:
+            location = result[0]['geometry']['location']
+            return location['lat'], location['lng']
+        return None, None
 
-            if result and len(result) > 0:
-                location = result[0]['geometry']['location']
-                return location['lat'], location['lng']
-            else:
-                return None, None
+    def query_nominatim(self, direccion: str, ciudad: str, pais: str) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Consulta Nominatim sin manejo de errores (las excepciones se propagan)
+        Retorna (latitud, longitud) o (None, None) si no hay resultados
+        """
+        full_address = f"{direccion}, {ciudad}, {pais}"
+        location = self.geocoder_nominatim.geocode(full_address)
 
-        except Exception as e:
-            st.warning(f"Error en Google Maps para '{full_address}': {str(e)}")
-            return None, None
+        if location:
+            return location.latitude, location.longitude
+        return None, None
 
-    def geocode_address_nominatim(self, direccion: str, ciudad: str, pais: str, retries: int = 3) -> Tuple[Optional[float], Optional[float]]:
+    def build_geocoding_pipeline(self, progress_callback=None) -> GeocodingPipeline:
         """
-        Geocodifica una dirección usando Nominatim (OpenStreetMap)
-        Retorna (latitud, longitud) o (None, None) si falla
+        Construye el pipeline concurrente de geocodificación
+        Google Maps (si está configurado) es la primera etapa y Nominatim la de fallback
         """
-        full_address = f"{direccion}, {ciudad}, {pais}"
+        etapas = []
 
-        for attempt in range(retries):
-            try:
-                location = self.geocoder_nominatim.geocode(full_address)
-                if location:
-                    return location.latitude, location.longitude
-                else:
-                    return None, None
-            except (GeocoderTimedOut, GeocoderServiceError) as e:
-                if attempt < retries - 1:
-                    time.sleep(1)  # Esperar antes de reintentar
-                    continue
-                else:
-                    st.warning(f"No se pudo geocodificar: {full_address}")
-                    return None, None
+        if self.use_google_maps:
+            google_cfg = GEOCODING_CONFIG['google_maps']
+            etapas.append(GeocodingStage(
+                'google_maps',
+                self.query_google,
+                self.rate_limiters['google_maps'],
+                workers=google_cfg['workers'],
+                reintentos=google_cfg['max_retries'],
+                errores_transitorios=GOOGLE_TRANSIENT_ERRORS,
+                backoff_base=google_cfg['backoff_base_s'],
+                backoff_max=google_cfg['backoff_max_s']
+            ))
+
+        nominatim_cfg = GEOCODING_CONFIG['nominatim']
+        etapas.append(GeocodingStage(
+            'nominatim',
+            self.query_nominatim,
+            self.rate_limiters['nominatim'],
+            workers=nominatim_cfg['workers'],
+            reintentos=nominatim_cfg['max_retries'],
+            errores_transitorios=(GeocoderTimedOut, GeocoderServiceError),
+            backoff_base=nominatim_cfg['backoff_base_s'],
+            backoff_max=nominatim_cfg['backoff_max_s']
+        ))
+
+        return GeocodingPipeline(etapas, cache=self.geocode_cache, progress_callback=progress_callback)
+
+    def geocode_dataframe(self, df: pd.DataFrame, mask: pd.Series, tipo: str) -> list:
+        """
+        Geocodifica en lote las filas indicadas por 'mask' usando el pipeline concurrente
+        Muestra barra de progreso y resumen; retorna lista de (latitud, longitud)
+        en el mismo orden que las filas seleccionadas
+        """
+        rows = df[mask]
 
-        return None, None
+        pipeline = self.build_geocoding_pipeline(
+            progress_callback=lambda done, total: self.sink.progress(min(done / total, 1.0))
+        )
+        resultados = pipeline.run(list(zip(rows['direccion'], rows['ciudad'], rows['pais'])))
+
+        self.sink.progress_done()
+        self.sink.success("Geocodificación completada")
+
+        for warning in pipeline.warnings[:10]:
+            safe_log(f"⚠️ {warning}", "caption", self.sink)
 
-    def geocode_address(self, direccion: str, ciudad: str, pais: str, retries: int = 3) -> Tuple[Optional[float], Optional[float]]:
+        resumen = [f"{cantidad} {fuente}" for fuente, cantidad in pipeline.stats.items() if cantidad > 0]
+        if resumen:
+            self.sink.caption(f"🗄️ Geocodificación de {tipo}: " + ", ".join(resumen))
+
+        return resultados
+
+    def geocode_address(self, direccion: str, ciudad: str, pais: str) -> Tuple[Optional[float], Optional[float]]:
         """
-        Geocodifica una dirección usando el proveedor configurado
-        Intenta Google Maps primero, luego Nominatim como fallback
+        Geocodifica una sola dirección con el mismo pipeline que los lotes
+        (caché, límites de tasa, reintentos y fallback a Nominatim)
         Retorna (latitud, longitud) o (None, None) si falla
         """
-        # Intentar con Google Maps si está disponible
-        if self.use_google_maps:
-            lat, lon = self.geocode_address_google(direccion, ciudad, pais)
-            if lat is not None and lon is not None:
-                return lat, lon
-            else:
-                # Fallback a Nominatim
-                st.caption(f"🔄 Reintentando con Nominatim: {direccion}")
-                return self.geocode_address_nominatim(direccion, ciudad, pais, retries)
-        else:
-            # Usar Nominatim directamente
-            return self.geocode_address_nominatim(direccion, ciudad, pais, retries)
+        pipeline = self.build_geocoding_pipeline()
+        lat, lon = pipeline.run([(direccion, ciudad, pais)])[0]
+        for warning in pipeline.warnings:
+            safe_log(warning, "warning", self.sink)
+        return lat, lon
+
+    @staticmethod
+    def read_table(file) -> pd.DataFrame:
+        """
+        Lee un archivo de Excel o CSV (según la extensión del nombre)
+        Acepta archivos subidos por Streamlit, rutas en disco o registros JSON
+        (lista de diccionarios, como los recibe el servicio HTTP)
+        """
+        if isinstance(file, list):
+            return pd.DataFrame(file)
+        nombre = str(file) if isinstance(file, (str, os.PathLike)) else getattr(file, 'name', '')
+        if nombre.lower().endswith('.csv'):
+            return pd.read_csv(file)
+        return pd.read_excel(file)
 
     def load_origenes(self, file) -> pd.DataFrame:
         """
@@ -149,7 +225,7 @@ class DataLoader:
         Columnas opcionales: latitud, longitud, hora_apertura, hora_cierre
         """
         try:
-            df = pd.read_excel(file)
+            df = self.read_table(file)
 
             # SEGURIDAD: Validar y sanitizar archivo
             df = validate_and_sanitize_file(file, df, "orígenes")
@@ -172,29 +248,23 @@ class DataLoader:
                 df['hora_cierre'] = '23:59'
 
             # VALIDACIÓN Y ESTANDARIZACIÓN DE DIRECCIONES
-            st.info("🔍 Validando y estandarizando direcciones...")
+            self.sink.info("🔍 Validando y estandarizando direcciones...")
             df, address_stats = validate_address_dataframe(df, tipo="orígenes")
 
             # Mostrar resumen de validación
             if address_stats.get('estandarizadas', 0) > 0:
-                st.success(f"✅ {address_stats['estandarizadas']} direcciones estandarizadas")
-                with st.expander("Ver detalles de estandarización"):
-                    st.text(get_address_validation_summary(address_stats))
+                self.sink.success(f"✅ {address_stats['estandarizadas']} direcciones estandarizadas")
+                self.sink.details("Ver detalles de estandarización",
+                                  get_address_validation_summary(address_stats))
 
             # Geocodificar direcciones sin coordenadas
             needs_geocoding = df['latitud'].isnull() | df['longitud'].isnull()
 
             if needs_geocoding.any():
-                st.info(f"📍 Geocodificando {needs_geocoding.sum()} orígenes sin coordenadas...")
-                progress_bar = st.progress(0)
-
-                for idx, row in df[needs_geocoding].iterrows():
-                    lat, lon = self.geocode_address(
-                        row['direccion'],
-                        row['ciudad'],
-                        row['pais']
-                    )
+                self.sink.info(f"📍 Geocodificando {needs_geocoding.sum()} orígenes sin coordenadas...")
+                resultados = self.geocode_dataframe(df, needs_geocoding, "orígenes")
 
+                for (idx, row), (lat, lon) in zip(df[needs_geocoding].iterrows(), resultados):
                     if lat is not None and lon is not None:
                         df.at[idx, 'latitud'] = lat
                         df.at[idx, 'longitud'] = lon
@@ -204,11 +274,6 @@ class DataLoader:
                             f"en {row['direccion']}, {row['ciudad']}"
                         )
 
-                    progress_bar.progress((idx + 1) / needs_geocoding.sum())
-
-                progress_bar.empty()
-                st.success("Geocodificación completada")
-
             # Validar coordenadas
             if df['latitud'].isnull().any() or df['longitud'].isnull().any():
                 raise ValueError("Algunas coordenadas no pudieron ser obtenidas")
@@ -224,10 +289,10 @@ class DataLoader:
 
         except SecurityError as e:
             # Error de seguridad - mostrar mensaje específico
-            st.error(str(e))
+            self.sink.error(str(e))
             return None
         except Exception as e:
-            st.error(f"Error al cargar archivo de orígenes: {str(e)}")
+            self.sink.error(f"Error al cargar archivo de orígenes: {str(e)}")
             return None
 
     def load_destinos(self, file) -> pd.DataFrame:
@@ -237,7 +302,7 @@ class DataLoader:
         Columnas opcionales: latitud, longitud, hora_inicio, hora_fin
         """
         try:
-            df = pd.read_excel(file)
+            df = self.read_table(file)
 
             # SEGURIDAD: Validar y sanitizar archivo
             df = validate_and_sanitize_file(file, df, "destinos")
@@ -260,44 +325,32 @@ class DataLoader:
                 df['hora_fin'] = '23:59'
 
             # VALIDACIÓN Y ESTANDARIZACIÓN DE DIRECCIONES
-            st.info("🔍 Validando y estandarizando direcciones...")
+            self.sink.info("🔍 Validando y estandarizando direcciones...")
             df, address_stats = validate_address_dataframe(df, tipo="destinos")
 
             # Mostrar resumen de validación
             if address_stats.get('estandarizadas', 0) > 0:
-                st.success(f"✅ {address_stats['estandarizadas']} direcciones estandarizadas")
-                with st.expander("Ver detalles de estandarización"):
-                    st.text(get_address_validation_summary(address_stats))
+                self.sink.success(f"✅ {address_stats['estandarizadas']} direcciones estandarizadas")
+                self.sink.details("Ver detalles de estandarización",
+                                  get_address_validation_summary(address_stats))
 
             # Geocodificar direcciones sin coordenadas
             needs_geocoding = df['latitud'].isnull() | df['longitud'].isnull()
 
             if needs_geocoding.any():
-                st.info(f"📍 Geocodificando {needs_geocoding.sum()} destinos sin coordenadas...")
-                progress_bar = st.progress(0)
-                total = needs_geocoding.sum()
-
-                for i, (idx, row) in enumerate(df[needs_geocoding].iterrows()):
-                    lat, lon = self.geocode_address(
-                        row['direccion'],
-                        row['ciudad'],
-                        row['pais']
-                    )
+                self.sink.info(f"📍 Geocodificando {needs_geocoding.sum()} destinos sin coordenadas...")
+                resultados = self.geocode_dataframe(df, needs_geocoding, "destinos")
 
+                for (idx, row), (lat, lon) in zip(df[needs_geocoding].iterrows(), resultados):
                     if lat is not None and lon is not None:
                         df.at[idx, 'latitud'] = lat
                         df.at[idx, 'longitud'] = lon
                     else:
-                        st.warning(
+                        self.sink.warning(
                             f"No se pudo geocodificar: {row['nombre_cliente']} "
                             f"en {row['direccion']}, {row['ciudad']}. Se omitirá."
                         )
 
-                    progress_bar.progress((i + 1) / total)
-
-                progress_bar.empty()
-                st.success("Geocodificación completada")
-
             # Eliminar filas sin coordenadas
             df = df.dropna(subset=['latitud', 'longitud'])
 
@@ -315,10 +368,10 @@ class DataLoader:
             return df
 
         except SecurityError as e:
-            st.error(str(e))
+            self.sink.error(str(e))
             return None
         except Exception as e:
-            st.error(f"Error al cargar archivo de destinos: {str(e)}")
+            self.sink.error(f"Error al cargar archivo de destinos: {str(e)}")
             return None
 
     def load_flota(self, file) -> pd.DataFrame:
@@ -328,7 +381,7 @@ class DataLoader:
         Columnas opcionales: tipo_vehiculo, costo_km, hora_inicio, hora_fin
         """
         try:
-            df = pd.read_excel(file)
+            df = self.read_table(file)
 
             # SEGURIDAD: Validar y sanitizar archivo
             df = validate_and_sanitize_file(file, df, "flota")
@@ -361,10 +414,10 @@ class DataLoader:
             return df
 
         except SecurityError as e:
-            st.error(str(e))
+            self.sink.error(str(e))
             return None
         except Exception as e:
-            st.error(f"Error al cargar archivo de flota: {str(e)}")
+            self.sink.error(f"Error al cargar archivo de flota: {str(e)}")
             return None
 
     def load_config(self, file) -> Dict:
@@ -373,7 +426,7 @@ class DataLoader:
         Formato: columnas (parametro, valor, descripcion)
         """
         try:
-            df = pd.read_excel(file)
+            df = self.read_table(file)
 
             # SEGURIDAD: Validar y sanitizar archivo
             df = validate_and_sanitize_file(file, df, "configuración")
@@ -388,10 +441,10 @@ class DataLoader:
             return config_dict
 
         except SecurityError as e:
-            st.error(str(e))
+            self.sink.error(str(e))
             return None
         except Exception as e:
-            st.error(f"Error al cargar archivo de configuración: {str(e)}")
+            self.sink.error(f"Error al cargar archivo de configuración: {str(e)}")
             return None
 
     def validate_all_loaded(self) -> Tuple[bool, str]:
@@ -0,0 +1,180 @@
+"""
+Motor vectorizado de distancias Haversine
+Calcula matrices completas (o por bloques de filas) con broadcasting de NumPy
+en lugar de un doble ciclo en Python
+"""
+import numpy as np
+from typing import Optional, Iterator, Tuple
+
+# Radio de la Tierra en km (mismo valor que RouteOptimizer.calculate_distance)
+RADIO_TIERRA_KM = 6371
+
+# Tipos de punto flotante permitidos para el cálculo
+DTYPES_PERMITIDOS = {
+    'float32': np.float32,
+    'float64': np.float64,
+}
+
+
+def _resolve_dtype(dtype) -> type:
+    """
+    Convierte el nombre del tipo ('float32'/'float64') en el tipo de NumPy
+    """
+    if isinstance(dtype, str):
+        if dtype not in DTYPES_PERMITIDOS:
+            raise ValueError(f"dtype no soportado: {dtype}. Use 'float32' o 'float64'")
+        return DTYPES_PERMITIDOS[dtype]
+    return np.dtype(dtype).type
+
+
+def haversine_km(lat1, lon1, lat2, lon2, dtype='float64') -> np.ndarray:
+    """
+    Distancia Haversine en km entre arreglos de coordenadas (con broadcasting)
+
+    Usa exactamente las mismas operaciones que RouteOptimizer.calculate_distance,
+    por lo que en float64 los resultados son idénticos elemento a elemento.
+
+    Args:
+        lat1, lon1: Coordenadas de origen en grados (escalares o arreglos)
+        lat2, lon2: Coordenadas de destino en grados (escalares o arreglos)
+        dtype: 'float32' o 'float64'
+
+    Returns:
+        Arreglo con las distancias en km
+    """
+    dt = _resolve_dtype(dtype)
+    lat1 = np.asarray(lat1, dtype=dt)
+    lon1 = np.asarray(lon1, dtype=dt)
+    lat2 = np.asarray(lat2, dtype=dt)
+    lon2 = np.asarray(lon2, dtype=dt)
+
+    delta_lat = np.radians(lat2 - lat1)
+    delta_lon = np.radians(lon2 - lon1)
+
+    a = np.sin(delta_lat / 2) ** 2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(delta_lon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return dt(RADIO_TIERRA_KM) * c
+
+
+def iter_haversine_blocks(lats, lons, lats_dest=None, lons_dest=None,
+                          dtype='float64', block_size: int = 1024) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """
+    Genera la matriz de distancias (km) por bloques de filas
+
+    Cada bloque tiene forma (block_size × m), de modo que la memoria temporal
+    queda acotada a block_size·m elementos sin importar el número de filas.
+
+    Args:
+        lats, lons: Coordenadas de las filas (orígenes)
+        lats_dest, lons_dest: Coordenadas de las columnas (por defecto las mismas filas)
+        dtype: 'float32' o 'float64'
+        block_size: Número de filas por bloque
+
+    Yields:
+        Tuplas (fila_inicio, fila_fin, bloque_km)
+    """
+    dt = _resolve_dtype(dtype)
+    lats = np.asarray(lats, dtype=dt)
+    lons = np.asarray(lons, dtype=dt)
+    lats_dest = lats if lats_dest is None else np.asarray(lats_dest, dtype=dt)
+    lons_dest = lons if lons_dest is None else np.asarray(lons_dest, dtype=dt)
+
+    block_size = max(1, int(block_size))
+    n = len(lats)
+
+    # Precalcular términos que solo dependen de las columnas
+    cos_lat_dest = np.cos(np.radians(lats_dest))[np.newaxis, :]
+    lat_dest_row = lats_dest[np.newaxis, :]
+    lon_dest_row = lons_dest[np.newaxis, :]
+    radio = dt(RADIO_TIERRA_KM)
+
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        lat_blk = lats[start:end, np.newaxis]
+        lon_blk = lons[start:end, np.newaxis]
+
+        a = np.sin(np.radians(lat_dest_row - lat_blk) / 2) ** 2
+        a += np.cos(np.radians(lat_blk)) * cos_lat_dest * np.sin(np.radians(lon_dest_row - lon_blk) / 2) ** 2
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+        yield start, end, radio * c
+
+
+def haversine_matrix_m(lats, lons, lats_dest=None, lons_dest=None,
+                       dtype='float64', block_size: int = 1024,
+                       out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Matriz de distancias Haversine en metros enteros (formato que usa OR-Tools)
+
+    Equivale a calcular la distancia en km de cada par, multiplicarla por 1000
+    y truncar a entero, como lo hacía el doble ciclo original.
+
+    Args:
+        lats, lons: Coordenadas de las filas
+        lats_dest, lons_dest: Coordenadas de las columnas (por defecto las filas)
+        dtype: Precisión del cálculo intermedio ('float32' o 'float64')
+        block_size: Filas por bloque para acotar la memoria temporal
+        out: Arreglo entero preasignado opcional para escribir el resultado
+
+    Returns:
+        Matriz (n × m) de distancias en metros (int64)
+    """
+    dt = _resolve_dtype(dtype)
+    n = len(lats)
+    m = n if lats_dest is None else len(lats_dest)
+
+    if out is None:
+        out = np.empty((n, m), dtype=np.int64)
+
+    for start, end, block_km in iter_haversine_blocks(lats, lons, lats_dest, lons_dest, dtype, block_size):
+        block_km *= dt(1000)
+        out[start:end] = block_km.astype(np.int64)
+
+    # La distancia de un punto a sí mismo siempre es cero
+    if lats_dest is None:
+        np.fill_diagonal(out, 0)
+
+    return out
+
+
+def nearest_neighbor_mask(distances, k: int, num_fijos: int = 0, block_size: int = 1024) -> np.ndarray:
+    """
+    Máscara simétrica de pares "cercanos" de una matriz de distancias (n × n)
+
+    Cada nodo a partir de 'num_fijos' conserva los pares hacia sus k vecinos más
+    cercanos entre esos mismos nodos; los primeros 'num_fijos' nodos (depósitos)
+    están conectados con todos. La diagonal siempre es True. Se procesa por
+    bloques de filas para no copiar la matriz completa.
+
+    Args:
+        distances: Matriz de distancias (cualquier unidad)
+        k: Vecinos por nodo
+        num_fijos: Nodos iniciales cuyos pares siempre se conservan
+        block_size: Filas por bloque
+
+    Returns:
+        Matriz booleana (n × n)
+    """
+    distances = np.asarray(distances)
+    n = len(distances)
+    num_libres = n - num_fijos
+
+    mask = np.zeros((n, n), dtype=bool)
+    mask[:num_fijos, :] = True
+    mask[:, :num_fijos] = True
+    np.fill_diagonal(mask, True)
+
+    k = min(k, num_libres - 1)
+    if k <= 0:
+        return mask
+
+    for start in range(0, num_libres, block_size):
+        rows = np.arange(start, min(start + block_size, num_libres))
+        block = distances[num_fijos + rows, num_fijos:].astype(np.float64)
+        block[np.arange(len(rows)), rows] = np.inf  # excluir el propio nodo
+        nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+        mask[num_fijos + rows[:, None], num_fijos + nearest] = True
+
+    mask |= mask.T
+    return mask
@@ -0,0 +1,177 @@
+"""
+Pipeline concurrente de geocodificación
+Resuelve lotes de direcciones con un pool de hilos por proveedor, respetando
+el límite de tasa de cada uno (token bucket) y reintentando con backoff exponencial.
+El fallback (ej. Google -> Nominatim) se ejecuta como una segunda etapa sobre
+las direcciones que fallaron, no fila por fila.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from rate_limiter import TokenBucket, call_with_backoff
+
+
+class GeocodingStage:
+    """
+    Etapa del pipeline: un proveedor de geocodificación con su propio límite de tasa
+
+    Args:
+        nombre: Nombre del proveedor (se registra en la caché)
+        consulta: Función (direccion, ciudad, pais) -> (lat, lon) o (None, None);
+                  puede lanzar excepciones (las transitorias se reintentan)
+        bucket: Token bucket del proveedor
+        workers: Número de hilos concurrentes
+        reintentos: Intentos por dirección ante errores transitorios
+        errores_transitorios: Excepciones que justifican reintentar
+        backoff_base: Espera inicial del backoff en segundos
+        backoff_max: Espera máxima del backoff en segundos
+    """
+
+    def __init__(self, nombre: str, consulta: Callable, bucket: TokenBucket, workers: int = 1,
+                 reintentos: int = 3, errores_transitorios: Tuple = (), backoff_base: float = 1.0,
+                 backoff_max: float = 16.0):
+        self.nombre = nombre
+        self.consulta = consulta
+        self.bucket = bucket
+        self.workers = max(1, int(workers))
+        self.reintentos = reintentos
+        self.errores_transitorios = errores_transitorios
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def geocode(self, direccion: str, ciudad: str, pais: str) -> Tuple[Optional[float], Optional[float]]:
+        """Geocodifica una dirección respetando la tasa y reintentando errores transitorios"""
+        return call_with_backoff(
+            lambda: self.consulta(direccion, ciudad, pais),
+            retries=self.reintentos,
+            base=self.backoff_base,
+            maximum=self.backoff_max,
+            retry_on=self.errores_transitorios or (Exception,),
+            bucket=self.bucket
+        )
+
+
+class GeocodingPipeline:
+    """
+    Geocodifica un lote de direcciones en etapas concurrentes
+
+    1. Agrupa direcciones repetidas (se consultan una sola vez)
+    2. Resuelve desde la caché local las que ya se conocen
+    3. Ejecuta cada etapa (proveedor) en su pool de hilos sobre las pendientes
+    4. Retorna los resultados en el mismo orden de entrada
+    """
+
+    def __init__(self, etapas: List[GeocodingStage], cache=None,
+                 progress_callback: Optional[Callable[[int, int], None]] = None):
+        """
+        Args:
+            etapas: Proveedores en orden de prioridad (el siguiente es el fallback)
+            cache: GeocodeCache opcional
+            progress_callback: Función (completadas, total) llamada desde el hilo que
+                               ejecuta run(), apta para actualizar la interfaz
+        """
+        self.etapas = etapas
+        self.cache = cache
+        self.progress_callback = progress_callback
+        self.warnings: List[str] = []
+        self.stats: Dict[str, int] = {}
+
+    def _key(self, direccion: str, ciudad: str, pais: str):
+        if self.cache is not None:
+            return self.cache.make_key(direccion, ciudad, pais)
+        return (str(direccion).strip().lower(), str(ciudad).strip().lower(), str(pais).strip().lower())
+
+    def _report(self, completadas: int, total: int):
+        if self.progress_callback is not None and total > 0:
+            self.progress_callback(completadas, total)
+
+    def run(self, direcciones: List[Tuple[str, str, str]]) -> List[Tuple[Optional[float], Optional[float]]]:
+        """
+        Geocodifica las direcciones
+
+        Args:
+            direcciones: Lista de (direccion, ciudad, pais)
+
+        Returns:
+            Lista de (latitud, longitud) en el mismo orden; (None, None) si no se pudo
+        """
+        resultados: List[Tuple[Optional[float], Optional[float]]] = [(None, None)] * len(direcciones)
+        self.warnings = []
+        self.stats = {'cache': 0, 'fallidas': 0}
+
+        # 1. Agrupar direcciones repetidas
+        grupos: Dict[object, List[int]] = {}
+        representante: Dict[object, Tuple[str, str, str]] = {}
+        for idx, (direccion, ciudad, pais) in enumerate(direcciones):
+            key = self._key(direccion, ciudad, pais)
+            grupos.setdefault(key, []).append(idx)
+            representante.setdefault(key, (direccion, ciudad, pais))
+
+        resueltas: Dict[object, Tuple[float, float]] = {}
+
+        # 2. Consultar la caché local
+        pendientes = []
+        for key, (direccion, ciudad, pais) in representante.items():
+            cached = self.cache.get(direccion, ciudad, pais) if self.cache is not None else None
+            if cached is not None:
+                resueltas[key] = cached
+                self.stats['cache'] += 1
+            else:
+                pendientes.append(key)
+
+        total = len(pendientes)
+        completadas = 0
+        self._report(completadas, total)
+
+        # 3. Etapas por proveedor: cada una procesa lo que la anterior no resolvió
+        for numero_etapa, etapa in enumerate(self.etapas):
+            if not pendientes:
+                break
+
+            ultima_etapa = numero_etapa == len(self.etapas) - 1
+            fallidas = []
+            self.stats[etapa.nombre] = 0
+
+            with ThreadPoolExecutor(max_workers=etapa.workers) as executor:
+                futures = {
+                    executor.submit(etapa.geocode, *representante[key]): key
+                    for key in pendientes
+                }
+
+                for future in as_completed(futures):
+                    key = futures[future]
+                    direccion, ciudad, pais = representante[key]
+
+                    try:
+                        lat, lon = future.result()
+                    except Exception as e:
+                        lat, lon = None, None
+                        self.warnings.append(f"{etapa.nombre}: error en '{direccion}, {ciudad}': {str(e)}")
+
+                    if lat is not None and lon is not None:
+                        resueltas[key] = (lat, lon)
+                        self.stats[etapa.nombre] += 1
+                        completadas += 1
+                        if self.cache is not None:
+                            try:
+                                self.cache.put(direccion, ciudad, pais, lat, lon, etapa.nombre)
+                            except Exception as e:
+                                self.warnings.append(f"No se pudo guardar en la caché: {str(e)}")
+                    else:
+                        fallidas.append(key)
+                        if ultima_etapa:
+                            completadas += 1
+
+                    self._report(completadas, total)
+
+            pendientes = fallidas
+
+        self.stats['fallidas'] = len(pendientes)
+
+        # 4. Escribir resultados en el orden de entrada
+        for key, indices in grupos.items():
+            if key in resueltas:
+                for idx in indices:
+                    resultados[idx] = resueltas[key]
+
+        return resultados
@@ -0,0 +1,158 @@
+"""
+Ejecutor de trabajos en segundo plano compartido por el servidor
+Las optimizaciones se encolan en un pool acotado de hilos; cada sesión de la
+interfaz consulta el estado de su trabajo y recoge el resultado al terminar,
+sin bloquear la página mientras el solver corre.
+"""
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config import JOB_EXECUTOR_CONFIG
+
+
+class QueueFullError(Exception):
+    """La cola del ejecutor alcanzó su máximo de trabajos en espera"""
+    pass
+
+
+class Job:
+    """Trabajo encolado: estado, tiempos, resultado o error"""
+
+    def __init__(self, job_id: str, etiqueta: str):
+        self.id = job_id
+        self.etiqueta = etiqueta
+        self.estado = 'en_cola'  # en_cola | ejecutando | terminado | error | cancelado
+        self.resultado: Any = None
+        self.error: Optional[str] = None
+        self.creado = time.time()
+        self.iniciado: Optional[float] = None
+        self.terminado: Optional[float] = None
+        self.future = None
+
+    @property
+    def finalizado(self) -> bool:
+        return self.estado in ('terminado', 'error', 'cancelado')
+
+
+class JobExecutor:
+    """
+    Pool acotado de trabajos con cola de espera
+
+    Como máximo 'max_trabajos' se ejecutan a la vez; los demás esperan en cola
+    (hasta 'max_cola', después submit() lanza QueueFullError). Los trabajos
+    terminados se conservan hasta que se recogen con pop() o hasta que vencen
+    ('retener_resultados_s'), para no acumular resultados de sesiones cerradas.
+
+    Es seguro usarlo desde varias sesiones (hilos) a la vez.
+    """
+
+    def __init__(self, max_trabajos: Optional[int] = None, max_cola: Optional[int] = None,
+                 retener_resultados_s: Optional[float] = None):
+        self.max_trabajos = max_trabajos or JOB_EXECUTOR_CONFIG['max_trabajos_simultaneos']
+        self.max_cola = JOB_EXECUTOR_CONFIG['max_cola'] if max_cola is None else max_cola
+        self.retener_resultados_s = (JOB_EXECUTOR_CONFIG['retener_resultados_s']
+                                     if retener_resultados_s is None else retener_resultados_s)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_trabajos, thread_name_prefix='trabajo')
+        self._trabajos: Dict[str, Job] = {}
+        self._contador = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, funcion: Callable, *args, etiqueta: str = '', **kwargs) -> str:
+        """
+        Encola funcion(*args, **kwargs) y retorna el id del trabajo
+
+        Raises:
+            QueueFullError: Si ya hay 'max_cola' trabajos esperando
+        """
+        with self._lock:
+            self._purge()
+            if sum(1 for job in self._trabajos.values() if job.estado == 'en_cola') >= self.max_cola:
+                raise QueueFullError(f"Hay {self.max_cola} optimizaciones en espera; intenta de nuevo en unos minutos")
+            job = Job(f"trabajo-{next(self._contador)}", etiqueta)
+            self._trabajos[job.id] = job
+            job.future = self._pool.submit(self._run, job, funcion, args, kwargs)
+        return job.id
+
+    def _run(self, job: Job, funcion: Callable, args, kwargs):
+        with self._lock:
+            if job.estado == 'cancelado':
+                return
+            job.estado = 'ejecutando'
+            job.iniciado = time.time()
+        try:
+            resultado = funcion(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                job.error = str(e)
+                job.terminado = time.time()
+                job.estado = 'error'
+        else:
+            with self._lock:
+                job.resultado = resultado
+                job.terminado = time.time()
+                job.estado = 'terminado'
+
+    def _purge(self):
+        """Elimina trabajos finalizados que nadie recogió (llamar con el lock tomado)"""
+        limite = time.time() - self.retener_resultados_s
+        for job_id in [j.id for j in self._trabajos.values()
+                       if j.finalizado and j.terminado is not None and j.terminado < limite]:
+            del self._trabajos[job_id]
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """
+        Estado de un trabajo (None si no existe o ya se recogió)
+
+        Incluye la posición en la cola (1 = el siguiente en ejecutarse) y los
+        segundos en ejecución.
+        """
+        with self._lock:
+            job = self._trabajos.get(job_id)
+            if job is None:
+                return None
+            posicion = None
+            if job.estado == 'en_cola':
+                en_cola = sorted((j for j in self._trabajos.values() if j.estado == 'en_cola'),
+                                 key=lambda j: j.creado)
+                posicion = next(i for i, j in enumerate(en_cola, start=1) if j.id == job_id)
+            return {
+                'id': job.id,
+                'etiqueta': job.etiqueta,
+                'estado': job.estado,
+                'posicion_en_cola': posicion,
+                'segundos_en_ejecucion': (job.terminado or time.time()) - job.iniciado if job.iniciado else 0.0,
+                'error': job.error
+            }
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancela un trabajo que aún está en cola; retorna False si ya empezó o no existe"""
+        with self._lock:
+            job = self._trabajos.get(job_id)
+            if job is None or job.estado != 'en_cola':
+                return False
+            job.estado = 'cancelado'
+            job.terminado = time.time()
+            job.future.cancel()
+            return True
+
+    def pop(self, job_id: str) -> Optional[Job]:
+        """Retira y retorna un trabajo finalizado (None si sigue pendiente o no existe)"""
+        with self._lock:
+            job = self._trabajos.get(job_id)
+            if job is None or not job.finalizado:
+                return None
+            return self._trabajos.pop(job_id)
+
+    def stats(self) -> Dict:
+        """Profundidad de la cola y trabajos en ejecución en todo el servidor"""
+        with self._lock:
+            estados = [job.estado for job in self._trabajos.values()]
+        return {
+            'en_cola': estados.count('en_cola'),
+            'ejecutando': estados.count('ejecutando'),
+            'max_trabajos': self.max_trabajos,
+            'max_cola': self.max_cola
+        }
@@ -0,0 +1,214 @@
+"""
+Cola persistente de trabajos en SQLite para el servicio HTTP de ruteo
+Los trabajos sobreviven a reinicios del servicio; varios procesos de trabajo
+toman trabajos de la misma cola sin duplicarlos (BEGIN IMMEDIATE).
+"""
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from config import CACHE_CONFIG, SERVICE_CONFIG
+from progress import ProgressSink
+
+
+class JobQueue:
+    """
+    Cola de trabajos con estados en_cola → ejecutando → terminado | error
+
+    Cada fila guarda la solicitud, el avance (lo escribe el proceso que la
+    ejecuta) y el resultado, todo en JSON. Se abre una conexión por operación,
+    de modo que es seguro usarla desde hilos y procesos distintos.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS trabajos (
+            id TEXT PRIMARY KEY,
+            estado TEXT NOT NULL,
+            solicitud TEXT NOT NULL,
+            progreso TEXT,
+            resultado TEXT,
+            error TEXT,
+            worker TEXT,
+            creado REAL NOT NULL,
+            iniciado REAL,
+            terminado REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (estado, creado);
+    """
+
+    def __init__(self, path: Optional[str] = None, retener_dias: Optional[float] = None):
+        self.path = path or os.path.join(CACHE_CONFIG['directorio'], SERVICE_CONFIG['archivo_cola'])
+        self.retener_segundos = float(SERVICE_CONFIG['retener_dias'] if retener_dias is None else retener_dias) * 24 * 3600
+
+        directorio = os.path.dirname(self.path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Abre una conexión nueva por operación; confirma al salir sin errores"""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_json(value):
+        """Convierte tipos de NumPy/pandas a tipos nativos para serializar"""
+        if hasattr(value, 'item'):
+            return value.item()
+        return str(value)
+
+    def enqueue(self, solicitud: Dict) -> str:
+        """Encola una solicitud y retorna el id del trabajo"""
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO trabajos (id, estado, solicitud, creado) VALUES (?, 'en_cola', ?, ?)",
+                (job_id, json.dumps(solicitud, default=self._to_json), time.time())
+            )
+        return job_id
+
+    def claim(self, worker: str) -> Optional[Tuple[str, Dict]]:
+        """
+        Toma el trabajo en cola más antiguo y lo marca como 'ejecutando'
+        Retorna (id, solicitud) o None si la cola está vacía
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id, solicitud FROM trabajos WHERE estado = 'en_cola' ORDER BY creado LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE trabajos SET estado = 'ejecutando', worker = ?, iniciado = ? WHERE id = ?",
+                        (worker, time.time(), row[0])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def update_progress(self, job_id: str, progreso: Dict):
+        """Reemplaza el avance publicado de un trabajo en ejecución"""
+        with self._connect() as conn:
+            conn.execute("UPDATE trabajos SET progreso = ? WHERE id = ?",
+                         (json.dumps(progreso, default=self._to_json), job_id))
+
+    def complete(self, job_id: str, resultado: Dict):
+        """Marca el trabajo como terminado con su resultado"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE trabajos SET estado = 'terminado', resultado = ?, terminado = ? WHERE id = ?",
+                (json.dumps(resultado, default=self._to_json), time.time(), job_id)
+            )
+
+    def fail(self, job_id: str, error: str):
+        """Marca el trabajo como fallido con el mensaje de error"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE trabajos SET estado = 'error', error = ?, terminado = ? WHERE id = ?",
+                (error, time.time(), job_id)
+            )
+
+    def requeue(self, worker: Optional[str] = None) -> int:
+        """
+        Devuelve a la cola los trabajos 'ejecutando' de un proceso que murió
+        (o de todos si worker es None, al arrancar el servicio)
+        Retorna el número de trabajos reencolados
+        """
+        consulta = "UPDATE trabajos SET estado = 'en_cola', worker = NULL, iniciado = NULL, progreso = NULL WHERE estado = 'ejecutando'"
+        parametros: tuple = ()
+        if worker is not None:
+            consulta += " AND worker = ?"
+            parametros = (worker,)
+        with self._connect() as conn:
+            return conn.execute(consulta, parametros).rowcount
+
+    def get(self, job_id: str, incluir_resultado: bool = True) -> Optional[Dict]:
+        """Estado, avance y (si terminó) resultado de un trabajo; None si no existe"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, estado, progreso, resultado, error, creado, iniciado, terminado "
+                "FROM trabajos WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            posicion = None
+            if row[1] == 'en_cola':
+                posicion = conn.execute(
+                    "SELECT COUNT(*) FROM trabajos WHERE estado = 'en_cola' AND creado <= ?", (row[5],)
+                ).fetchone()[0]
+
+        trabajo = {
+            'id': row[0],
+            'estado': row[1],
+            'posicion_en_cola': posicion,
+            'progreso': json.loads(row[2]) if row[2] else None,
+            'error': row[4],
+            'creado': row[5],
+            'iniciado': row[6],
+            'terminado': row[7]
+        }
+        if incluir_resultado and row[3]:
+            trabajo['resultado'] = json.loads(row[3])
+        return trabajo
+
+    def purge(self) -> int:
+        """Elimina trabajos finalizados hace más de 'retener_dias'"""
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM trabajos WHERE estado IN ('terminado', 'error') AND terminado < ?",
+                (time.time() - self.retener_segundos,)
+            ).rowcount
+
+    def stats(self) -> Dict:
+        """Número de trabajos por estado"""
+        with self._connect() as conn:
+            filas = conn.execute("SELECT estado, COUNT(*) FROM trabajos GROUP BY estado").fetchall()
+        conteo = {'en_cola': 0, 'ejecutando': 0, 'terminado': 0, 'error': 0}
+        conteo.update(dict(filas))
+        return conteo
+
+
+class JobProgressSink(ProgressSink):
+    """
+    Publica los mensajes y el avance de los módulos de cálculo en la fila del trabajo
+    Conviene envolverlo en un ThrottledSink para no escribir en SQLite por cada elemento.
+    """
+
+    MAX_MENSAJES = 20
+
+    def __init__(self, cola: JobQueue, job_id: str):
+        self.cola = cola
+        self.job_id = job_id
+        self.estado: Dict = {'etapa': 'preparando', 'fraccion': None, 'mensajes': []}
+
+    def set(self, **campos):
+        """Actualiza campos del avance (etapa, soluciones, mejor_objetivo...) y lo publica"""
+        self.estado.update(campos)
+        self.cola.update_progress(self.job_id, self.estado)
+
+    def emit(self, nivel: str, mensaje: str):
+        mensajes: List = self.estado['mensajes']
+        mensajes.append({'nivel': nivel, 'mensaje': mensaje})
+        del mensajes[:-self.MAX_MENSAJES]
+        self.cola.update_progress(self.job_id, self.estado)
+
+    def progress(self, fraccion: float, texto: Optional[str] = None):
+        self.set(fraccion=round(float(fraccion), 3))
+
+    def progress_done(self):
+        self.set(fraccion=None)
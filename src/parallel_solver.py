@@ -0,0 +1,572 @@
+"""
+Resolución paralela del VRP
+- Modo por descomposición (cluster-first, route-second): los destinos se agrupan
+  alrededor de los depósitos según cercanía y capacidad de su flota, y cada grupo
+  se resuelve como un VRP independiente en un proceso separado.
+- Modo portafolio (multi-inicio): el mismo modelo se resuelve con varias
+  estrategias a la vez en procesos separados y gana el mejor objetivo.
+- Comparación de objetivos: todos los OPTIMIZATION_TYPES se resuelven en
+  paralelo sobre las mismas matrices.
+- Regiones independientes (opcional, 'separar_regiones'): en el modo estándar,
+  los grupos de depósitos, vehículos y destinos separados por más de
+  'distancia_separacion_km' (por ejemplo, dos ciudades) se resuelven cada uno
+  en su proceso.
+Los resultados conservan el formato de RouteOptimizer.extract_solution.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import DECOMPOSITION_CONFIG, OPTIMIZATION_TYPES, PORTFOLIO_CONFIG
+from presolve import bin_packing_lower_bound, regret_assignment
+from route_optimizer import RouteOptimizer
+
+
+def partition_destinos(optimizer: RouteOptimizer) -> List[Dict]:
+    """
+    Asigna cada destino a un depósito (cluster-first, ver presolve.regret_assignment)
+
+    Args:
+        optimizer: RouteOptimizer con la matriz de distancias ya calculada
+
+    Returns:
+        Lista de grupos {'origen_indices', 'destino_indices', 'vehiculo_indices'},
+        solo para depósitos con vehículos y destinos asignados
+    """
+    if optimizer.distance_matrix is None:
+        optimizer.create_distance_matrix()
+
+    num_origenes = len(optimizer.origenes)
+    origen_ids = optimizer.origenes['origen_id'].tolist()
+
+    # Vehículos y capacidad disponible por depósito
+    vehiculos_por_origen = {idx: [] for idx in range(num_origenes)}
+    origen_id_to_index = {origen_id: idx for idx, origen_id in enumerate(origen_ids)}
+    for vehicle_pos, origen_id in enumerate(optimizer.flota['origen_id']):
+        vehiculos_por_origen[origen_id_to_index[origen_id]].append(vehicle_pos)
+
+    depositos = [idx for idx in range(num_origenes) if vehiculos_por_origen[idx]]
+    if not depositos:
+        return []
+
+    capacidades = optimizer.flota['capacidad'].to_numpy(dtype=float)
+    capacidad_deposito = np.array([capacidades[vehiculos_por_origen[idx]].sum() for idx in depositos])
+
+    # Distancia de cada depósito con flota a cada destino (filas: depósitos, columnas: destinos)
+    distancias = np.asarray(optimizer.distance_matrix)[np.ix_(depositos, range(num_origenes, len(optimizer.distance_matrix)))]
+    demandas = optimizer.destinos['demanda'].to_numpy(dtype=float)
+    asignacion = regret_assignment(distancias, demandas, capacidad_deposito)
+
+    grupos = []
+    for pos, origen_index in enumerate(depositos):
+        destino_indices = np.flatnonzero(asignacion == pos).tolist()
+        if destino_indices:
+            grupos.append({
+                'origen_indices': [origen_index],
+                'destino_indices': destino_indices,
+                'vehiculo_indices': vehiculos_por_origen[origen_index]
+            })
+
+    return grupos
+
+
+def find_independent_regions(optimizer: RouteOptimizer, distancia_km: Optional[float] = None) -> List[Dict]:
+    """
+    Detecta regiones independientes: componentes conexas de depósitos con flota y
+    destinos, uniendo los puntos a menos de 'distancia_km' entre sí (en cualquier sentido)
+
+    Los vehículos pertenecen a la región de su depósito (flota.origen_id), así
+    que al separar ningún vehículo atiende destinos de otra región: es una
+    heurística que puede cambiar el resultado respecto al modelo completo. Una
+    región cuya flota no alcanza para sus destinos se une a la región más
+    cercana, ya que sus destinos necesitarían vehículos de otra: cuando no hay
+    flota, algún destino no cabe en el vehículo más grande de la región o la
+    cota de bin packing (presolve.bin_packing_lower_bound) supera el número de
+    vehículos. Las regiones sin destinos se descartan.
+
+    Args:
+        optimizer: RouteOptimizer con la matriz de distancias ya calculada
+        distancia_km: Separación mínima entre regiones (por defecto DECOMPOSITION_CONFIG)
+
+    Returns:
+        Lista de grupos {'origen_indices', 'destino_indices', 'vehiculo_indices'};
+        un solo grupo si el problema no se puede separar
+    """
+    if optimizer.distance_matrix is None:
+        optimizer.create_distance_matrix()
+
+    distancia_km = distancia_km or DECOMPOSITION_CONFIG['distancia_separacion_km']
+    umbral_m = float(distancia_km) * 1000
+    distance_matrix = np.asarray(optimizer.distance_matrix)
+    num_origenes = len(optimizer.origenes)
+
+    origen_id_to_index = {origen_id: idx for idx, origen_id in enumerate(optimizer.origenes['origen_id'])}
+    origen_de_vehiculo = np.array([origen_id_to_index[o] for o in optimizer.flota['origen_id']], dtype=np.int64)
+    depositos = np.unique(origen_de_vehiculo)
+    nodos = np.concatenate([depositos, np.arange(num_origenes, len(distance_matrix))])
+
+    # Adyacencia (simétrica) entre nodos a menos del umbral, por bloques de filas
+    cercanos = np.zeros((len(nodos), len(nodos)), dtype=bool)
+    for inicio in range(0, len(nodos), 1024):
+        filas = nodos[inicio:inicio + 1024]
+        cercanos[inicio:inicio + len(filas)] = distance_matrix[np.ix_(filas, nodos)] <= umbral_m
+    cercanos |= cercanos.T
+
+    # Componentes conexas por búsqueda en anchura (cada nodo entra una vez a la frontera)
+    etiquetas = np.full(len(nodos), -1, dtype=np.int64)
+    num_regiones = 0
+    for semilla in range(len(nodos)):
+        if etiquetas[semilla] >= 0:
+            continue
+        etiquetas[semilla] = num_regiones
+        frontera = np.array([semilla])
+        while len(frontera) > 0:
+            nuevos = cercanos[frontera].any(axis=0) & (etiquetas < 0)
+            etiquetas[nuevos] = num_regiones
+            frontera = np.flatnonzero(nuevos)
+        num_regiones += 1
+
+    regiones = [nodos[etiquetas == r] for r in range(num_regiones)]
+    capacidades = optimizer.flota['capacidad'].to_numpy(dtype=float)
+    demandas = optimizer.destinos['demanda'].to_numpy(dtype=float)
+    # Los destinos que no caben en ningún vehículo (ver presolve) no cuentan para la capacidad de su región
+    demandas = np.where(demandas > capacidades.max(initial=0), 0, demandas)
+
+    def deficit(miembros) -> bool:
+        demanda = demandas[miembros[miembros >= num_origenes] - num_origenes]
+        capacidad = capacidades[np.isin(origen_de_vehiculo, miembros[miembros < num_origenes])]
+        if len(capacidad) == 0 or capacidad.max() <= 0:
+            return True
+        if (demanda > capacidad.max()).any():
+            return True
+        cota = bin_packing_lower_bound(demanda, capacidad)
+        return cota is None or cota > len(capacidad)
+
+    # Unir regiones sin flota suficiente con la región más cercana
+    while len(regiones) > 1:
+        faltantes = [r for r, miembros in enumerate(regiones) if deficit(miembros)]
+        if not faltantes:
+            break
+        actual = regiones.pop(faltantes[0])
+        separacion = [
+            min(distance_matrix[np.ix_(actual, otra)].min(), distance_matrix[np.ix_(otra, actual)].min())
+            for otra in regiones
+        ]
+        mas_cercana = int(np.argmin(separacion))
+        regiones[mas_cercana] = np.concatenate([regiones[mas_cercana], actual])
+
+    grupos = []
+    for miembros in regiones:
+        destino_indices = np.sort(miembros[miembros >= num_origenes] - num_origenes)
+        if len(destino_indices) == 0:
+            continue
+        origen_indices = np.sort(miembros[miembros < num_origenes])
+        grupos.append({
+            'origen_indices': origen_indices.tolist(),
+            'destino_indices': destino_indices.tolist(),
+            'vehiculo_indices': np.flatnonzero(np.isin(origen_de_vehiculo, origen_indices)).tolist()
+        })
+
+    return grupos
+
+
+def build_subproblem(optimizer: RouteOptimizer, grupo: Dict, time_limit_seconds: int,
+                     configuracion: Optional[Dict] = None, initial_solution: Optional[Dict] = None) -> Dict:
+    """
+    Extrae los datos de un grupo (DataFrames y submatrices) para resolverlo en otro proceso
+
+    Args:
+        optimizer: RouteOptimizer con las matrices calculadas
+        grupo: {'origen_indices', 'destino_indices', 'vehiculo_indices'}
+        time_limit_seconds: Tiempo límite del subproblema
+        configuracion: {'estrategia_inicial', 'metaheuristica'} opcional
+        initial_solution: Solución anterior para arrancar en caliente (solo se
+                          conservan las rutas de los vehículos del grupo)
+    """
+    num_origenes = len(optimizer.origenes)
+    nodos = list(grupo['origen_indices']) + [num_origenes + d for d in grupo['destino_indices']]
+    duracion = optimizer.duration_matrix
+    configuracion = configuracion or {}
+
+    return {
+        'origenes': optimizer.origenes.iloc[grupo['origen_indices']].reset_index(drop=True),
+        'destinos': optimizer.destinos.iloc[grupo['destino_indices']].reset_index(drop=True),
+        'flota': optimizer.flota.iloc[grupo['vehiculo_indices']].reset_index(drop=True),
+        'config': optimizer.config,
+        'optimization_type': optimizer.optimization_type,
+        'distance_matrix': np.asarray(optimizer.distance_matrix)[np.ix_(nodos, nodos)],
+        'duration_matrix': None if duracion is None else np.asarray(duracion)[np.ix_(nodos, nodos)],
+        'time_limit_seconds': time_limit_seconds,
+        'estrategia_inicial': configuracion.get('estrategia_inicial'),
+        'metaheuristica': configuracion.get('metaheuristica'),
+        'initial_solution': slice_solution(optimizer, grupo, initial_solution)
+    }
+
+
+def slice_solution(optimizer: RouteOptimizer, grupo: Dict, solution: Optional[Dict]) -> Optional[Dict]:
+    """Rutas de una solución que corresponden a los vehículos del grupo (None si no hay ninguna)"""
+    if not solution:
+        return None
+    vehiculos = set(optimizer.flota['vehiculo_id'].iloc[grupo['vehiculo_indices']])
+    routes = [route for route in solution.get('routes', []) if route['vehicle_id'] in vehiculos]
+    return {'routes': routes} if routes else None
+
+
+def build_full_problem(optimizer: RouteOptimizer, time_limit_seconds: int,
+                       configuracion: Optional[Dict] = None,
+                       optimization_type: Optional[str] = None) -> Dict:
+    """
+    Datos del problema completo (todos los orígenes, destinos y vehículos)
+    'optimization_type' permite resolverlo con un objetivo distinto al del optimizador
+    """
+    grupo = {
+        'origen_indices': list(range(len(optimizer.origenes))),
+        'destino_indices': list(range(len(optimizer.destinos))),
+        'vehiculo_indices': list(range(len(optimizer.flota)))
+    }
+    problema = build_subproblem(optimizer, grupo, time_limit_seconds, configuracion)
+    if optimization_type:
+        problema['optimization_type'] = optimization_type
+    return problema
+
+
+def solve_subproblem(subproblema: Dict) -> Dict:
+    """
+    Resuelve un subproblema (se ejecuta en un proceso del pool)
+    Las matrices ya vienen calculadas, así que no se consulta ningún servicio externo.
+
+    Returns:
+        {'solution': solución o None, 'stats': estadísticas de búsqueda}
+    """
+    optimizer = RouteOptimizer(
+        subproblema['origenes'],
+        subproblema['destinos'],
+        subproblema['flota'],
+        subproblema['config'],
+        optimization_type=subproblema['optimization_type']
+    )
+    optimizer.distance_matrix = subproblema['distance_matrix']
+    optimizer.duration_matrix = subproblema['duration_matrix']
+
+    solution = optimizer.solve(
+        time_limit_seconds=subproblema['time_limit_seconds'],
+        first_solution_strategy=subproblema.get('estrategia_inicial'),
+        local_search_metaheuristic=subproblema.get('metaheuristica'),
+        initial_solution=subproblema.get('initial_solution')
+    )
+    return {'solution': solution, 'stats': optimizer.search_stats}
+
+
+def merge_solutions(optimizer: RouteOptimizer, grupos: List[Dict], resultados: List[Dict]) -> Dict:
+    """
+    Combina las soluciones de los grupos en el formato de extract_solution
+    Las rutas quedan en el orden de la flota original
+    """
+    merged = {
+        'total_distance': 0,
+        'routes': [],
+        'vehicle_loads': [],
+        'unassigned': [],
+        'objective_value': 0
+    }
+    orden_vehiculos = {vehiculo_id: pos for pos, vehiculo_id in enumerate(optimizer.flota['vehiculo_id'])}
+
+    for grupo, resultado in zip(grupos, resultados):
+        solution = resultado['solution']
+        if solution is None:
+            # El subproblema no tuvo solución: todos sus destinos quedan sin asignar
+            for dest_index in grupo['destino_indices']:
+                dest_row = optimizer.destinos.iloc[dest_index]
+                merged['unassigned'].append({
+                    'id': dest_row['destino_id'],
+                    'nombre': dest_row['nombre_cliente'],
+                    'direccion': dest_row.get('direccion_original', dest_row['direccion']),
+                    'direccion_geocodificada': dest_row['direccion'],
+                    'ciudad': dest_row['ciudad'],
+                    'demanda': dest_row['demanda'],
+                    'motivo': 'El subproblema de su grupo no tuvo solución'
+                })
+            continue
+
+        merged['total_distance'] += solution['total_distance']
+        merged['routes'].extend(solution['routes'])
+        merged['vehicle_loads'].extend(solution.get('vehicle_loads', []))
+        merged['unassigned'].extend(solution.get('unassigned', []))
+        merged['objective_value'] += solution.get('objective_value', 0)
+        merged.setdefault('solver_config', solution.get('solver_config'))
+        if solution.get('presolve'):
+            merged['presolve'] = merge_presolve(merged.get('presolve'), solution['presolve'])
+
+    merged['routes'].sort(key=lambda r: orden_vehiculos.get(r['vehicle_id'], len(orden_vehiculos)))
+    return merged
+
+
+def merge_presolve(acumulado: Optional[Dict], resumen: Dict) -> Dict:
+    """
+    Suma los resúmenes de preproceso de los grupos; las cotas de vehículos también
+    se suman porque cada grupo necesita sus propios vehículos
+    """
+    if acumulado is None:
+        return dict(resumen, cota_por_deposito=dict(resumen['cota_por_deposito']))
+
+    combinado = {
+        clave: acumulado[clave] + resumen[clave]
+        for clave in ('destinos_infactibles', 'vehiculos_flota', 'vehiculos_modelo', 'grupos_identicos')
+    }
+    cotas = (acumulado['cota_inferior_vehiculos'], resumen['cota_inferior_vehiculos'])
+    combinado['cota_inferior_vehiculos'] = None if None in cotas else sum(cotas)
+    combinado['cota_por_deposito'] = {**acumulado['cota_por_deposito'], **resumen['cota_por_deposito']}
+    return combinado
+
+
+def merge_search_stats(resultados: List[Dict]) -> Dict:
+    """Suma las estadísticas de búsqueda de los subproblemas (el tiempo es el del más lento)"""
+    stats = [r['stats'] for r in resultados if r.get('stats')]
+    return {
+        'tiempo_ms': max((s['tiempo_ms'] for s in stats), default=0),
+        'ramas': sum(s['ramas'] for s in stats),
+        'fallos': sum(s['fallos'] for s in stats),
+        'soluciones': sum(s['soluciones'] for s in stats),
+        'vecinos_aceptados': sum(s['vecinos_aceptados'] for s in stats),
+        'matrices_nativas': all(s['matrices_nativas'] for s in stats) if stats else False,
+        'subproblemas': len(resultados)
+    }
+
+
+def run_in_processes(funcion, tareas: List, max_workers: Optional[int] = None) -> List:
+    """
+    Ejecuta funcion(tarea) para cada tarea en un pool de procesos y retorna
+    los resultados en el mismo orden. Si el pool no se puede crear o se rompe
+    (entornos sin soporte de multiprocessing), o si el proceso actual es daemon
+    y no puede tener hijos, ejecuta las tareas en serie.
+    """
+    if len(tareas) <= 1 or max_workers == 1 or multiprocessing.current_process().daemon:
+        return [funcion(tarea) for tarea in tareas]
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(funcion, tareas))
+    except (BrokenProcessPool, OSError, NotImplementedError):
+        return [funcion(tarea) for tarea in tareas]
+
+
+def solve_by_depot(optimizer: RouteOptimizer, time_limit_seconds: int = 30,
+                   max_workers: Optional[int] = None) -> Optional[Dict]:
+    """
+    Resuelve el VRP por descomposición: un subproblema por depósito en paralelo
+
+    El tiempo límite se reparte para que la duración total sea similar a la del
+    modo estándar: si hay más grupos que procesos, cada tanda recibe una fracción.
+
+    Args:
+        optimizer: RouteOptimizer configurado (las matrices se calculan aquí si hace falta)
+        time_limit_seconds: Tiempo límite total
+        max_workers: Procesos simultáneos (por defecto DECOMPOSITION_CONFIG o el número de CPUs)
+
+    Returns:
+        Solución con el formato de extract_solution, o None si no hay grupos
+    """
+    if optimizer.distance_matrix is None:
+        optimizer.create_distance_matrix()
+
+    grupos = partition_destinos(optimizer)
+    if not grupos:
+        return None
+
+    max_workers = max_workers or DECOMPOSITION_CONFIG['max_procesos'] or os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(grupos)))
+    tandas = -(-len(grupos) // max_workers)
+    tiempo_por_grupo = max(1, int(time_limit_seconds // tandas))
+
+    subproblemas = [build_subproblem(optimizer, grupo, tiempo_por_grupo) for grupo in grupos]
+    resultados = run_in_processes(solve_subproblem, subproblemas, max_workers)
+
+    optimizer.search_stats = merge_search_stats(resultados)
+    optimizer.solution = merge_solutions(optimizer, grupos, resultados)
+    return optimizer.solution
+
+
+def solve_regions(optimizer: RouteOptimizer, time_limit_seconds: int = 30, grupos: Optional[List[Dict]] = None,
+                  max_workers: Optional[int] = None, initial_solution: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Resuelve cada región independiente (ver find_independent_regions) en su proceso
+
+    Cada región solo usa sus propios vehículos, así que el resultado puede ser
+    distinto del modelo completo (un vehículo ya no puede cruzar a otra región).
+    El tiempo se reparte en proporción al número de destinos: con P procesos el
+    presupuesto total es P × tiempo límite, y ninguna región recibe más que el
+    tiempo límite. El monitor de búsqueda no aplica (cada región corre en otro
+    proceso); el arranque en caliente sí, con las rutas de cada región.
+
+    Args:
+        optimizer: RouteOptimizer configurado (las matrices se calculan aquí si hace falta)
+        time_limit_seconds: Tiempo límite total
+        grupos: Regiones ya detectadas (opcional)
+        max_workers: Procesos simultáneos (por defecto DECOMPOSITION_CONFIG o el número de CPUs)
+        initial_solution: Solución anterior para arrancar en caliente (opcional)
+
+    Returns:
+        Solución con el formato de extract_solution (incluye 'regiones'), o None
+        si no hay destinos
+    """
+    if grupos is None:
+        grupos = find_independent_regions(optimizer)
+    if not grupos:
+        return None
+
+    max_workers = max_workers or DECOMPOSITION_CONFIG['max_procesos'] or os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(grupos)))
+    total_destinos = sum(len(grupo['destino_indices']) for grupo in grupos)
+    tiempos = [
+        max(1, min(time_limit_seconds, int(round(time_limit_seconds * max_workers * len(grupo['destino_indices']) / total_destinos))))
+        for grupo in grupos
+    ]
+
+    subproblemas = [build_subproblem(optimizer, grupo, tiempo, initial_solution=initial_solution)
+                    for grupo, tiempo in zip(grupos, tiempos)]
+    resultados = run_in_processes(solve_subproblem, subproblemas, max_workers)
+
+    optimizer.search_stats = dict(merge_search_stats(resultados), regiones=len(grupos))
+    optimizer.solution = merge_solutions(optimizer, grupos, resultados)
+    optimizer.solution['regiones'] = [
+        {
+            'origenes': optimizer.origenes['origen_id'].iloc[grupo['origen_indices']].tolist(),
+            'destinos': len(grupo['destino_indices']),
+            'vehiculos': len(grupo['vehiculo_indices']),
+            'tiempo_limite_s': tiempo
+        }
+        for grupo, tiempo in zip(grupos, tiempos)
+    ]
+    return optimizer.solution
+
+
+def regions_to_split(optimizer: RouteOptimizer) -> List[Dict]:
+    """
+    Regiones independientes a resolver por separado en el modo estándar
+    Lista vacía si hay una sola región o si se desactivó 'separar_regiones'
+    """
+    separar = optimizer.config.get('separar_regiones', DECOMPOSITION_CONFIG['separar_regiones'])
+    if isinstance(separar, str):
+        separar = separar.strip().lower() in ('si', 'sí', 'true', '1', 'yes')
+    if not separar:
+        return []
+    grupos = find_independent_regions(optimizer)
+    return grupos if len(grupos) > 1 else []
+
+
+def solve_standard(optimizer: RouteOptimizer, time_limit_seconds: int = 30, initial_solution: Optional[Dict] = None,
+                   monitor=None, max_workers: Optional[int] = None) -> Optional[Dict]:
+    """
+    Modo estándar: un solo modelo, o una resolución por región si el problema
+    tiene regiones independientes y 'separar_regiones' está activo
+
+    Con monitor (cancelación, avance en vivo, parada temprana) siempre se
+    resuelve un solo modelo, porque el monitor no cruza a otros procesos. El
+    arranque en caliente se reparte entre las regiones.
+    """
+    grupos = regions_to_split(optimizer) if monitor is None else []
+    if grupos:
+        return solve_regions(optimizer, time_limit_seconds, grupos, max_workers, initial_solution=initial_solution)
+
+    return optimizer.solve(time_limit_seconds=time_limit_seconds, initial_solution=initial_solution, monitor=monitor)
+
+
+def solve_portfolio(optimizer: RouteOptimizer, time_limit_seconds: int = 30,
+                    configuraciones: Optional[List[Dict]] = None,
+                    max_workers: Optional[int] = None) -> Optional[Dict]:
+    """
+    Resuelve el mismo modelo con varias estrategias en paralelo y retorna la mejor
+
+    Cada configuración corre en su propio proceso con el mismo tiempo límite.
+    Para no alargar la espera se ejecutan tantas configuraciones como procesos
+    haya disponibles, en el orden de prioridad de PORTFOLIO_CONFIG.
+
+    Args:
+        optimizer: RouteOptimizer configurado (las matrices se calculan aquí si hace falta)
+        time_limit_seconds: Tiempo límite de cada ejecución
+        configuraciones: Lista de {'estrategia_inicial', 'metaheuristica'}
+        max_workers: Procesos simultáneos (por defecto PORTFOLIO_CONFIG o el número de CPUs)
+
+    Returns:
+        La solución con menor objetivo; incluye 'solver_config' (configuración
+        ganadora) y 'portfolio' (resultado de cada configuración), o None si
+        ninguna encontró solución
+    """
+    if optimizer.distance_matrix is None:
+        optimizer.create_distance_matrix()
+
+    configuraciones = configuraciones or PORTFOLIO_CONFIG['configuraciones']
+    max_workers = max_workers or PORTFOLIO_CONFIG['max_procesos'] or os.cpu_count() or 1
+    configuraciones = configuraciones[:max(1, max_workers)]
+
+    tareas = [build_full_problem(optimizer, time_limit_seconds, c) for c in configuraciones]
+    resultados = run_in_processes(solve_subproblem, tareas, len(tareas))
+
+    resumen = []
+    mejor = None
+    for configuracion, resultado in zip(configuraciones, resultados):
+        solution = resultado['solution']
+        resumen.append({
+            'estrategia_inicial': configuracion['estrategia_inicial'],
+            'metaheuristica': configuracion['metaheuristica'],
+            'objective_value': solution['objective_value'] if solution else None,
+            'total_distance': solution['total_distance'] if solution else None,
+            'unassigned': len(solution.get('unassigned', [])) if solution else None,
+            'ramas': resultado['stats']['ramas'] if resultado.get('stats') else 0
+        })
+        if solution and (mejor is None or solution['objective_value'] < mejor[0]['solution']['objective_value']):
+            mejor = (resultado, configuracion)
+
+    if mejor is None:
+        return None
+
+    resultado, configuracion = mejor
+    optimizer.search_stats = dict(resultado['stats'], configuraciones=len(tareas))
+    optimizer.solution = resultado['solution']
+    optimizer.solution['portfolio'] = resumen
+    return optimizer.solution
+
+
+def solve_all_objectives(optimizer: RouteOptimizer, time_limit_seconds: int = 30,
+                         tipos: Optional[List[str]] = None,
+                         max_workers: Optional[int] = None) -> Dict[str, Dict]:
+    """
+    Resuelve el mismo problema con cada tipo de optimización en paralelo
+
+    Las matrices de distancia (y tiempos de Google, si aplica) se calculan una sola
+    vez; cada proceso deriva de ellas la matriz de su objetivo. Si hay menos
+    procesos que objetivos, el tiempo límite se reparte entre las tandas para que
+    la comparación tome aproximadamente un tiempo límite.
+
+    Args:
+        optimizer: RouteOptimizer configurado
+        time_limit_seconds: Tiempo límite total
+        tipos: Tipos a comparar (por defecto todos los de OPTIMIZATION_TYPES)
+        max_workers: Procesos simultáneos (por defecto el número de CPUs)
+
+    Returns:
+        {tipo: {'solution': solución o None, 'metricas': compute_solution_metrics o None}}
+    """
+    if optimizer.distance_matrix is None:
+        optimizer.create_distance_matrix()
+
+    tipos = tipos or list(OPTIMIZATION_TYPES.keys())
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(tipos)))
+    tandas = -(-len(tipos) // max_workers)
+    tiempo_por_tipo = max(1, int(time_limit_seconds // tandas))
+
+    tareas = [build_full_problem(optimizer, tiempo_por_tipo, optimization_type=tipo) for tipo in tipos]
+    resultados = run_in_processes(solve_subproblem, tareas, max_workers)
+
+    comparacion = {}
+    for tipo, resultado in zip(tipos, resultados):
+        solution = resultado['solution']
+        comparacion[tipo] = {
+            'solution': solution,
+            'metricas': optimizer.compute_solution_metrics(solution) if solution else None
+        }
+    return comparacion
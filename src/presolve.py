@@ -0,0 +1,191 @@
+"""
+Preproceso del VRP antes de construir el modelo de OR-Tools
+- Destinos infactibles: demanda mayor que la capacidad de cualquier vehículo.
+- Cotas inferiores de vehículos (bin packing) global y por depósito.
+- Grupos de vehículos idénticos (mismo depósito, tipo, capacidad y costo/km):
+  se descartan los sobrantes más allá de la cota + margen y se ordenan para
+  romper la simetría entre ellos.
+Todo se calcula de forma vectorizada sobre los DataFrames de destinos y flota.
+"""
+import math
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import CALCULATION_CONFIG, PRESOLVE_CONFIG
+
+
+def is_enabled(config: Optional[Dict], clave: str) -> bool:
+    """Opción booleana de PRESOLVE_CONFIG, sobrescrita por la configuración ('sí'/'no' también valen)"""
+    valor = (config or {}).get(clave, PRESOLVE_CONFIG[clave])
+    if isinstance(valor, str):
+        return valor.strip().lower() in ('si', 'sí', 'true', '1', 'yes')
+    return bool(valor)
+
+
+def bin_packing_lower_bound(demandas: np.ndarray, capacidades: np.ndarray) -> Optional[int]:
+    """
+    Cota inferior del número de vehículos para llevar todas las demandas
+
+    Es el máximo entre los k vehículos más grandes cuya capacidad suma la demanda
+    total y el número de paradas que ocupan más de la mitad del vehículo más
+    grande (dos de ellas nunca caben juntas).
+
+    Args:
+        demandas: Demanda de cada parada (todas deben caber en el vehículo más grande)
+        capacidades: Capacidad de cada vehículo disponible
+
+    Returns:
+        Número mínimo de vehículos, o None si ni con todos se cubre la demanda
+    """
+    demandas = np.asarray(demandas, dtype=float)
+    capacidades = np.sort(np.asarray(capacidades, dtype=float))[::-1]
+    total = demandas.sum()
+    if len(demandas) == 0 or total <= 0:
+        return 0
+    if len(capacidades) == 0 or capacidades.sum() < total:
+        return None
+
+    por_capacidad = int(np.searchsorted(np.cumsum(capacidades), total) + 1)
+    grandes = int((demandas > capacidades[0] / 2).sum())
+    return max(por_capacidad, grandes)
+
+
+def regret_assignment(distancias: np.ndarray, demandas: np.ndarray, capacidades: np.ndarray) -> np.ndarray:
+    """
+    Asigna cada destino a un depósito según cercanía y capacidad (cluster-first)
+
+    Los destinos se procesan en orden de "arrepentimiento" (diferencia entre el
+    depósito más cercano y el segundo), de modo que los que más pierden si no van
+    a su depósito preferido se asignan primero. Cada destino va al depósito más
+    cercano que aún tenga capacidad; si ninguno la tiene, al más cercano.
+
+    Args:
+        distancias: Distancia de cada depósito (filas) a cada destino (columnas)
+        demandas: Demanda de cada destino
+        capacidades: Capacidad total de la flota de cada depósito
+
+    Returns:
+        Fila (depósito) asignada a cada destino
+    """
+    distancias = np.asarray(distancias, dtype=float)
+    demandas = np.asarray(demandas, dtype=float)
+    capacidad_restante = np.asarray(capacidades, dtype=float).copy()
+
+    if len(distancias) > 1:
+        ordenadas = np.sort(distancias, axis=0)
+        arrepentimiento = ordenadas[1] - ordenadas[0]
+    else:
+        arrepentimiento = np.zeros(distancias.shape[1])
+
+    asignacion = np.empty(distancias.shape[1], dtype=int)
+    for destino in np.argsort(-arrepentimiento, kind='stable'):
+        candidatos = np.argsort(distancias[:, destino], kind='stable')
+        con_capacidad = candidatos[capacidad_restante[candidatos] >= demandas[destino]]
+        elegido = con_capacidad[0] if len(con_capacidad) else candidatos[0]
+        asignacion[destino] = elegido
+        capacidad_restante[elegido] -= demandas[destino]
+
+    return asignacion
+
+
+def vehicle_groups(flota: pd.DataFrame) -> np.ndarray:
+    """
+    Identificador de grupo de cada vehículo: los vehículos del mismo grupo son
+    intercambiables en el modelo (mismo depósito, tipo, capacidad y costo/km)
+    """
+    costo_km = (flota['costo_km'] if 'costo_km' in flota.columns
+                else pd.Series(np.nan, index=flota.index))
+    claves = pd.DataFrame({
+        'origen_id': flota['origen_id'].astype(str).to_numpy(),
+        'tipo_vehiculo': (flota['tipo_vehiculo'].astype(str).to_numpy() if 'tipo_vehiculo' in flota.columns
+                          else ''),
+        'capacidad': flota['capacidad'].to_numpy(dtype=float),
+        'costo_km': costo_km.fillna(CALCULATION_CONFIG['costo_km_default']).to_numpy(dtype=float)
+    })
+    return claves.groupby(list(claves.columns), sort=False).ngroup().to_numpy()
+
+
+def run_presolve(destinos: pd.DataFrame, flota: pd.DataFrame, config: Optional[Dict] = None,
+                 deposito_de_destino: Optional[np.ndarray] = None) -> Dict:
+    """
+    Analiza destinos y flota antes de construir el modelo
+
+    Cada grupo de vehículos idénticos conserva, como máximo, los que necesitaría
+    para atender él solo toda la demanda que le cabe (cota de bin packing) más
+    un margen, así que el recorte no deja sin vehículos a ningún depósito.
+
+    La cota por depósito se calcula sobre los destinos que le tocan en
+    'deposito_de_destino' (ver regret_assignment); sin esa asignación, con un
+    solo depósito se usan todos los destinos y con varios no se calcula.
+
+    Args:
+        destinos: DataFrame de destinos (columna 'demanda')
+        flota: DataFrame de vehículos ('origen_id', 'capacidad', opcionalmente 'costo_km')
+        config: Configuración del problema (sobrescribe PRESOLVE_CONFIG)
+        deposito_de_destino: origen_id asignado a cada destino (opcional)
+
+    Returns:
+        {'infactibles': posiciones de destinos infactibles, 'motivos': {posición: texto},
+         'vehiculos_modelo': posiciones de la flota que entran al modelo,
+         'grupos': grupo idéntico de cada vehículo de la flota,
+         'resumen': indicadores para el reporte}
+    """
+    config = config or {}
+    margen_vehiculos = int(config.get('margen_vehiculos', PRESOLVE_CONFIG['margen_vehiculos']))
+    margen_relativo = float(config.get('margen_relativo', PRESOLVE_CONFIG['margen_relativo']))
+
+    demandas = destinos['demanda'].to_numpy(dtype=float)
+    capacidades = flota['capacidad'].to_numpy(dtype=float)
+    origenes_flota = flota['origen_id'].to_numpy()
+    capacidad_maxima = capacidades.max() if len(capacidades) else 0.0
+
+    infactibles = np.flatnonzero(demandas > capacidad_maxima)
+    motivos = {
+        int(pos): f"Demanda ({demandas[pos]:g}) mayor que la capacidad del vehículo más grande ({capacidad_maxima:g})"
+        for pos in infactibles
+    }
+    es_factible = demandas <= capacidad_maxima
+    factibles = demandas[es_factible]
+
+    depositos = pd.unique(origenes_flota)
+    if deposito_de_destino is None and len(depositos) == 1:
+        deposito_de_destino = np.full(len(demandas), depositos[0], dtype=object)
+
+    cota_por_deposito = {}
+    if deposito_de_destino is not None:
+        deposito_de_destino = np.asarray(deposito_de_destino, dtype=object)
+        for origen_id in depositos:
+            caps = capacidades[origenes_flota == origen_id]
+            asignadas = demandas[es_factible & (deposito_de_destino == origen_id)]
+            cota_por_deposito[str(origen_id)] = bin_packing_lower_bound(asignadas[asignadas <= caps.max()], caps)
+
+    # Grupos idénticos: se conservan los primeros de cada grupo (orden de la flota)
+    grupos = vehicle_groups(flota)
+    conservar = np.ones(len(flota), dtype=bool)
+    if is_enabled(config, 'podar_flota') and len(flota):
+        posicion_en_grupo = pd.Series(grupos).groupby(grupos).cumcount().to_numpy()
+        for grupo in np.unique(grupos):
+            capacidad = capacidades[grupos == grupo][0]
+            cota = bin_packing_lower_bound(factibles[factibles <= capacidad], [capacidad] * len(factibles)) or 0
+            margen = max(margen_vehiculos, math.ceil(cota * margen_relativo))
+            conservar[(grupos == grupo) & (posicion_en_grupo >= max(1, cota + margen))] = False
+
+    vehiculos_modelo = np.flatnonzero(conservar)
+    resumen = {
+        'destinos_infactibles': int(len(infactibles)),
+        'vehiculos_flota': int(len(flota)),
+        'vehiculos_modelo': int(len(vehiculos_modelo)),
+        'cota_inferior_vehiculos': bin_packing_lower_bound(factibles, capacidades),
+        'cota_por_deposito': cota_por_deposito,
+        'grupos_identicos': int((np.bincount(grupos[vehiculos_modelo]) > 1).sum()) if len(vehiculos_modelo) else 0
+    }
+
+    return {
+        'infactibles': infactibles,
+        'motivos': motivos,
+        'vehiculos_modelo': vehiculos_modelo,
+        'grupos': grupos,
+        'resumen': resumen
+    }
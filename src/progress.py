@@ -0,0 +1,183 @@
+"""
+Reporte de avance y mensajes desacoplado de la interfaz
+Los módulos de cálculo (RouteOptimizer, DataLoader) informan a un ProgressSink;
+la aplicación decide si los mensajes van a Streamlit, a la consola o a ninguna parte.
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+from config import PROGRESS_CONFIG
+
+
+class ProgressSink:
+    """
+    Interfaz del receptor de avance y mensajes
+
+    Las subclases sobrescriben emit() para los mensajes y progress()/progress_done()
+    para la barra de avance. La implementación base no hace nada (equivale a NullSink).
+    """
+
+    def emit(self, nivel: str, mensaje: str):
+        """Recibe un mensaje con nivel 'info', 'success', 'warning', 'error' o 'caption'"""
+
+    def info(self, mensaje: str):
+        self.emit('info', mensaje)
+
+    def success(self, mensaje: str):
+        self.emit('success', mensaje)
+
+    def warning(self, mensaje: str):
+        self.emit('warning', mensaje)
+
+    def error(self, mensaje: str):
+        self.emit('error', mensaje)
+
+    def caption(self, mensaje: str):
+        self.emit('caption', mensaje)
+
+    def details(self, titulo: str, texto: str):
+        """Bloque de detalle opcional (en la interfaz, un expander)"""
+
+    def progress(self, fraccion: float, texto: Optional[str] = None):
+        """Actualiza el avance de la tarea en curso (0.0 a 1.0)"""
+
+    def progress_done(self):
+        """Indica que la tarea en curso terminó (oculta la barra de avance)"""
+
+
+class NullSink(ProgressSink):
+    """Descarta todos los mensajes (uso en procesos de trabajo y pruebas)"""
+
+
+class LoggingSink(ProgressSink):
+    """Envía los mensajes al módulo logging (uso en línea de comandos y servicios)"""
+
+    NIVELES = {
+        'info': logging.INFO,
+        'success': logging.INFO,
+        'caption': logging.DEBUG,
+        'warning': logging.WARNING,
+        'error': logging.ERROR,
+    }
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger('rutafacil')
+
+    def emit(self, nivel: str, mensaje: str):
+        self.logger.log(self.NIVELES.get(nivel, logging.INFO), mensaje)
+
+    def details(self, titulo: str, texto: str):
+        self.logger.debug("%s\n%s", titulo, texto)
+
+
+class StreamlitSink(ProgressSink):
+    """
+    Muestra los mensajes con Streamlit (st.info, st.progress, etc.)
+    Streamlit se importa al crear el receptor, no al importar este módulo.
+    """
+
+    def __init__(self):
+        import streamlit as st
+        self._st = st
+        self._barra = None
+
+    def emit(self, nivel: str, mensaje: str):
+        getattr(self._st, nivel, self._st.info)(mensaje)
+
+    def details(self, titulo: str, texto: str):
+        with self._st.expander(titulo):
+            self._st.text(texto)
+
+    def progress(self, fraccion: float, texto: Optional[str] = None):
+        fraccion = min(max(float(fraccion), 0.0), 1.0)
+        if self._barra is None:
+            self._barra = self._st.progress(fraccion, text=texto)
+        else:
+            self._barra.progress(fraccion, text=texto)
+
+    def progress_done(self):
+        if self._barra is not None:
+            self._barra.empty()
+            self._barra = None
+
+
+class BufferSink(ProgressSink):
+    """
+    Guarda los mensajes y el último avance para mostrarlos después desde otro hilo
+
+    Streamlit solo puede dibujar desde el hilo de la sesión: el trabajo en
+    segundo plano escribe aquí y la página los vuelve a mostrar en cada rerun
+    con replay(). Es seguro escribir y leer desde hilos distintos.
+    """
+
+    def __init__(self):
+        self._mensajes = []  # [('emit', nivel, mensaje) | ('details', titulo, texto)]
+        self.avance: Optional[float] = None
+        self.texto_avance: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def emit(self, nivel: str, mensaje: str):
+        with self._lock:
+            self._mensajes.append(('emit', nivel, mensaje))
+
+    def details(self, titulo: str, texto: str):
+        with self._lock:
+            self._mensajes.append(('details', titulo, texto))
+
+    def progress(self, fraccion: float, texto: Optional[str] = None):
+        with self._lock:
+            self.avance, self.texto_avance = fraccion, texto
+
+    def progress_done(self):
+        with self._lock:
+            self.avance, self.texto_avance = None, None
+
+    def replay(self, destino: ProgressSink, con_avance: bool = True):
+        """Reenvía todos los mensajes guardados (y el avance en curso) a otro receptor"""
+        with self._lock:
+            mensajes = list(self._mensajes)
+            avance, texto = self.avance, self.texto_avance
+        for tipo, primero, segundo in mensajes:
+            if tipo == 'details':
+                destino.details(primero, segundo)
+            else:
+                destino.emit(primero, segundo)
+        if con_avance and avance is not None:
+            destino.progress(avance, texto)
+
+
+class ThrottledSink(ProgressSink):
+    """
+    Limita las actualizaciones de avance a 'max_por_segundo' (los mensajes pasan siempre)
+    Evita una llamada a la interfaz por cada elemento procesado. El avance final
+    (1.0) siempre se envía.
+    """
+
+    def __init__(self, destino: ProgressSink, max_por_segundo: Optional[float] = None):
+        if max_por_segundo is None:
+            max_por_segundo = PROGRESS_CONFIG['actualizaciones_por_segundo']
+        self.destino = destino
+        self.intervalo = 1.0 / max_por_segundo if max_por_segundo > 0 else 0.0
+        self._ultimo = 0.0
+        self._lock = threading.Lock()
+
+    def emit(self, nivel: str, mensaje: str):
+        self.destino.emit(nivel, mensaje)
+
+    def details(self, titulo: str, texto: str):
+        self.destino.details(titulo, texto)
+
+    def progress(self, fraccion: float, texto: Optional[str] = None):
+        ahora = time.monotonic()
+        with self._lock:
+            if fraccion < 1.0 and ahora - self._ultimo < self.intervalo:
+                return
+            self._ultimo = ahora
+        self.destino.progress(fraccion, texto)
+
+    def progress_done(self):
+        with self._lock:
+            self._ultimo = 0.0
+        self.destino.progress_done()
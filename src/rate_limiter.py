@@ -0,0 +1,85 @@
+"""
+Control de tasa y reintentos para servicios externos
+Token bucket por proveedor y backoff exponencial compartidos por la geocodificación
+y el cálculo de distancias con Google
+"""
+import random
+import threading
+import time
+from typing import Callable, Tuple, Type
+
+
+class TokenBucket:
+    """
+    Limitador de tasa tipo token bucket (seguro entre hilos)
+
+    Se reponen 'rate' tokens por segundo hasta un máximo de 'capacity'.
+    Cada llamada a acquire() consume tokens y espera si no hay suficientes.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        if rate <= 0:
+            raise ValueError("La tasa del token bucket debe ser mayor a 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """
+        Consume 'tokens' esperando lo necesario para respetar la tasa
+        Solicitudes mayores a la capacidad se permiten acumulando deuda
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        # Esperar fuera del lock: los demás hilos ven la deuda y esperan su turno
+        if wait > 0:
+            time.sleep(wait)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, maximum: float = 30.0) -> float:
+    """
+    Espera para el intento 'attempt' (0, 1, 2...) con backoff exponencial y jitter
+    base, 2·base, 4·base... acotado por 'maximum'
+    """
+    delay = min(maximum, base * (2 ** attempt))
+    return delay * (0.5 + random.random() / 2)
+
+
+def call_with_backoff(func: Callable, retries: int = 3, base: float = 1.0, maximum: float = 30.0,
+                      retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+                      bucket: TokenBucket = None, tokens: float = 1.0):
+    """
+    Ejecuta func() reintentando con backoff exponencial ante errores transitorios
+
+    Args:
+        func: Función sin argumentos a ejecutar
+        retries: Número total de intentos
+        base: Espera inicial en segundos
+        maximum: Espera máxima entre intentos
+        retry_on: Excepciones que se consideran transitorias
+        bucket: Token bucket opcional que se consulta antes de cada intento
+        tokens: Tokens a consumir por intento
+
+    Returns:
+        El resultado de func()
+
+    Raises:
+        La última excepción si se agotan los intentos
+    """
+    retries = max(1, int(retries))
+    for attempt in range(retries):
+        if bucket is not None:
+            bucket.acquire(tokens)
+        try:
+            return func()
+        except retry_on:
+            if attempt >= retries - 1:
+                raise
+            time.sleep(backoff_delay(attempt, base, maximum))
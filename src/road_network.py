@@ -0,0 +1,430 @@
+"""
+Red vial local a partir de un extracto de OpenStreetMap
+Convierte el XML de OSM (.osm, .osm.bz2, .osm.gz) en un grafo dirigido en
+formato CSR que se guarda una vez en .npz; con él se calculan matrices de
+distancia y duración por carretera (Dijkstra) sin llamadas a servicios externos.
+
+Preparar el grafo de una ciudad:
+    python src/road_network.py medellin.osm.bz2 --salida data/osm/red_vial.npz
+"""
+import argparse
+import bz2
+import gzip
+import heapq
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import ROAD_NETWORK_CONFIG
+from distance_engine import haversine_km
+
+# SciPy es opcional: si está disponible, Dijkstra corre en C
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as scipy_dijkstra
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+# Grafos ya cargados en este proceso: ruta -> (fecha de modificación, RoadNetwork)
+_REDES_CARGADAS: Dict[str, Tuple[float, 'RoadNetwork']] = {}
+
+# Grafo del proceso de trabajo (se asigna una vez en el inicializador del pool)
+_GRAFO_WORKER = None
+
+
+def _abrir(path: str):
+    """Abre el extracto de OSM, comprimido o no"""
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _velocidad_kmh(tags: Dict[str, str], velocidades: Dict[str, float]) -> float:
+    """Velocidad de la vía: 'maxspeed' si es numérica, si no la del tipo de vía"""
+    maxspeed = tags.get('maxspeed', '')
+    partes = maxspeed.split()
+    if partes and partes[0].isdigit():
+        valor = float(partes[0])
+        return valor * 1.609 if len(partes) > 1 and partes[1] == 'mph' else valor
+    return float(velocidades[tags['highway']])
+
+
+def _sentido(tags: Dict[str, str]) -> int:
+    """1 = solo en el sentido de los nodos, -1 = solo en sentido contrario, 0 = doble sentido"""
+    oneway = tags.get('oneway', '')
+    if oneway in ('yes', 'true', '1'):
+        return 1
+    if oneway == '-1':
+        return -1
+    if oneway == 'no':
+        return 0
+    if tags.get('junction') in ('roundabout', 'circular') or tags.get('highway') == 'motorway':
+        return 1
+    return 0
+
+
+def parse_osm(path: str, velocidades: Optional[Dict[str, float]] = None):
+    """
+    Lee nodos y vías transitables del XML de OSM con iterparse (memoria acotada)
+
+    Returns:
+        (coordenadas {id: (lat, lon)}, vías [(ids de nodos, velocidad_kmh, sentido)])
+        Las vías se parten donde falta un nodo (borde del extracto).
+    """
+    velocidades = velocidades or ROAD_NETWORK_CONFIG['velocidades_kmh']
+    coordenadas = {}
+    vias = []
+
+    with _abrir(path) as archivo:
+        for _, elem in ET.iterparse(archivo, events=('end',)):
+            if elem.tag == 'node':
+                coordenadas[int(elem.get('id'))] = (float(elem.get('lat')), float(elem.get('lon')))
+                elem.clear()
+            elif elem.tag == 'way':
+                tags = {t.get('k'): t.get('v') for t in elem.iter('tag')}
+                if (tags.get('highway') in velocidades and tags.get('area') != 'yes'
+                        and tags.get('access') not in ('no', 'private')):
+                    velocidad = _velocidad_kmh(tags, velocidades)
+                    sentido = _sentido(tags)
+                    tramo = []
+                    for nd in elem.iter('nd'):
+                        ref = int(nd.get('ref'))
+                        if ref in coordenadas:
+                            tramo.append(ref)
+                        else:
+                            if len(tramo) > 1:
+                                vias.append((tramo, velocidad, sentido))
+                            tramo = []
+                    if len(tramo) > 1:
+                        vias.append((tramo, velocidad, sentido))
+                elem.clear()
+            elif elem.tag == 'relation':
+                elem.clear()
+
+    return coordenadas, vias
+
+
+def _componente_mayor(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Máscara de los nodos del componente débilmente conexo más grande"""
+    etiquetas = np.arange(n)
+    while True:
+        anteriores = etiquetas.copy()
+        minimo = np.minimum(etiquetas[u], etiquetas[v])
+        np.minimum.at(etiquetas, u, minimo)
+        np.minimum.at(etiquetas, v, minimo)
+        etiquetas = etiquetas[etiquetas]  # Saltos de puntero: acelera la propagación
+        if np.array_equal(etiquetas, anteriores):
+            break
+    return etiquetas == np.bincount(etiquetas).argmax()
+
+
+class RoadNetwork:
+    """
+    Grafo vial dirigido en formato CSR
+
+    Los nodos son intersecciones y extremos de vía (los nodos intermedios de
+    cada calle se contraen en la longitud de la arista). Cada arista tiene
+    longitud en metros y tiempo de viaje en segundos.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, indptr: np.ndarray, indices: np.ndarray,
+                 longitud_m: np.ndarray, tiempo_s: np.ndarray):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.longitud_m = np.asarray(longitud_m, dtype=np.float32)
+        self.tiempo_s = np.asarray(tiempo_s, dtype=np.float32)
+        self._indice = None
+        self._csr = {}
+
+    @property
+    def num_nodos(self) -> int:
+        return len(self.lat)
+
+    @property
+    def num_aristas(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def from_osm(cls, path: str, velocidades: Optional[Dict[str, float]] = None) -> 'RoadNetwork':
+        """Construye el grafo desde un extracto de OSM (contrae nodos intermedios y deja el componente mayor)"""
+        coordenadas, vias = parse_osm(path, velocidades)
+
+        # Se conservan los nodos compartidos por varias vías y los extremos de cada vía
+        usos: Dict[int, int] = {}
+        for tramo, _, _ in vias:
+            for ref in tramo:
+                usos[ref] = usos.get(ref, 0) + 1
+            usos[tramo[0]] += 1
+            usos[tramo[-1]] += 1
+        conservados = [ref for ref, cantidad in usos.items() if cantidad > 1]
+        posicion = {ref: i for i, ref in enumerate(conservados)}
+
+        origen, destino, longitud, tiempo = [], [], [], []
+        for tramo, velocidad_kmh, sentido in vias:
+            lats = np.array([coordenadas[ref][0] for ref in tramo])
+            lons = np.array([coordenadas[ref][1] for ref in tramo])
+            segmentos_m = haversine_km(lats[:-1], lons[:-1], lats[1:], lons[1:]) * 1000
+            inicio, acumulado = 0, 0.0
+            for k in range(1, len(tramo)):
+                acumulado += segmentos_m[k - 1]
+                if tramo[k] not in posicion:
+                    continue
+                a, b = posicion[tramo[inicio]], posicion[tramo[k]]
+                if a != b:
+                    segundos = acumulado / (velocidad_kmh / 3.6)
+                    if sentido >= 0:
+                        origen.append(a); destino.append(b); longitud.append(acumulado); tiempo.append(segundos)
+                    if sentido <= 0:
+                        origen.append(b); destino.append(a); longitud.append(acumulado); tiempo.append(segundos)
+                inicio, acumulado = k, 0.0
+
+        if not origen:
+            raise ValueError(f"El archivo {path} no contiene vías transitables")
+
+        u, v = np.array(origen), np.array(destino)
+        lat = np.array([coordenadas[ref][0] for ref in conservados])
+        lon = np.array([coordenadas[ref][1] for ref in conservados])
+        longitud_m, tiempo_s = np.array(longitud), np.array(tiempo)
+
+        # Solo el componente mayor: evita ubicar paradas en fragmentos aislados del extracto
+        mascara = _componente_mayor(len(conservados), u, v)
+        nuevo_id = np.cumsum(mascara) - 1
+        aristas = mascara[u] & mascara[v]
+        u, v = nuevo_id[u[aristas]], nuevo_id[v[aristas]]
+        longitud_m, tiempo_s = longitud_m[aristas], tiempo_s[aristas]
+
+        orden = np.argsort(u, kind='stable')
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(u, minlength=int(mascara.sum())))])
+        return cls(lat[mascara], lon[mascara], indptr, v[orden], longitud_m[orden], tiempo_s[orden])
+
+    def save(self, path: str):
+        """Guarda el grafo en un .npz comprimido"""
+        directorio = os.path.dirname(path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        np.savez_compressed(path, lat=self.lat, lon=self.lon, indptr=self.indptr, indices=self.indices,
+                            longitud_m=self.longitud_m, tiempo_s=self.tiempo_s)
+
+    @classmethod
+    def load(cls, path: str) -> 'RoadNetwork':
+        """Carga un grafo guardado con save()"""
+        with np.load(path) as datos:
+            return cls(datos['lat'], datos['lon'], datos['indptr'], datos['indices'],
+                       datos['longitud_m'], datos['tiempo_s'])
+
+    def _build_index(self):
+        """Índice espacial por celdas: (fila, columna) -> nodos de la celda"""
+        celda = ROAD_NETWORK_CONFIG['celda_indice_grados']
+        filas = np.floor(self.lat / celda).astype(np.int64)
+        columnas = np.floor(self.lon / celda).astype(np.int64)
+        orden = np.lexsort((columnas, filas))
+        claves = np.stack([filas[orden], columnas[orden]], axis=1)
+        cortes = np.flatnonzero(np.any(np.diff(claves, axis=0) != 0, axis=1)) + 1
+        self._indice = {
+            (int(grupo_claves[0, 0]), int(grupo_claves[0, 1])): grupo
+            for grupo, grupo_claves in zip(np.split(orden, cortes), np.split(claves, cortes))
+        }
+
+    def snap(self, lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nodo vial más cercano a cada coordenada
+
+        Returns:
+            (nodos, distancia en metros); nodo -1 si no hay red a menos de
+            'max_distancia_snap_m'
+        """
+        if self._indice is None:
+            self._build_index()
+
+        celda = ROAD_NETWORK_CONFIG['celda_indice_grados']
+        max_m = ROAD_NETWORK_CONFIG['max_distancia_snap_m']
+        max_anillo = int(np.ceil(max_m / (celda * 111_000) / max(np.cos(np.radians(np.max(np.abs(lats)))), 0.1))) + 1
+
+        nodos = np.full(len(lats), -1, dtype=np.int64)
+        distancias = np.full(len(lats), np.inf)
+        for k, (lat, lon) in enumerate(zip(lats, lons)):
+            fila, columna = int(np.floor(lat / celda)), int(np.floor(lon / celda))
+            encontrado_en = None
+            for anillo in range(max_anillo + 1):
+                # Con candidatos en un anillo, el más cercano puede estar en el siguiente
+                if encontrado_en is not None and anillo > encontrado_en + 1:
+                    break
+                candidatos = [
+                    self._indice[(fila + df, columna + dc)]
+                    for df in range(-anillo, anillo + 1)
+                    for dc in range(-anillo, anillo + 1)
+                    if max(abs(df), abs(dc)) == anillo and (fila + df, columna + dc) in self._indice
+                ]
+                if not candidatos:
+                    continue
+                candidatos = np.concatenate(candidatos)
+                d = haversine_km(lat, lon, self.lat[candidatos], self.lon[candidatos]) * 1000
+                mejor = int(np.argmin(d))
+                if d[mejor] < distancias[k]:
+                    nodos[k], distancias[k] = candidatos[mejor], d[mejor]
+                if encontrado_en is None:
+                    encontrado_en = anillo
+
+        fuera = distancias > max_m
+        nodos[fuera] = -1
+        return nodos, distancias
+
+    def shortest_paths(self, fuentes: np.ndarray, destinos: np.ndarray, peso: str = 'longitud_m') -> np.ndarray:
+        """
+        Costo mínimo de cada fuente a cada destino (inf si no hay ruta)
+
+        Args:
+            fuentes, destinos: Índices de nodo
+            peso: 'longitud_m' (ruta más corta) o 'tiempo_s' (ruta más rápida)
+        """
+        fuentes = np.asarray(fuentes, dtype=np.int64)
+        destinos = np.asarray(destinos, dtype=np.int64)
+        resultado = np.full((len(fuentes), len(destinos)), np.inf)
+        if len(fuentes) == 0 or len(destinos) == 0:
+            return resultado
+
+        if SCIPY_AVAILABLE:
+            if peso not in self._csr:
+                self._csr[peso] = csr_matrix((getattr(self, peso).astype(np.float64), self.indices, self.indptr),
+                                             shape=(self.num_nodos, self.num_nodos))
+            # Por bloques: cada fila de SciPy tiene un valor por nodo del grafo
+            for inicio in range(0, len(fuentes), 64):
+                bloque = fuentes[inicio:inicio + 64]
+                resultado[inicio:inicio + 64] = scipy_dijkstra(self._csr[peso], directed=True, indices=bloque)[:, destinos]
+            return resultado
+
+        grafo = (self.indptr.tolist(), self.indices.tolist(), getattr(self, peso).tolist())
+        objetivos = destinos.tolist()
+        max_procesos = ROAD_NETWORK_CONFIG['max_procesos'] or os.cpu_count() or 1
+        if len(fuentes) >= ROAD_NETWORK_CONFIG['min_fuentes_paralelo'] and max_procesos > 1:
+            bloques = np.array_split(fuentes, max_procesos * 4)
+            try:
+                with ProcessPoolExecutor(max_workers=max_procesos, initializer=_iniciar_worker,
+                                         initargs=(grafo,)) as executor:
+                    filas = list(executor.map(_dijkstra_bloque, [(b.tolist(), objetivos) for b in bloques]))
+                return np.vstack([f for f in filas if len(f)])
+            except (BrokenProcessPool, OSError, NotImplementedError):
+                pass  # Sin procesos disponibles: continuar en serie
+
+        for k, fuente in enumerate(fuentes.tolist()):
+            resultado[k] = _dijkstra(grafo, fuente, objetivos)
+        return resultado
+
+    def matrices(self, lats, lons, lats_destino=None, lons_destino=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Matrices de distancia (m, ruta más corta) y duración (s, ruta más rápida)
+        entre coordenadas, incluido el tramo de acceso a la red en cada extremo
+
+        Sin coordenadas de destino la matriz es cuadrada (todas contra todas);
+        con ellas, filas = (lats, lons) y columnas = destinos. Los pares sin ruta
+        (o con un extremo fuera del mapa) quedan en inf.
+        """
+        cuadrada = lats_destino is None
+        nodos, acceso_m = self.snap(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+        if cuadrada:
+            nodos_destino, acceso_destino_m = nodos, acceso_m
+        else:
+            nodos_destino, acceso_destino_m = self.snap(np.asarray(lats_destino, dtype=float),
+                                                        np.asarray(lons_destino, dtype=float))
+
+        dentro = np.flatnonzero(nodos >= 0)
+        dentro_destino = np.flatnonzero(nodos_destino >= 0)
+        unicos, inversa = np.unique(nodos[dentro], return_inverse=True)
+        unicos_destino, inversa_destino = np.unique(nodos_destino[dentro_destino], return_inverse=True)
+
+        distancia = np.full((len(nodos), len(nodos_destino)), np.inf)
+        duracion = np.full((len(nodos), len(nodos_destino)), np.inf)
+        bloque = np.ix_(dentro, dentro_destino)
+        seleccion = np.ix_(inversa, inversa_destino)
+        distancia[bloque] = self.shortest_paths(unicos, unicos_destino, 'longitud_m')[seleccion]
+        duracion[bloque] = self.shortest_paths(unicos, unicos_destino, 'tiempo_s')[seleccion]
+
+        acceso = acceso_m[:, np.newaxis] + acceso_destino_m[np.newaxis, :]
+        distancia += acceso
+        duracion += acceso / (ROAD_NETWORK_CONFIG['velocidad_acceso_kmh'] / 3.6)
+        if cuadrada:
+            np.fill_diagonal(distancia, 0)
+            np.fill_diagonal(duracion, 0)
+        return distancia, duracion
+
+
+def _dijkstra(grafo, fuente: int, objetivos: List[int]) -> List[float]:
+    """Dijkstra con heap desde una fuente; se detiene al fijar todos los objetivos"""
+    indptr, indices, pesos = grafo
+    costo = {fuente: 0.0}
+    pendientes = set(objetivos)
+    heap = [(0.0, fuente)]
+    while heap and pendientes:
+        d, u = heapq.heappop(heap)
+        if d > costo[u]:
+            continue
+        pendientes.discard(u)
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nuevo = d + pesos[k]
+            if nuevo < costo.get(v, float('inf')):
+                costo[v] = nuevo
+                heapq.heappush(heap, (nuevo, v))
+    return [costo.get(objetivo, float('inf')) for objetivo in objetivos]
+
+
+def _iniciar_worker(grafo):
+    global _GRAFO_WORKER
+    _GRAFO_WORKER = grafo
+
+
+def _dijkstra_bloque(tarea) -> np.ndarray:
+    """Dijkstra para un bloque de fuentes en un proceso del pool"""
+    fuentes, objetivos = tarea
+    return np.array([_dijkstra(_GRAFO_WORKER, fuente, objetivos) for fuente in fuentes]).reshape(len(fuentes), len(objetivos))
+
+
+def load_road_network(path: Optional[str] = None) -> RoadNetwork:
+    """
+    Carga el grafo configurado (una vez por proceso mientras el archivo no cambie)
+
+    Raises:
+        FileNotFoundError: Si el grafo no se ha preparado
+    """
+    path = path or ROAD_NETWORK_CONFIG['archivo_grafo']
+    if not os.path.isfile(path):
+        raise FileNotFoundError(
+            f"No existe el grafo vial {path}. Prepáralo con: python src/road_network.py mapa.osm --salida {path}"
+        )
+    modificado = os.path.getmtime(path)
+    cargada = _REDES_CARGADAS.get(path)
+    if cargada is None or cargada[0] != modificado:
+        cargada = (modificado, RoadNetwork.load(path))
+        _REDES_CARGADAS[path] = cargada
+    return cargada[1]
+
+
+def road_network_signature(path: Optional[str] = None) -> Optional[str]:
+    """Identifica la versión del grafo (ruta y fecha) para huellas y reutilización de matrices"""
+    path = path or ROAD_NETWORK_CONFIG['archivo_grafo']
+    return f"{path}@{os.path.getmtime(path):.0f}" if os.path.isfile(path) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepara el grafo vial local desde un extracto de OpenStreetMap")
+    parser.add_argument('osm', help="Archivo .osm, .osm.bz2 u .osm.gz (por ejemplo, exportado de openstreetmap.org o Geofabrik)")
+    parser.add_argument('--salida', default=ROAD_NETWORK_CONFIG['archivo_grafo'], help="Archivo .npz de salida")
+    args = parser.parse_args()
+
+    red = RoadNetwork.from_osm(args.osm)
+    red.save(args.salida)
+    print(f"✅ Grafo guardado en {args.salida}: {red.num_nodos} nodos, {red.num_aristas} aristas")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
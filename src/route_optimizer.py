@@ -3,20 +3,35 @@ Módulo para optimización de rutas usando OR-Tools
 Versión 2.2 - Soporta múltiples depósitos, múltiples objetivos y distancias reales por carretera
 Resuelve el Vehicle Routing Problem (VRP) con diferentes criterios: distancia, tiempo, costo, vehículos y balanceado
 """
+import copy
+import hashlib
+import json
+import time
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Tuple, Optional
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
-import streamlit as st
-from config import CALCULATION_CONFIG
+from config import CALCULATION_CONFIG, CACHE_CONFIG, CALIBRATION_CONFIG, DISTANCE_METHODS, GOOGLE_DIRECTIONS_CONFIG, ROAD_NETWORK_CONFIG
+from cache import DistanceCache
+from calibration import DetourCalibration, load_calibration
+from distance_engine import haversine_km, haversine_matrix_m, nearest_neighbor_mask
+from presolve import is_enabled, regret_assignment, run_presolve
+from progress import NullSink, ProgressSink
+from road_network import load_road_network, road_network_signature
+from security import safe_log
+from rate_limiter import TokenBucket, call_with_backoff
 
 # Intentar importar googlemaps para Directions API
 try:
     import googlemaps
     GOOGLEMAPS_AVAILABLE = True
+    # Errores de red de Google Maps que justifican reintentar un bloque
+    GOOGLE_TRANSIENT_ERRORS = (googlemaps.exceptions.Timeout, googlemaps.exceptions.TransportError)
 except ImportError:
     GOOGLEMAPS_AVAILABLE = False
+    GOOGLE_TRANSIENT_ERRORS = ()
 
 
 class RouteOptimizer:
@@ -25,7 +40,9 @@ class RouteOptimizer:
     def __init__(self, origenes: pd.DataFrame, destinos: pd.DataFrame, flota: pd.DataFrame,
                  config: Dict = None, optimization_type: str = 'distancia',
                  distance_method: str = 'haversine', google_api_key_directions: Optional[str] = None,
-                 considerar_trafico: bool = False, hora_salida_rutas: Optional[object] = None):
+                 considerar_trafico: bool = False, hora_salida_rutas: Optional[object] = None,
+                 distance_cache: Optional[DistanceCache] = None, previous_matrices: Optional[Dict] = None,
+                 modelo_trafico: str = 'best_guess', progress_sink: Optional[ProgressSink] = None):
         self.origenes = origenes
         self.destinos = destinos
         self.flota = flota
@@ -35,11 +52,23 @@ class RouteOptimizer:
         self.google_api_key_directions = google_api_key_directions
         self.considerar_trafico = considerar_trafico
         self.hora_salida_rutas = hora_salida_rutas
+        self.modelo_trafico = modelo_trafico
+        # Receptor de mensajes y avance (por defecto no muestra nada; la interfaz pasa un StreamlitSink)
+        self.sink = progress_sink or NullSink()
         self.distance_matrix = None
         self.time_matrix = None
         self.duration_matrix = None  # Tiempos reales de Google Directions
+        self.google_estimated = None  # Pares de Google estimados con Haversine en modo disperso
+        self.google_fallback = None  # Pares de Google completados con Haversine porque su consulta falló
         self.cost_matrix = None
         self.solution = None
+        self.search_stats = None  # Estadísticas de la última búsqueda (ramas, vecinos aceptados, etc.)
+        self.presolve = None  # Resultado del preproceso de la última resolución (ver presolve.run_presolve)
+        self.candidate_arcs = None  # Máscara de arcos candidatos (modo de arcos dispersos) o None
+        self.distance_cache = distance_cache  # Caché persistente de Google (se crea al primer uso)
+        self.distance_cache_failed = False
+        # Matrices de una optimización anterior (ver get_matrix_snapshot) para actualizar solo lo nuevo
+        self.previous_matrices = previous_matrices
 
         # Inicializar cliente de Google Directions si es necesario
         if self.distance_method == 'google_directions' and self.google_api_key_directions:
@@ -47,12 +76,12 @@ class RouteOptimizer:
                 try:
                     self.gmaps_client = googlemaps.Client(key=self.google_api_key_directions)
                 except Exception as e:
-                    st.error(f"❌ Error al inicializar Google Directions: {str(e)}")
-                    st.warning("⚠️ Usando método Haversine como alternativa")
+                    safe_log(f"❌ Error al inicializar Google Directions: {str(e)}", "error", self.sink)
+                    self.sink.warning("⚠️ Usando método Haversine como alternativa")
                     self.distance_method = 'haversine'
             else:
-                st.error("❌ Librería googlemaps no disponible")
-                st.warning("⚠️ Usando método Haversine como alternativa")
+                self.sink.error("❌ Librería googlemaps no disponible")
+                self.sink.warning("⚠️ Usando método Haversine como alternativa")
                 self.distance_method = 'haversine'
 
     def calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -92,130 +121,458 @@ class RouteOptimizer:
 
         return distance_km * costo_km
 
-    def create_distance_matrix_google_directions(self) -> Tuple[np.ndarray, np.ndarray]:
+    def get_distance_cache(self) -> Optional[DistanceCache]:
         """
-        Crea matriz de distancias usando Google Directions API (distancias reales por carretera)
-        Retorna (distance_matrix en metros, duration_matrix en segundos)
+        Retorna la caché persistente de distancias de Google (se crea al primer uso)
+        Retorna None si la caché está deshabilitada en CACHE_CONFIG
         """
-        # Combinar orígenes y destinos
+        if self.distance_cache is None and CACHE_CONFIG['distancias']['habilitada'] and not self.distance_cache_failed:
+            try:
+                self.distance_cache = DistanceCache()
+            except Exception as e:
+                self.sink.warning(f"⚠️ No se pudo abrir la caché de distancias: {str(e)}")
+                self.distance_cache_failed = True
+        return self.distance_cache
+
+    def get_traffic_bucket(self) -> Tuple[Dict, str]:
+        """
+        Calcula los parámetros de tráfico para la API y la franja de tráfico
+        que se usa como parte de la clave de la caché
+        Retorna (parametros_api, franja)
+        """
+        if not self.considerar_trafico:
+            return {}, 'sin_trafico'
+
+        import datetime
+        now = datetime.datetime.now()
+
+        if self.hora_salida_rutas:
+            # Tráfico predictivo: usar hora específica
+            departure = now.replace(
+                hour=self.hora_salida_rutas.hour,
+                minute=self.hora_salida_rutas.minute,
+                second=0,
+                microsecond=0
+            )
+            # Si la hora ya pasó hoy, usar mañana
+            if departure < now:
+                departure += datetime.timedelta(days=1)
+            traffic_model = self.modelo_trafico
+            params = {'departure_time': departure, 'traffic_model': traffic_model}
+            # Franja: día de la semana + hora en bloques de 15 minutos + modelo
+            bucket = f"predictivo_{departure.weekday()}_{departure.hour:02d}{departure.minute // 15 * 15:02d}_{traffic_model}"
+        else:
+            # Tráfico actual
+            params = {'departure_time': 'now', 'traffic_model': 'best_guess'}
+            bucket = f"actual_{now.weekday()}_{now.hour:02d}"
+
+        return params, bucket
+
+    def get_cost_per_request(self) -> float:
+        """Costo estimado por request a Google (con tráfico cuesta el doble)"""
+        costo = DISTANCE_METHODS['google_directions']['costo_por_request']
+        return costo * 2 if self.considerar_trafico else costo
+
+    def get_all_coordinates(self) -> List[Tuple[float, float]]:
+        """Lista de (latitud, longitud) de orígenes seguidos de destinos (orden de la matriz)"""
         all_locations = pd.concat([
             self.origenes[['latitud', 'longitud']],
             self.destinos[['latitud', 'longitud']]
         ], ignore_index=True)
+        return list(zip(all_locations['latitud'].astype(float), all_locations['longitud'].astype(float)))
+
+    def plan_google_requests(self, missing: np.ndarray,
+                             order: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Divide los pares faltantes en bloques para la Distance Matrix API
+
+        Recorre la matriz en bloques de hasta 25 × 25 y, dentro de cada bloque,
+        solo pide las filas y columnas que tienen algún par faltante. Los bloques
+        completamente cubiertos por la caché no generan request. Si un bloque
+        supera el máximo de elementos por request, se parte por filas.
+
+        Args:
+            missing: Máscara (n × n) de pares a consultar
+            order: Permutación opcional de los nodos (ver get_spatial_order); con
+                   pares dispersos agrupa vecinos en los mismos bloques
+
+        Returns:
+            Lista de (indices_filas, indices_columnas), uno por request
+        """
+        if order is not None:
+            tiles = self.plan_google_requests(missing[np.ix_(order, order)])
+            return [(order[rows], order[cols]) for rows, cols in tiles]
+
+        cfg = GOOGLE_DIRECTIONS_CONFIG
+        batch_rows = cfg['max_origenes_por_request']
+        batch_cols = cfg['max_destinos_por_request']
+        max_elements = cfg['max_elementos_por_request']
+        n_rows, n_cols = missing.shape
+        tiles = []
+
+        for i in range(0, n_rows, batch_rows):
+            for j in range(0, n_cols, batch_cols):
+                block = missing[i:i + batch_rows, j:j + batch_cols]
+                if block.any():
+                    rows = i + np.flatnonzero(block.any(axis=1))
+                    cols = j + np.flatnonzero(block.any(axis=0))
+                    rows_per_request = max(1, max_elements // len(cols))
+                    for start in range(0, len(rows), rows_per_request):
+                        tiles.append((rows[start:start + rows_per_request], cols))
+
+        return tiles
+
+    def get_google_neighbors_k(self) -> int:
+        """
+        Pares consultados por destino a Google ('google_vecinos_k'); 0 si se consultan todos
+        """
+        try:
+            k = int(self.config.get('google_vecinos_k', GOOGLE_DIRECTIONS_CONFIG['vecinos_k']) or 0)
+        except (TypeError, ValueError):
+            k = 0
+        return max(k, 0)
+
+    def get_google_pair_mask(self, coords: List[Tuple[float, float]]) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Pares que vale la pena consultar a Google en modo disperso
+
+        Solo los arcos desde y hacia los orígenes y, para cada destino, los k
+        destinos más cercanos en línea recta. El resto nunca serán paradas
+        consecutivas en una buena ruta y se estiman con Haversine × factor de desvío.
+
+        Returns:
+            (máscara de pares a consultar, matriz Haversine en metros), o (None, None)
+            si se consultan todos los pares
+        """
+        k = self.get_google_neighbors_k()
+        if k <= 0:
+            return None, None
+
+        coords_array = np.asarray(coords, dtype=float)
+        block_size = int(self.config.get('haversine_block_size', CALCULATION_CONFIG['haversine_block_size']))
+        haversine_m = haversine_matrix_m(coords_array[:, 0], coords_array[:, 1], block_size=block_size)
+        mask = nearest_neighbor_mask(haversine_m, k, num_fijos=len(self.origenes), block_size=block_size)
+        return mask, haversine_m
+
+    def get_spatial_order(self, coords: List[Tuple[float, float]]) -> np.ndarray:
+        """
+        Orden de los nodos que recorre la zona en franjas (serpentina)
+
+        Los nodos cercanos quedan en posiciones cercanas, de modo que los pares
+        vecinos caen en pocos bloques de 25 × 25 al planear los requests.
+        """
+        coords_array = np.asarray(coords, dtype=float)
+        lats, lons = coords_array[:, 0], coords_array[:, 1]
+        num_franjas = max(1, int(np.sqrt(len(coords) / GOOGLE_DIRECTIONS_CONFIG['max_origenes_por_request'])))
+        alto = (lats.max() - lats.min()) / num_franjas or 1.0
+        franja = np.minimum(((lats - lats.min()) / alto).astype(np.int64), num_franjas - 1)
+        # Franjas pares de oeste a este, impares de este a oeste
+        sentido = np.where(franja % 2 == 0, lons, -lons)
+        return np.lexsort((sentido, franja))
+
+    def lookup_google_cache(self, coords: List[Tuple[float, float]], traffic_bucket: str,
+                            count_stats: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Consulta la caché de distancias para todos los pares
+        Retorna (distancias_m, duraciones_s, faltantes); la diagonal nunca falta
+        """
+        n = len(coords)
+        cache = self.get_distance_cache()
+
+        if cache is not None:
+            distance_matrix, duration_matrix, found = cache.lookup_matrix(
+                coords, 'driving', traffic_bucket, registrar_estadisticas=count_stats
+            )
+        else:
+            distance_matrix = np.zeros((n, n), dtype=np.int64)
+            duration_matrix = np.zeros((n, n), dtype=np.int64)
+            found = np.zeros((n, n), dtype=bool)
 
-        n = len(all_locations)
-        distance_matrix = np.zeros((n, n))
-        duration_matrix = np.zeros((n, n))
+        missing = ~found
+        np.fill_diagonal(missing, False)
+        return distance_matrix, duration_matrix, missing
 
-        # Preparar lista de coordenadas
-        origins = [(row['latitud'], row['longitud']) for _, row in all_locations.iterrows()]
+    def estimate_google_requests(self) -> Dict:
+        """
+        Estima requests y costo de Google Directions considerando solo los bloques
+        que no están en la caché local
+        """
+        coords = self.get_all_coordinates()
+        _, traffic_bucket = self.get_traffic_bucket()
+        _, _, missing = self.lookup_google_cache(coords, traffic_bucket, count_stats=False)
+        n = len(coords)
+        pares_en_cache = n * (n - 1) - int(missing.sum())
+
+        requested, _ = self.get_google_pair_mask(coords)
+        order = None
+        pares_estimados = 0
+        if requested is not None:
+            pares_estimados = int((missing & ~requested).sum())
+            missing &= requested
+            order = self.get_spatial_order(coords)
+        requests = len(self.plan_google_requests(missing, order))
+
+        return {
+            'ubicaciones': n,
+            'pares_totales': n * (n - 1),
+            'pares_en_cache': pares_en_cache,
+            'pares_estimados': pares_estimados,
+            'requests': requests,
+            'costo_usd': requests * self.get_cost_per_request()
+        }
+
+    def fetch_google_tiles(self, coords: List[Tuple[float, float]], tiles: List[Tuple[np.ndarray, np.ndarray]],
+                           traffic_params: Dict, progress_callback=None) -> Tuple[Dict[int, Dict], Dict[int, str]]:
+        """
+        Descarga los bloques de la Distance Matrix API en paralelo
+
+        Usa un pool de hilos acotado y dos límites de tasa (requests por segundo y
+        elementos por segundo). Cada bloque se reintenta con backoff exponencial
+        ante errores transitorios; un bloque que falla no afecta a los demás.
+
+        Args:
+            coords: Coordenadas de todos los nodos
+            tiles: Bloques (filas, columnas) a descargar
+            traffic_params: Parámetros de tráfico para la API
+            progress_callback: Función (completados, total) llamada desde el hilo que invoca
+
+        Returns:
+            Tupla (resultados, errores) indexados por número de bloque
+        """
+        cfg = GOOGLE_DIRECTIONS_CONFIG
+        request_limiter = TokenBucket(cfg['max_requests_por_segundo'])
+        element_limiter = TokenBucket(cfg['max_elementos_por_segundo'])
+
+        def fetch(rows, cols):
+            api_params = {
+                'origins': [coords[i] for i in rows],
+                'destinations': [coords[j] for j in cols],
+                'mode': 'driving',
+                'units': 'metric'
+            }
+            # Agregar parámetros de tráfico si está habilitado
+            api_params.update(traffic_params)
+
+            def call():
+                request_limiter.acquire()
+                element_limiter.acquire(len(rows) * len(cols))
+                return self.gmaps_client.distance_matrix(**api_params)
+
+            return call_with_backoff(
+                call,
+                retries=cfg['max_reintentos'],
+                base=cfg['backoff_base_s'],
+                maximum=cfg['backoff_max_s'],
+                retry_on=GOOGLE_TRANSIENT_ERRORS or (Exception,)
+            )
 
-        # Procesar en lotes para respetar límites de API
-        batch_size = 25  # Google permite máximo 25 origins × 25 destinations por request
-        total_requests = (n // batch_size + 1) ** 2
+        results = {}
+        errors = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, int(cfg['workers']))) as executor:
+            futures = {
+                executor.submit(fetch, rows, cols): tile_number
+                for tile_number, (rows, cols) in enumerate(tiles)
+            }
+            for completed, future in enumerate(as_completed(futures), start=1):
+                tile_number = futures[future]
+                try:
+                    results[tile_number] = future.result()
+                except Exception as e:
+                    errors[tile_number] = str(e)
+
+                if progress_callback is not None:
+                    progress_callback(completed, len(tiles))
+
+        return results, errors
+
+    def create_distance_matrix_google_directions(self, known: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+                                                 ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Crea matriz de distancias usando Google Directions API (distancias reales por carretera)
+        Reutiliza los pares guardados en la caché persistente y solo consulta los faltantes;
+        los bloques se descargan en paralelo y los que fallan se completan con Haversine
+
+        Args:
+            known: Opcional (distancias, duraciones, máscara) con pares ya conocidos
+                   (ej. de una optimización anterior) que no deben consultarse
+
+        Retorna (distance_matrix en metros, duration_matrix en segundos)
+        """
+        coords = self.get_all_coordinates()
+        n = len(coords)
+
+        traffic_params, traffic_bucket = self.get_traffic_bucket()
+        distance_matrix, duration_matrix, missing = self.lookup_google_cache(coords, traffic_bucket)
+
+        reused_pairs = 0
+        if known is not None:
+            known_distance, known_duration, known_mask = known
+            distance_matrix[known_mask] = known_distance[known_mask]
+            duration_matrix[known_mask] = known_duration[known_mask]
+            reused_pairs = int((known_mask & missing).sum())
+            missing &= ~known_mask
+        cached_pairs = n * (n - 1) - int(missing.sum()) - reused_pairs
+
+        # Modo disperso: solo se consultan los pares cercanos, el resto se estima
+        requested, haversine_m = self.get_google_pair_mask(coords)
+        order = None
+        estimated = None
+        if requested is not None:
+            estimated = missing & ~requested
+            missing &= requested
+            order = self.get_spatial_order(coords)
+
+        tiles = self.plan_google_requests(missing, order)
+        total_requests = len(tiles)
 
         if self.considerar_trafico:
             if self.hora_salida_rutas:
-                st.info(f"🚦 Calculando distancias Y tiempos con tráfico predictivo para {self.hora_salida_rutas.strftime('%H:%M')}...")
+                self.sink.info(f"🚦 Calculando distancias Y tiempos con tráfico predictivo para {self.hora_salida_rutas.strftime('%H:%M')}...")
             else:
-                st.info(f"🚦 Calculando distancias Y tiempos con tráfico actual (ahora)...")
-            costo_por_request = 0.010  # Con tráfico cuesta el doble
+                self.sink.info(f"🚦 Calculando distancias Y tiempos con tráfico actual (ahora)...")
         else:
-            st.info(f"📡 Calculando distancias reales con Google Directions...")
-            costo_por_request = 0.005
-
-        st.info(f"💰 Esto realizará aproximadamente {total_requests} requests (~${total_requests * costo_por_request:.2f} USD)")
+            self.sink.info(f"📡 Calculando distancias reales con Google Directions...")
 
-        progress_bar = st.progress(0)
-        total_processed = 0
-        total_pairs = n * n
+        if reused_pairs > 0:
+            self.sink.info(f"♻️ {reused_pairs} de {n * (n - 1)} pares reutilizados de la optimización anterior")
+        if cached_pairs > 0:
+            self.sink.info(f"🗄️ {cached_pairs} de {n * (n - 1)} pares recuperados de la caché local")
 
-        try:
-            for i in range(0, n, batch_size):
-                for j in range(0, n, batch_size):
-                    # Obtener batch de orígenes y destinos
-                    batch_origins = origins[i:min(i + batch_size, n)]
-                    batch_destinations = origins[j:min(j + batch_size, n)]
-
-                    # Preparar parámetros para Directions API
-                    api_params = {
-                        'origins': batch_origins,
-                        'destinations': batch_destinations,
-                        'mode': 'driving',
-                        'units': 'metric'
-                    }
+        if estimated is not None and estimated.any():
+            self.sink.info(
+                f"📍 Solo se consultan los {self.get_google_neighbors_k()} vecinos más cercanos de cada destino; "
+                f"{int(estimated.sum())} pares lejanos se estiman con línea recta × {GOOGLE_DIRECTIONS_CONFIG['factor_desvio']}"
+            )
 
-                    # Agregar parámetros de tráfico si está habilitado
-                    if self.considerar_trafico:
-                        if self.hora_salida_rutas:
-                            # Tráfico predictivo: usar hora específica
-                            import datetime
-                            now = datetime.datetime.now()
-                            departure = now.replace(
-                                hour=self.hora_salida_rutas.hour,
-                                minute=self.hora_salida_rutas.minute,
-                                second=0,
-                                microsecond=0
-                            )
-                            # Si la hora ya pasó hoy, usar mañana
-                            if departure < now:
-                                departure += datetime.timedelta(days=1)
-                            api_params['departure_time'] = departure
-                            api_params['traffic_model'] = st.session_state.get('modelo_trafico', 'best_guess')
+        costo_por_request = self.get_cost_per_request()
+        self.sink.info(f"💰 Esto realizará aproximadamente {total_requests} requests (~${total_requests * costo_por_request:.2f} USD)")
+
+        results, errors = self.fetch_google_tiles(
+            coords, tiles, traffic_params,
+            progress_callback=lambda done, total: self.sink.progress(min(done / total, 1.0))
+        )
+        self.sink.progress_done()
+
+        new_entries = []
+        fallback_pairs = []
+
+        # Ensamblar en orden de bloque para que el resultado sea determinista
+        for tile_number, (rows, cols) in enumerate(tiles):
+            if tile_number not in results:
+                # Bloque fallido: completar sus pares faltantes con Haversine
+                fallback_pairs.extend(
+                    (i, j) for i in rows for j in cols if missing[i, j]
+                )
+                continue
+
+            for bi, row in enumerate(results[tile_number]['rows']):
+                for bj, element in enumerate(row['elements']):
+                    actual_i = rows[bi]
+                    actual_j = cols[bj]
+
+                    if element['status'] == 'OK':
+                        distance_matrix[actual_i][actual_j] = element['distance']['value']  # metros
+
+                        # Usar duration_in_traffic si está disponible (cuando se considera tráfico)
+                        if 'duration_in_traffic' in element:
+                            duration_matrix[actual_i][actual_j] = element['duration_in_traffic']['value']  # segundos con tráfico
                         else:
-                            # Tráfico actual
-                            api_params['departure_time'] = 'now'
-                            api_params['traffic_model'] = 'best_guess'
-
-                    # Llamar a Distance Matrix API
-                    result = self.gmaps_client.distance_matrix(**api_params)
-
-                    # Procesar resultados
-                    for bi, row in enumerate(result['rows']):
-                        for bj, element in enumerate(row['elements']):
-                            actual_i = i + bi
-                            actual_j = j + bj
-
-                            if element['status'] == 'OK':
-                                distance_matrix[actual_i][actual_j] = element['distance']['value']  # metros
-
-                                # Usar duration_in_traffic si está disponible (cuando se considera tráfico)
-                                if 'duration_in_traffic' in element:
-                                    duration_matrix[actual_i][actual_j] = element['duration_in_traffic']['value']  # segundos con tráfico
-                                else:
-                                    duration_matrix[actual_i][actual_j] = element['duration']['value']  # segundos sin tráfico
-                            else:
-                                # Si falla, usar Haversine como fallback
-                                distance_km = self.calculate_distance(
-                                    all_locations.iloc[actual_i]['latitud'],
-                                    all_locations.iloc[actual_i]['longitud'],
-                                    all_locations.iloc[actual_j]['latitud'],
-                                    all_locations.iloc[actual_j]['longitud']
-                                )
-                                distance_matrix[actual_i][actual_j] = distance_km * 1000
-                                # Estimar duración basada en velocidad promedio
-                                velocidad_kmh = CALCULATION_CONFIG['velocidad_promedio_kmh']
-                                duration_matrix[actual_i][actual_j] = (distance_km / velocidad_kmh) * 3600
-
-                            total_processed += 1
-                            progress_bar.progress(min(total_processed / total_pairs, 1.0))
-
-            progress_bar.empty()
-            st.success("✅ Distancias reales calculadas correctamente")
-
-        except Exception as e:
-            st.error(f"❌ Error al calcular distancias con Google Directions: {str(e)}")
-            st.warning("⚠️ Usando método Haversine como alternativa")
-            # Fallback a Haversine
-            return self.create_distance_matrix_haversine()
+                            duration_matrix[actual_i][actual_j] = element['duration']['value']  # segundos sin tráfico
+
+                        new_entries.append((
+                            coords[actual_i], coords[actual_j],
+                            distance_matrix[actual_i][actual_j], duration_matrix[actual_i][actual_j]
+                        ))
+                    else:
+                        # Si falla, usar Haversine como fallback (no se guarda en caché)
+                        fallback_pairs.append((actual_i, actual_j))
+
+        self.fill_pairs_with_haversine(coords, fallback_pairs, distance_matrix, duration_matrix)
+        self.google_fallback = np.zeros((n, n), dtype=bool)
+        if fallback_pairs:
+            fallback_rows, fallback_cols = zip(*fallback_pairs)
+            self.google_fallback[list(fallback_rows), list(fallback_cols)] = True
+
+        if estimated is not None:
+            factor = GOOGLE_DIRECTIONS_CONFIG['factor_desvio']
+            velocidad_kmh = CALCULATION_CONFIG['velocidad_promedio_kmh']
+            estimated_m = haversine_m[estimated] * factor
+            distance_matrix[estimated] = estimated_m
+            duration_matrix[estimated] = estimated_m / 1000 / velocidad_kmh * 3600
+        self.google_estimated = estimated
+
+        # Guardar lo descargado para no volver a pagarlo
+        cache = self.get_distance_cache()
+        if cache is not None and new_entries:
+            try:
+                cache.store(new_entries, 'driving', traffic_bucket)
+            except Exception as cache_error:
+                self.sink.warning(f"⚠️ No se pudo actualizar la caché de distancias: {str(cache_error)}")
+
+        if errors and len(errors) == total_requests:
+            safe_log(f"❌ Error al calcular distancias con Google Directions: {next(iter(errors.values()))}",
+                     "error", self.sink)
+            self.sink.warning("⚠️ Usando método Haversine como alternativa")
+        elif errors:
+            self.sink.warning(
+                f"⚠️ {len(errors)} de {total_requests} bloques fallaron tras reintentar; "
+                f"sus pares ({len(fallback_pairs)}) se estimaron con Haversine"
+            )
+        else:
+            self.sink.success("✅ Distancias reales calculadas correctamente")
 
         self.distance_matrix = distance_matrix.astype(int)
         self.duration_matrix = duration_matrix.astype(int)
         return self.distance_matrix, self.duration_matrix
 
+    def fill_pairs_with_haversine(self, coords: List[Tuple[float, float]], pairs: List[Tuple[int, int]],
+                                  distance_matrix: np.ndarray, duration_matrix: np.ndarray):
+        """
+        Completa pares (i, j) con distancia Haversine y duración a velocidad promedio
+        Se usa para elementos que Google no pudo resolver
+        """
+        if not pairs:
+            return
+
+        coords_array = np.asarray(coords, dtype=float)
+        rows = np.array([i for i, _ in pairs])
+        cols = np.array([j for _, j in pairs])
+        distance_km = haversine_km(
+            coords_array[rows, 0], coords_array[rows, 1],
+            coords_array[cols, 0], coords_array[cols, 1]
+        )
+        distance_matrix[rows, cols] = distance_km * 1000
+        # Estimar duración basada en velocidad promedio
+        velocidad_kmh = CALCULATION_CONFIG['velocidad_promedio_kmh']
+        duration_matrix[rows, cols] = (distance_km / velocidad_kmh) * 3600
+
+    def get_calibration(self) -> Optional[DetourCalibration]:
+        """
+        Factores de desvío aprendidos que se aplican al método Haversine
+        None si no hay calibración guardada, si se desactivó ('calibrar_haversine')
+        o si el método de distancia no es Haversine
+        """
+        if self.distance_method != 'haversine':
+            return None
+        enabled = self.config.get('calibrar_haversine', CALIBRATION_CONFIG['aplicar_en_haversine'])
+        if isinstance(enabled, str):
+            enabled = enabled.strip().lower() in ('si', 'sí', 'true', '1', 'yes')
+        if not enabled:
+            return None
+        try:
+            return load_calibration()
+        except (OSError, ValueError, KeyError) as e:
+            self.sink.warning(f"⚠️ No se pudo leer la calibración de desvíos: {str(e)}")
+            return None
+
     def create_distance_matrix_haversine(self) -> np.ndarray:
         """
         Crea matriz de distancias usando Haversine (línea recta)
+        Usa el motor vectorizado por bloques de distance_engine; la precisión
+        ('haversine_dtype') y el tamaño de bloque ('haversine_block_size') se
+        pueden ajustar desde la configuración. Si hay factores de desvío
+        aprendidos (ver calibration.py), corrige distancias y duraciones por zona.
         """
         # Combinar orígenes y destinos
         all_locations = pd.concat([
@@ -223,34 +580,261 @@ class RouteOptimizer:
             self.destinos[['latitud', 'longitud']]
         ], ignore_index=True)
 
-        n = len(all_locations)
-        distance_matrix = np.zeros((n, n))
-
-        # Calcular distancias
-        for i in range(n):
-            for j in range(n):
-                if i != j:
-                    distance_matrix[i][j] = self.calculate_distance(
-                        all_locations.iloc[i]['latitud'],
-                        all_locations.iloc[i]['longitud'],
-                        all_locations.iloc[j]['latitud'],
-                        all_locations.iloc[j]['longitud']
-                    )
-
-        # Convertir a enteros (metros) para OR-Tools
-        self.distance_matrix = (distance_matrix * 1000).astype(int)
+        dtype = self.config.get('haversine_dtype', CALCULATION_CONFIG['haversine_dtype'])
+        block_size = self.config.get('haversine_block_size', CALCULATION_CONFIG['haversine_block_size'])
+
+        calibracion = self.get_calibration()
+        if calibracion is not None:
+            self.distance_matrix, self.duration_matrix = calibracion.apply(
+                all_locations['latitud'].to_numpy(dtype=float),
+                all_locations['longitud'].to_numpy(dtype=float),
+                velocidad_defecto_kmh=self.config.get('velocidad_promedio_kmh', CALCULATION_CONFIG['velocidad_promedio_kmh']),
+                block_size=int(block_size)
+            )
+            self.sink.info(f"📐 Línea recta corregida con factores de desvío aprendidos de {calibracion.muestras} trayectos reales")
+            return self.distance_matrix
+
+        # Matriz entera en metros para OR-Tools
+        self.distance_matrix = haversine_matrix_m(
+            all_locations['latitud'].to_numpy(dtype=float),
+            all_locations['longitud'].to_numpy(dtype=float),
+            dtype=dtype,
+            block_size=int(block_size)
+        )
+        return self.distance_matrix
+
+    def create_distance_matrix_osm(self, known: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> np.ndarray:
+        """
+        Crea matrices de distancia y duración sobre la red vial local (OpenStreetMap)
+        Distancia por la ruta más corta y duración por la más rápida, sin llamadas
+        externas. Los pares sin ruta en el grafo se estiman con línea recta × factor
+        de desvío. Si el grafo no está preparado, usa Haversine.
+
+        Args:
+            known: (distancias, duraciones, nodos nuevos) de una matriz anterior
+                   (ver create_distance_matrix_incremental); solo se calculan las
+                   filas y columnas de los nodos nuevos
+        """
+        try:
+            red = load_road_network()
+        except (OSError, ValueError) as e:
+            self.sink.error(f"❌ No se pudo cargar la red vial local: {str(e)}")
+            self.sink.warning("⚠️ Usando método Haversine como alternativa")
+            self.distance_method = 'haversine'
+            return self.create_distance_matrix_haversine()
+
+        coords = self.get_all_coordinates()
+        coords_array = np.asarray(coords, dtype=float)
+        lats, lons = coords_array[:, 0], coords_array[:, 1]
+        self.sink.info(f"🛣️ Calculando rutas sobre la red vial local ({red.num_nodos} nodos)...")
+        if known is None:
+            distance_matrix, duration_matrix = red.matrices(lats, lons)
+        else:
+            distance_matrix, duration_matrix, new_nodes = known
+            distance_matrix = distance_matrix.astype(float)
+            duration_matrix = duration_matrix.astype(float)
+            if len(new_nodes) > 0:
+                distance_matrix[new_nodes, :], duration_matrix[new_nodes, :] = red.matrices(
+                    lats[new_nodes], lons[new_nodes], lats, lons)
+                distance_matrix[:, new_nodes], duration_matrix[:, new_nodes] = red.matrices(
+                    lats, lons, lats[new_nodes], lons[new_nodes])
+                distance_matrix[new_nodes, new_nodes] = 0
+                duration_matrix[new_nodes, new_nodes] = 0
+
+        sin_ruta = ~np.isfinite(distance_matrix)
+        if sin_ruta.any():
+            pares = list(zip(*np.nonzero(sin_ruta)))
+            self.fill_pairs_with_haversine(coords, pares, distance_matrix, duration_matrix)
+            factor = ROAD_NETWORK_CONFIG['factor_desvio_sin_ruta']
+            distance_matrix[sin_ruta] *= factor
+            duration_matrix[sin_ruta] *= factor
+            self.sink.warning(
+                f"⚠️ {len(pares)} pares sin ruta en la red vial (paradas fuera del mapa o sin conexión); "
+                f"se estimaron con línea recta × {factor}"
+            )
+
+        self.distance_matrix = np.rint(distance_matrix).astype(np.int64)
+        self.duration_matrix = np.rint(duration_matrix).astype(np.int64)
         return self.distance_matrix
 
+    def uses_google_directions(self) -> bool:
+        """Indica si la matriz se construye con Google Directions"""
+        return self.distance_method == 'google_directions' and bool(self.google_api_key_directions)
+
     def create_distance_matrix(self) -> np.ndarray:
         """
         Crea matriz de distancias según el método configurado
+        Si hay matrices compatibles de una optimización anterior, solo calcula
+        las filas y columnas de los nodos nuevos
         """
-        if self.distance_method == 'google_directions' and self.google_api_key_directions:
+        if self.can_reuse_matrices():
+            return self.create_distance_matrix_incremental()
+
+        if self.uses_google_directions():
             dist_matrix, dur_matrix = self.create_distance_matrix_google_directions()
             return dist_matrix
+        elif self.distance_method == 'osm_local':
+            return self.create_distance_matrix_osm()
         else:
             return self.create_distance_matrix_haversine()
 
+    def get_problem_fingerprint(self, time_limit_seconds: int, extra: Optional[Dict] = None) -> str:
+        """
+        Huella (SHA-256) de todo lo que determina la solución: contenido de orígenes,
+        destinos y flota, configuración, objetivo, método de distancia, tráfico y
+        tiempo límite. 'extra' permite agregar parámetros del modo de resolución.
+        """
+        digest = hashlib.sha256()
+        for df in (self.origenes, self.destinos, self.flota):
+            digest.update(json.dumps([str(c) for c in df.columns]).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes())
+
+        calibracion = self.get_calibration()
+        parametros = {
+            'config': self.config,
+            'optimization_type': self.optimization_type,
+            'distance_method': self.distance_method,
+            'trafico': self.get_traffic_bucket()[1] if self.uses_google_directions() else None,
+            'red_vial': road_network_signature() if self.distance_method == 'osm_local' else None,
+            'calibracion': calibracion.firma if calibracion is not None else None,
+            'time_limit_seconds': time_limit_seconds,
+            'extra': extra or {}
+        }
+        digest.update(json.dumps(parametros, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_node_keys(self) -> List[str]:
+        """
+        Claves de los nodos de la matriz (orígenes y luego destinos)
+        La distancia solo depende de las coordenadas, así que la clave es la coordenada exacta
+        """
+        return [f"{lat!r},{lon!r}" for lat, lon in self.get_all_coordinates()]
+
+    def get_matrix_signature(self) -> Dict:
+        """Parámetros que deben coincidir para poder reutilizar una matriz anterior"""
+        if self.uses_google_directions():
+            return {'metodo': 'google_directions', 'trafico': self.get_traffic_bucket()[1],
+                    'vecinos_k': self.get_google_neighbors_k()}
+        if self.distance_method == 'osm_local':
+            return {'metodo': 'osm_local', 'red_vial': road_network_signature()}
+        calibracion = self.get_calibration()
+        return {
+            'metodo': 'haversine',
+            'dtype': str(self.config.get('haversine_dtype', CALCULATION_CONFIG['haversine_dtype'])),
+            'calibracion': calibracion.firma if calibracion is not None else None
+        }
+
+    def get_matrix_snapshot(self) -> Optional[Dict]:
+        """
+        Retorna las matrices actuales con sus claves de nodo para reutilizarlas en
+        una re-optimización (parámetro previous_matrices del constructor)
+        """
+        if self.distance_matrix is None:
+            return None
+
+        return {
+            'firma': self.get_matrix_signature(),
+            'claves': self.get_node_keys(),
+            'distancia': np.asarray(self.distance_matrix),
+            'duracion': None if self.duration_matrix is None else np.asarray(self.duration_matrix),
+            'estimados': self.google_estimated,
+            'respaldo': self.google_fallback
+        }
+
+    def can_reuse_matrices(self) -> bool:
+        """Indica si previous_matrices es compatible con el método y parámetros actuales"""
+        previous = self.previous_matrices
+        if not previous or previous.get('firma') != self.get_matrix_signature():
+            return False
+        if previous.get('duracion') is None and (self.uses_google_directions() or self.distance_method == 'osm_local'
+                                                 or self.get_calibration() is not None):
+            return False
+        return True
+
+    def create_distance_matrix_incremental(self) -> np.ndarray:
+        """
+        Actualiza la matriz de la optimización anterior en lugar de recalcularla
+
+        Los pares entre nodos que ya existían se copian; los nodos eliminados se
+        descartan y solo se calculan las filas y columnas de los nodos nuevos
+        (O(n) pares en lugar de O(n²)), con Haversine, Google o la red vial local.
+        """
+        previous = self.previous_matrices
+        keys = self.get_node_keys()
+        n = len(keys)
+
+        old_positions = {key: idx for idx, key in enumerate(previous['claves'])}
+        old_idx = np.array([old_positions.get(key, -1) for key in keys], dtype=np.int64)
+        reused = old_idx >= 0
+        reused_nodes = np.flatnonzero(reused)
+        new_nodes = np.flatnonzero(~reused)
+
+        distance_matrix = np.zeros((n, n), dtype=np.int64)
+        block = np.ix_(reused_nodes, reused_nodes)
+        old_block = np.ix_(old_idx[reused_nodes], old_idx[reused_nodes])
+        distance_matrix[block] = previous['distancia'][old_block]
+
+        if self.uses_google_directions():
+            duration_matrix = np.zeros((n, n), dtype=np.int64)
+            duration_matrix[block] = previous['duracion'][old_block]
+            known_mask = reused[:, np.newaxis] & reused[np.newaxis, :]
+            if previous.get('estimados') is not None:
+                # Los pares estimados antes pueden ser vecinos ahora: no se dan por conocidos
+                known_mask[block] &= ~previous['estimados'][old_block]
+            if previous.get('respaldo') is not None:
+                # Los pares que fallaron antes (completados con Haversine) se vuelven a consultar
+                known_mask[block] &= ~previous['respaldo'][old_block]
+            dist_matrix, _ = self.create_distance_matrix_google_directions(
+                known=(distance_matrix, duration_matrix, known_mask)
+            )
+            return dist_matrix
+
+        if self.distance_method == 'osm_local':
+            duration_matrix = np.zeros((n, n), dtype=np.int64)
+            duration_matrix[block] = previous['duracion'][old_block]
+            return self.create_distance_matrix_osm(known=(distance_matrix, duration_matrix, new_nodes))
+
+        calibracion = self.get_calibration()
+        if calibracion is not None:
+            # Haversine calibrado: también se actualizan las duraciones
+            duration_matrix = np.zeros((n, n), dtype=np.int64)
+            duration_matrix[block] = previous['duracion'][old_block]
+            if len(new_nodes) > 0:
+                coords = np.asarray(self.get_all_coordinates(), dtype=float)
+                velocidad_kmh = self.config.get('velocidad_promedio_kmh', CALCULATION_CONFIG['velocidad_promedio_kmh'])
+                distance_matrix[new_nodes, :], duration_matrix[new_nodes, :] = calibracion.apply(
+                    coords[new_nodes, 0], coords[new_nodes, 1], coords[:, 0], coords[:, 1],
+                    velocidad_defecto_kmh=velocidad_kmh
+                )
+                distance_matrix[:, new_nodes], duration_matrix[:, new_nodes] = calibracion.apply(
+                    coords[:, 0], coords[:, 1], coords[new_nodes, 0], coords[new_nodes, 1],
+                    velocidad_defecto_kmh=velocidad_kmh
+                )
+                distance_matrix[new_nodes, new_nodes] = 0
+                duration_matrix[new_nodes, new_nodes] = 0
+            self.distance_matrix = distance_matrix
+            self.duration_matrix = duration_matrix
+            return self.distance_matrix
+
+        # Haversine: calcular solo filas y columnas de los nodos nuevos
+        if len(new_nodes) > 0:
+            coords = np.asarray(self.get_all_coordinates(), dtype=float)
+            dtype = self.config.get('haversine_dtype', CALCULATION_CONFIG['haversine_dtype'])
+            block_size = int(self.config.get('haversine_block_size', CALCULATION_CONFIG['haversine_block_size']))
+
+            distance_matrix[new_nodes, :] = haversine_matrix_m(
+                coords[new_nodes, 0], coords[new_nodes, 1], coords[:, 0], coords[:, 1],
+                dtype=dtype, block_size=block_size
+            )
+            distance_matrix[:, new_nodes] = haversine_matrix_m(
+                coords[:, 0], coords[:, 1], coords[new_nodes, 0], coords[new_nodes, 1],
+                dtype=dtype, block_size=block_size
+            )
+            distance_matrix[new_nodes, new_nodes] = 0
+
+        self.distance_matrix = distance_matrix
+        return self.distance_matrix
+
     def create_time_matrix(self) -> np.ndarray:
         """
         Crea matriz de tiempos entre todos los puntos (en segundos)
@@ -279,30 +863,160 @@ class RouteOptimizer:
     def create_cost_matrix(self) -> List[np.ndarray]:
         """
         Crea matrices de costos por vehículo (cada vehículo puede tener diferente costo/km)
-        Retorna una lista de matrices, una por vehículo
+        Retorna una lista de matrices, una por vehículo; los vehículos con el mismo
+        costo/km comparten la misma matriz (no se copia)
         """
         if self.distance_matrix is None:
             self.create_distance_matrix()
 
         distance_km_matrix = self.distance_matrix / 1000.0
+        matrices_por_costo = {}
         cost_matrices = []
 
-        for vehicle_id in range(len(self.flota)):
-            vehiculo = self.flota.iloc[vehicle_id]
-            costo_km = vehiculo.get('costo_km', CALCULATION_CONFIG['costo_km_default'])
-            if pd.isna(costo_km):
-                costo_km = CALCULATION_CONFIG['costo_km_default']
-
-            # Costo en unidades monetarias * 100 para trabajar con enteros
-            cost_matrix = (distance_km_matrix * costo_km * 100).astype(int)
-            cost_matrices.append(cost_matrix)
+        for costo_km in self.get_vehicle_costs_km():
+            if costo_km not in matrices_por_costo:
+                # Costo en unidades monetarias * 100 para trabajar con enteros
+                matrices_por_costo[costo_km] = (distance_km_matrix * costo_km * 100).astype(int)
+            cost_matrices.append(matrices_por_costo[costo_km])
 
         self.cost_matrix = cost_matrices
         return self.cost_matrix
 
-    def create_data_model(self) -> Dict:
+    def get_vehicle_costs_km(self) -> List[float]:
+        """
+        Costo por km de cada vehículo de la flota ('costo_km' o el valor por defecto)
+        """
+        if 'costo_km' not in self.flota.columns:
+            return [float(CALCULATION_CONFIG['costo_km_default'])] * len(self.flota)
+        costos = self.flota['costo_km'].fillna(CALCULATION_CONFIG['costo_km_default'])
+        return costos.astype(float).tolist()
+
+    def create_balanced_matrix(self, time_matrix: np.ndarray) -> np.ndarray:
+        """
+        Crea la matriz de costo balanceado: 60% distancia (km) + 40% tiempo (min)
+        Se calcula de forma vectorizada con el mismo redondeo que el callback original
+        """
+        distance_norm = np.asarray(self.distance_matrix) / 1000  # metros a "unidades"
+        time_norm = np.asarray(time_matrix) / 60  # segundos a "unidades"
+        return (distance_norm * 0.6 + time_norm * 0.4).astype(np.int64)
+
+    def get_neighbors_k(self) -> int:
+        """
+        Número de vecinos candidatos por destino ('arcos_vecinos_k'); 0 si se usan todos los arcos
+        """
+        try:
+            k = int(self.config.get('arcos_vecinos_k', CALCULATION_CONFIG['arcos_vecinos_k']) or 0)
+        except (TypeError, ValueError):
+            k = 0
+        return max(k, 0)
+
+    def build_candidate_arcs(self, k: int) -> np.ndarray:
+        """
+        Construye la máscara de arcos candidatos (nodo × nodo, booleana)
+
+        Cada destino conserva los arcos hacia sus k destinos más cercanos según la
+        matriz de distancias (la misma que usa el modelo, sea Haversine, Google o
+        red vial), y la relación se hace simétrica. Los arcos desde y hacia los
+        orígenes siempre son candidatos.
+        """
+        block_size = int(self.config.get('haversine_block_size', CALCULATION_CONFIG['haversine_block_size']))
+        return nearest_neighbor_mask(self.distance_matrix, k, num_fijos=len(self.origenes), block_size=block_size)
+
+    def restrict_to_candidate_arcs(self, routing, manager, num_vehicles: int) -> int:
+        """
+        Elimina del modelo los arcos que no son candidatos (ver build_candidate_arcs)
+
+        El sucesor de cada destino queda limitado a sus destinos candidatos, al
+        cierre de cualquier ruta (vuelta al depósito) y a sí mismo (destino no
+        visitado). Los arcos desde los depósitos no se tocan, así que cualquier
+        destino sigue siendo alcanzable en una ruta propia. Con ello el
+        vecindario de la búsqueda pasa de O(n²) a O(n·k) arcos.
+
+        Returns:
+            Número de arcos que quedan en el modelo desde los destinos
+        """
+        num_origenes = len(self.origenes)
+        ends = [routing.End(vehicle_id) for vehicle_id in range(num_vehicles)]
+        arcos = 0
+        for node in range(num_origenes, len(self.candidate_arcs)):
+            vecinos = np.flatnonzero(self.candidate_arcs[node, num_origenes:]) + num_origenes
+            permitidos = [manager.NodeToIndex(int(v)) for v in vecinos if v != node]
+            index = manager.NodeToIndex(node)
+            routing.NextVar(index).SetValues(permitidos + ends + [index])
+            arcos += len(permitidos) + len(ends)
+        return arcos
+
+    def use_native_transit(self, routing) -> bool:
+        """
+        Indica si se deben registrar matrices nativas en OR-Tools
+        Requiere OR-Tools con RegisterTransitMatrix y que no se haya desactivado en la configuración
+        """
+        enabled = self.config.get('usar_matrices_nativas', CALCULATION_CONFIG['usar_matrices_nativas'])
+        if isinstance(enabled, str):
+            enabled = enabled.strip().lower() in ('si', 'sí', 'true', '1', 'yes')
+        return bool(enabled) and hasattr(routing, 'RegisterTransitMatrix')
+
+    def register_transit_matrix(self, routing, manager, matrix) -> int:
+        """
+        Registra una matriz de tránsito (nodo × nodo, enteros) en el modelo
+
+        Usa RegisterTransitMatrix para que OR-Tools evalúe los arcos en C++.
+        Si no está disponible (o se desactivó con 'usar_matrices_nativas'),
+        usa un callback de Python como alternativa.
+        Retorna el índice del callback registrado.
+        """
+        values = np.asarray(matrix, dtype=np.int64).tolist()
+
+        if self.use_native_transit(routing):
+            callback_index = routing.RegisterTransitMatrix(values)
+        else:
+            def transit_callback(from_index, to_index):
+                from_node = manager.IndexToNode(from_index)
+                to_node = manager.IndexToNode(to_index)
+                return values[from_node][to_node]
+
+            callback_index = routing.RegisterTransitCallback(transit_callback)
+
+        return callback_index
+
+    def register_demand_vector(self, routing, manager, demands: List) -> int:
+        """
+        Registra el vector de demandas por nodo (tránsito unario) en el modelo
+        Usa RegisterUnaryTransitVector si está disponible; si no, un callback de Python
+        """
+        values = [int(d) for d in demands]
+
+        if self.use_native_transit(routing) and hasattr(routing, 'RegisterUnaryTransitVector'):
+            return routing.RegisterUnaryTransitVector(values)
+
+        def demand_callback(from_index):
+            from_node = manager.IndexToNode(from_index)
+            return values[from_node]
+
+        return routing.RegisterUnaryTransitCallback(demand_callback)
+
+    def collect_search_stats(self, routing) -> Dict:
+        """
+        Recopila estadísticas de la búsqueda del solver (útil para comparar configuraciones)
+        """
+        solver = routing.solver()
+        return {
+            'tiempo_ms': solver.WallTime(),
+            'ramas': solver.Branches(),
+            'fallos': solver.Failures(),
+            'soluciones': solver.Solutions(),
+            'vecinos_aceptados': solver.AcceptedNeighbors(),
+            'matrices_nativas': self.use_native_transit(routing)
+        }
+
+    def create_data_model(self, presolve: Optional[Dict] = None) -> Dict:
         """
         Crea el modelo de datos para OR-Tools con soporte para múltiples depósitos
+
+        Args:
+            presolve: Resultado de run_presolve (opcional). Solo los vehículos de
+                      'vehiculos_modelo' entran al modelo; 'vehicle_rows' da la
+                      posición en la flota de cada vehículo del modelo
         """
         data = {}
 
@@ -316,11 +1030,16 @@ class RouteOptimizer:
         demands = [0] * len(self.origenes) + self.destinos['demanda'].tolist()
         data['demands'] = demands
 
+        # Vehículos del modelo (la flota completa, o la que dejó el preproceso)
+        vehicle_rows = presolve['vehiculos_modelo'] if presolve is not None else np.arange(len(self.flota))
+        flota_modelo = self.flota.iloc[vehicle_rows]
+        data['vehicle_rows'] = [int(row) for row in vehicle_rows]
+
         # Capacidades de vehículos
-        data['vehicle_capacities'] = self.flota['capacidad'].tolist()
+        data['vehicle_capacities'] = flota_modelo['capacidad'].tolist()
 
         # Número de vehículos
-        data['num_vehicles'] = len(self.flota)
+        data['num_vehicles'] = len(flota_modelo)
 
         # Depósitos de inicio y fin por vehículo
         # Mapear origen_id a índice en la lista de orígenes
@@ -329,7 +1048,7 @@ class RouteOptimizer:
         data['starts'] = []
         data['ends'] = []
 
-        for _, vehiculo in self.flota.iterrows():
+        for _, vehiculo in flota_modelo.iterrows():
             depot_index = origen_id_to_index[vehiculo['origen_id']]
             data['starts'].append(depot_index)
             data['ends'].append(depot_index)
@@ -338,16 +1057,128 @@ class RouteOptimizer:
         data['num_origenes'] = len(self.origenes)
         data['num_destinos'] = len(self.destinos)
 
+        # Motivo por el que el preproceso descarta cada destino infactible (por nodo)
+        data['unassigned_reasons'] = {} if presolve is None else {
+            data['num_origenes'] + pos: motivo for pos, motivo in presolve['motivos'].items()
+        }
+
         return data
 
-    def solve(self, time_limit_seconds: int = 30) -> Dict:
+    def get_depot_assignment(self) -> np.ndarray:
+        """
+        origen_id al que se asignaría cada destino según cercanía y capacidad de la
+        flota de cada depósito (la misma asignación del modo por depósito)
+        """
+        if self.distance_matrix is None:
+            self.create_distance_matrix()
+
+        num_origenes = len(self.origenes)
+        origen_ids = self.origenes['origen_id'].to_numpy()
+        capacidad = self.flota.groupby('origen_id')['capacidad'].sum()
+        depositos = [idx for idx, origen_id in enumerate(origen_ids) if origen_id in capacidad.index]
+
+        distancias = np.asarray(self.distance_matrix)[np.ix_(depositos, range(num_origenes, len(self.distance_matrix)))]
+        demandas = self.destinos['demanda'].to_numpy(dtype=float)
+        # Los destinos que no caben en ningún vehículo no consumen capacidad
+        demandas = np.where(demandas > self.flota['capacidad'].max(), 0, demandas)
+        asignacion = regret_assignment(distancias, demandas, capacidad.loc[origen_ids[depositos]].to_numpy())
+        return origen_ids[depositos][asignacion]
+
+    def get_search_config(self, first_solution_strategy: Optional[str] = None,
+                          local_search_metaheuristic: Optional[str] = None) -> Dict[str, str]:
+        """
+        Resuelve la estrategia inicial y la metaheurística a usar (por nombre de OR-Tools)
+        Los valores no indicados se toman de la configuración o de CALCULATION_CONFIG.
+        Con arcos entre vecinos cercanos la estrategia por defecto es la de
+        'estrategia_inicial_arcos_vecinos': construir caminos arco a arco se
+        atasca cuando los vecinos de la última parada ya están ocupados.
+        """
+        estrategia_defecto = (CALCULATION_CONFIG['estrategia_inicial_arcos_vecinos'] if self.get_neighbors_k() > 0
+                              else CALCULATION_CONFIG['estrategia_inicial'])
+        return {
+            'estrategia_inicial': first_solution_strategy or self.config.get(
+                'estrategia_inicial', estrategia_defecto),
+            'metaheuristica': local_search_metaheuristic or self.config.get(
+                'metaheuristica', CALCULATION_CONFIG['metaheuristica'])
+        }
+
+    def build_initial_routes(self, previous_solution: Dict, data: Dict) -> List[List[int]]:
+        """
+        Traduce las rutas de una solución anterior a índices de nodo del modelo actual
+
+        Los vehículos se emparejan por vehiculo_id y las paradas por destino_id.
+        Se descartan paradas que ya no existen, repetidas o que exceden la
+        capacidad actual del vehículo, para que la asignación inicial sea factible.
+        Dentro de cada grupo de vehículos idénticos las rutas pasan a los primeros
+        vehículos del modelo, como exige la ruptura de simetría (y así también se
+        conservan las de vehículos descartados por el preproceso).
+
+        Returns:
+            Lista con una ruta (nodos de destino en orden) por vehículo
+        """
+        num_origenes = data['num_origenes']
+        destino_to_node = {destino_id: num_origenes + idx for idx, destino_id in enumerate(self.destinos['destino_id'])}
+        vehiculo_to_row = {vehiculo_id: row for row, vehiculo_id in enumerate(self.flota['vehiculo_id'])}
+        capacidades = self.flota['capacidad'].tolist()
+
+        rows_routes = {}
+        used_nodes = set()
+
+        for route_info in previous_solution.get('routes', []):
+            row = vehiculo_to_row.get(route_info['vehicle_id'])
+            if row is None:
+                continue
+
+            capacity = capacidades[row]
+            route = rows_routes.setdefault(row, [])
+            load = 0
+            for location in route_info['route']:
+                if location['type'] != 'destino':
+                    continue
+                node = destino_to_node.get(location['id'])
+                if node is None or node in used_nodes:
+                    continue
+                if load + data['demands'][node] > capacity:
+                    continue
+                route.append(node)
+                used_nodes.add(node)
+                load += data['demands'][node]
+
+        # Repartir las rutas de cada grupo idéntico entre sus vehículos del modelo, en orden
+        grupos = self.presolve['grupos'] if self.presolve is not None else np.arange(len(self.flota))
+        routes = [[] for _ in range(data['num_vehicles'])]
+        for grupo in np.unique(grupos):
+            vehiculos = [v for v, row in enumerate(data['vehicle_rows']) if grupos[row] == grupo]
+            pendientes = [rows_routes[row] for row in np.flatnonzero(grupos == grupo) if rows_routes.get(row)]
+            for vehicle_id, route in zip(vehiculos, pendientes):
+                routes[vehicle_id] = route
+
+        return routes
+
+    def solve(self, time_limit_seconds: int = 30, first_solution_strategy: Optional[str] = None,
+              local_search_metaheuristic: Optional[str] = None,
+              initial_solution: Optional[Dict] = None, monitor=None) -> Dict:
         """
         Resuelve el VRP con múltiples depósitos usando OR-Tools
         Soporta diferentes objetivos: distancia, tiempo, costo, vehículos, balanceado
+
+        Args:
+            time_limit_seconds: Tiempo límite de búsqueda
+            first_solution_strategy: Nombre de FirstSolutionStrategy (ej. 'SAVINGS')
+            local_search_metaheuristic: Nombre de LocalSearchMetaheuristic (ej. 'TABU_SEARCH')
+            initial_solution: Solución anterior (formato de extract_solution) para
+                              iniciar la búsqueda desde sus rutas (arranque en caliente)
+            monitor: SolveMonitor opcional (historial de mejoras, cancelación y parada temprana)
         """
         try:
+            # Preproceso: destinos infactibles, cotas de vehículos y flota recortada
+            self.presolve = None
+            if is_enabled(self.config, 'activo'):
+                self.presolve = run_presolve(self.destinos, self.flota, self.config,
+                                             deposito_de_destino=self.get_depot_assignment())
+
             # Crear modelo de datos
-            data = self.create_data_model()
+            data = self.create_data_model(self.presolve)
 
             # Crear el routing index manager con múltiples depósitos
             manager = pywrapcp.RoutingIndexManager(
@@ -360,15 +1191,18 @@ class RouteOptimizer:
             # Crear el routing model
             routing = pywrapcp.RoutingModel(manager)
 
+            # Arcos dispersos: solo los k vecinos más cercanos de cada destino son candidatos
+            neighbors_k = self.get_neighbors_k()
+            self.candidate_arcs = self.build_candidate_arcs(neighbors_k) if neighbors_k > 0 else None
+            arcos_modelo = None
+            if self.candidate_arcs is not None:
+                arcos_modelo = self.restrict_to_candidate_arcs(routing, manager, data['num_vehicles'])
+
             # Configurar función de costo según el tipo de optimización
+            # Las matrices se registran de forma nativa en OR-Tools (sin callbacks de Python)
             if self.optimization_type == 'distancia':
                 # Optimizar por distancia (comportamiento original)
-                def cost_callback(from_index, to_index):
-                    from_node = manager.IndexToNode(from_index)
-                    to_node = manager.IndexToNode(to_index)
-                    return data['distance_matrix'][from_node][to_node]
-
-                transit_callback_index = routing.RegisterTransitCallback(cost_callback)
+                transit_callback_index = self.register_transit_matrix(routing, manager, self.distance_matrix)
                 routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
             elif self.optimization_type == 'tiempo':
@@ -376,80 +1210,54 @@ class RouteOptimizer:
                 time_matrix = self.create_time_matrix()
                 data['time_matrix'] = time_matrix.tolist()
 
-                def time_callback(from_index, to_index):
-                    from_node = manager.IndexToNode(from_index)
-                    to_node = manager.IndexToNode(to_index)
-                    return data['time_matrix'][from_node][to_node]
-
-                transit_callback_index = routing.RegisterTransitCallback(time_callback)
+                transit_callback_index = self.register_transit_matrix(routing, manager, time_matrix)
                 routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
             elif self.optimization_type == 'costo':
                 # Optimizar por costo (diferente para cada vehículo)
                 cost_matrices = self.create_cost_matrix()
+                costs_km = self.get_vehicle_costs_km()
 
-                # Registrar callbacks por vehículo
+                # Registrar una matriz por vehículo (vehículos con igual costo/km comparten registro)
                 transit_callback_indices = []
+                registered_by_cost = {}
                 for vehicle_id in range(data['num_vehicles']):
-                    cost_matrix = cost_matrices[vehicle_id]
+                    row = data['vehicle_rows'][vehicle_id]
+                    cost_key = costs_km[row]
 
-                    def make_cost_callback(v_id):
-                        def cost_callback(from_index, to_index):
-                            from_node = manager.IndexToNode(from_index)
-                            to_node = manager.IndexToNode(to_index)
-                            return int(cost_matrices[v_id][from_node][to_node])
-                        return cost_callback
+                    if cost_key not in registered_by_cost:
+                        registered_by_cost[cost_key] = self.register_transit_matrix(routing, manager, cost_matrices[row])
 
-                    callback_index = routing.RegisterTransitCallback(make_cost_callback(vehicle_id))
+                    callback_index = registered_by_cost[cost_key]
                     transit_callback_indices.append(callback_index)
                     routing.SetArcCostEvaluatorOfVehicle(callback_index, vehicle_id)
 
             elif self.optimization_type == 'vehiculos':
                 # Minimizar número de vehículos - usar distancia pero con costo fijo alto por vehículo
-                def cost_callback(from_index, to_index):
-                    from_node = manager.IndexToNode(from_index)
-                    to_node = manager.IndexToNode(to_index)
-                    return data['distance_matrix'][from_node][to_node]
-
-                transit_callback_index = routing.RegisterTransitCallback(cost_callback)
+                transit_callback_index = self.register_transit_matrix(routing, manager, self.distance_matrix)
                 routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
                 # Agregar costo fijo alto por usar cada vehículo
                 for vehicle_id in range(data['num_vehicles']):
-                    routing.SetFixedCostOfVehicle(CALCULATION_CONFIG['costo_fijo_vehiculo'] * 100000, vehicle_id)
+                    routing.SetFixedCostOfVehicle(self.get_vehicle_fixed_cost(), vehicle_id)
 
             elif self.optimization_type == 'balanceado':
                 # Balance entre distancia y tiempo (promedio ponderado)
                 time_matrix = self.create_time_matrix()
                 data['time_matrix'] = time_matrix.tolist()
 
-                def balanced_callback(from_index, to_index):
-                    from_node = manager.IndexToNode(from_index)
-                    to_node = manager.IndexToNode(to_index)
-                    # 60% distancia, 40% tiempo (normalizado)
-                    distance_norm = data['distance_matrix'][from_node][to_node] / 1000  # metros a "unidades"
-                    time_norm = data['time_matrix'][from_node][to_node] / 60  # segundos a "unidades"
-                    return int(distance_norm * 0.6 + time_norm * 0.4)
-
-                transit_callback_index = routing.RegisterTransitCallback(balanced_callback)
+                transit_callback_index = self.register_transit_matrix(
+                    routing, manager, self.create_balanced_matrix(time_matrix)
+                )
                 routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
             else:
                 # Por defecto, usar distancia
-                def cost_callback(from_index, to_index):
-                    from_node = manager.IndexToNode(from_index)
-                    to_node = manager.IndexToNode(to_index)
-                    return data['distance_matrix'][from_node][to_node]
-
-                transit_callback_index = routing.RegisterTransitCallback(cost_callback)
+                transit_callback_index = self.register_transit_matrix(routing, manager, self.distance_matrix)
                 routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
             # Agregar restricción de capacidad
-            def demand_callback(from_index):
-                from_node = manager.IndexToNode(from_index)
-                return data['demands'][from_node]
-
-            demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
+            demand_callback_index = self.register_demand_vector(routing, manager, data['demands'])
 
             routing.AddDimensionWithVehicleCapacity(
                 demand_callback_index,
@@ -460,34 +1268,87 @@ class RouteOptimizer:
             )
 
             # Penalizar destinos no visitados (permitir soluciones parciales si es necesario)
+            # Los infactibles del preproceso quedan fuera del modelo desde el inicio
             penalty = 1000000
             for node in range(data['num_origenes'], len(data['distance_matrix'])):
-                routing.AddDisjunction([manager.NodeToIndex(node)], penalty)
+                if node in data['unassigned_reasons']:
+                    routing.AddDisjunction([manager.NodeToIndex(node)], 0)
+                    routing.solver().Add(routing.ActiveVar(manager.NodeToIndex(node)) == 0)
+                else:
+                    routing.AddDisjunction([manager.NodeToIndex(node)], penalty)
+
+            # Ruptura de simetría: entre vehículos idénticos, uno se usa solo si el anterior
+            # de su grupo ya se usa (los grupos pueden estar intercalados en la flota)
+            pares_simetricos = 0
+            if self.presolve is not None and is_enabled(self.config, 'romper_simetria'):
+                grupos_modelo = self.presolve['grupos'][data['vehicle_rows']]
+                anterior_del_grupo = {}
+                for vehicle_id in range(data['num_vehicles']):
+                    anterior = anterior_del_grupo.get(grupos_modelo[vehicle_id])
+                    if anterior is not None:
+                        routing.solver().Add(
+                            routing.ActiveVehicleVar(vehicle_id) <= routing.ActiveVehicleVar(anterior)
+                        )
+                        pares_simetricos += 1
+                    anterior_del_grupo[grupos_modelo[vehicle_id]] = vehicle_id
 
             # Configurar estrategia de búsqueda
+            search_config = self.get_search_config(first_solution_strategy, local_search_metaheuristic)
             search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-            search_parameters.first_solution_strategy = (
-                routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+            search_parameters.first_solution_strategy = getattr(
+                routing_enums_pb2.FirstSolutionStrategy, search_config['estrategia_inicial']
             )
-            search_parameters.local_search_metaheuristic = (
-                routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+            search_parameters.local_search_metaheuristic = getattr(
+                routing_enums_pb2.LocalSearchMetaheuristic, search_config['metaheuristica']
             )
             search_parameters.time_limit.seconds = time_limit_seconds
 
-            # Resolver
-            solution = routing.SolveWithParameters(search_parameters)
+            if monitor is not None:
+                monitor.attach(routing)
+
+            try:
+                # Resolver (desde las rutas de la solución anterior si se indicó)
+                initial_assignment = None
+                if initial_solution:
+                    routing.CloseModelWithParameters(search_parameters)
+                    initial_routes = self.build_initial_routes(initial_solution, data)
+                    if any(initial_routes):
+                        initial_assignment = routing.ReadAssignmentFromRoutes(initial_routes, True)
+
+                if initial_assignment is not None:
+                    solution = routing.SolveFromAssignmentWithParameters(initial_assignment, search_parameters)
+                else:
+                    solution = routing.SolveWithParameters(search_parameters)
+            finally:
+                if monitor is not None:
+                    monitor.detach()
+            self.search_stats = self.collect_search_stats(routing)
+            self.search_stats['arranque_en_caliente'] = initial_assignment is not None
+            if self.presolve is not None:
+                self.search_stats['presolve'] = dict(self.presolve['resumen'], pares_simetricos=pares_simetricos)
+            if self.candidate_arcs is not None:
+                self.search_stats['arcos_vecinos_k'] = neighbors_k
+                self.search_stats['arcos_candidatos'] = arcos_modelo
+            if monitor is not None:
+                self.search_stats['detenido_por'] = monitor.detenido_por or 'tiempo_limite'
+                self.search_stats['historial_objetivo'] = monitor.snapshot()['historial']
 
             if solution:
                 self.solution = self.extract_solution(data, manager, routing, solution)
+                # Valor del objetivo (incluye penalizaciones) para comparar configuraciones
+                self.solution['objective_value'] = solution.ObjectiveValue()
+                self.solution['solver_config'] = search_config
+                if self.presolve is not None:
+                    self.solution['presolve'] = self.presolve['resumen']
                 return self.solution
             else:
-                st.error("No se encontró solución factible. Intenta aumentar el tiempo límite o ajustar capacidades.")
+                self.sink.error("No se encontró solución factible. Intenta aumentar el tiempo límite o ajustar capacidades.")
                 return None
 
         except Exception as e:
-            st.error(f"Error en optimización: {str(e)}")
+            safe_log(f"Error en optimización: {str(e)}", "error", self.sink)
             import traceback
-            st.error(traceback.format_exc())
+            safe_log(traceback.format_exc(), "error", self.sink)
             return None
 
     def extract_solution(self, data, manager, routing, solution) -> Dict:
@@ -515,7 +1376,7 @@ class RouteOptimizer:
             route_load = 0
 
             # Obtener información del vehículo
-            vehiculo_info = self.flota.iloc[vehicle_id]
+            vehiculo_info = self.flota.iloc[data['vehicle_rows'][vehicle_id]]
             origen_id = vehiculo_info['origen_id']
 
             # Encontrar el origen correspondiente
@@ -609,17 +1470,285 @@ class RouteOptimizer:
                     'direccion': dest_row.get('direccion_original', dest_row['direccion']),
                     'direccion_geocodificada': dest_row['direccion'],
                     'ciudad': dest_row['ciudad'],
-                    'demanda': dest_row['demanda']
+                    'demanda': dest_row['demanda'],
+                    'motivo': data['unassigned_reasons'].get(node, 'No asignado por el optimizador (capacidad o tiempo de búsqueda)')
                 })
 
         return result
 
+    def compute_solution_metrics(self, solution: Dict) -> Dict:
+        """
+        Calcula indicadores comparables de una solución, sin importar el objetivo usado
+        (total_distance de la solución está en las unidades del objetivo, no siempre en km)
+
+        Returns:
+            {'distancia_km', 'tiempo_h', 'costo', 'vehiculos', 'destinos_atendidos', 'no_asignados'}
+        """
+        if self.distance_matrix is None:
+            self.create_distance_matrix()
+        time_matrix = self.time_matrix if self.time_matrix is not None else self.create_time_matrix()
+
+        num_origenes = len(self.origenes)
+        node_by_id = {('origen', origen_id): idx for idx, origen_id in enumerate(self.origenes['origen_id'])}
+        node_by_id.update({('destino', destino_id): num_origenes + idx
+                           for idx, destino_id in enumerate(self.destinos['destino_id'])})
+        costo_por_vehiculo = dict(zip(self.flota['vehiculo_id'], self.flota.get('costo_km', pd.Series(dtype=float))))
+
+        tiempo_servicio_s = self.config.get('tiempo_servicio_min', CALCULATION_CONFIG['tiempo_servicio_min']) * 60
+        costo_fijo = CALCULATION_CONFIG['costo_fijo_vehiculo']
+
+        distancia_m = 0
+        tiempo_s = 0
+        costo = 0.0
+        vehiculos = 0
+        atendidos = 0
+
+        for route_info in solution.get('routes', []):
+            nodes = [node_by_id[(loc['type'], loc['id'])] for loc in route_info['route']]
+            if len(nodes) <= 2:
+                continue
+
+            origen_nodes = np.array(nodes[:-1])
+            destino_nodes = np.array(nodes[1:])
+            ruta_m = int(np.asarray(self.distance_matrix)[origen_nodes, destino_nodes].sum())
+            paradas = len(nodes) - 2
+
+            costo_km = costo_por_vehiculo.get(route_info['vehicle_id'])
+            if costo_km is None or pd.isna(costo_km):
+                costo_km = CALCULATION_CONFIG['costo_km_default']
+
+            distancia_m += ruta_m
+            tiempo_s += int(np.asarray(time_matrix)[origen_nodes, destino_nodes].sum()) + paradas * tiempo_servicio_s
+            costo += ruta_m / 1000 * float(costo_km) + costo_fijo
+            vehiculos += 1
+            atendidos += paradas
+
+        return {
+            'distancia_km': distancia_m / 1000,
+            'tiempo_h': tiempo_s / 3600,
+            'costo': costo,
+            'vehiculos': vehiculos,
+            'destinos_atendidos': atendidos,
+            'no_asignados': len(solution.get('unassigned', []))
+        }
+
+    def get_vehicle_fixed_cost(self) -> int:
+        """
+        Costo fijo por usar un vehículo en el objetivo, en unidades de la matriz de
+        costo de arco (solo el objetivo 'vehiculos' lo aplica; en los demás es 0)
+        """
+        if self.optimization_type != 'vehiculos':
+            return 0
+        return CALCULATION_CONFIG['costo_fijo_vehiculo'] * 100000
+
+    def get_objective_matrices(self) -> List[np.ndarray]:
+        """
+        Matriz de costo de arco del objetivo actual para cada vehículo de la flota
+        (las mismas que usa solve; los vehículos comparten la matriz salvo en 'costo')
+        """
+        if self.distance_matrix is None:
+            self.create_distance_matrix()
+
+        if self.optimization_type == 'costo':
+            return self.create_cost_matrix()
+        if self.optimization_type == 'tiempo':
+            matrix = self.create_time_matrix()
+        elif self.optimization_type == 'balanceado':
+            matrix = self.create_balanced_matrix(self.create_time_matrix())
+        else:
+            matrix = self.distance_matrix
+        return [np.asarray(matrix)] * len(self.flota)
+
+    def insert_orders(self, solution: Dict, nuevos_destinos: pd.DataFrame) -> Dict:
+        """
+        Inserta pedidos tardíos en un plan existente sin re-optimizar (inserción más barata)
+
+        Para cada pedido se evalúa, de forma vectorizada, el costo de insertarlo entre
+        cada par de paradas consecutivas de cada ruta (incluye vehículos sin usar) y se
+        elige la posición más barata que respete la capacidad del vehículo. Los pedidos
+        se procesan de mayor a menor demanda.
+
+        Se marcan para re-optimizar los pedidos que no caben en ningún vehículo y los
+        que se insertaron con un desvío mayor que ir y volver desde el depósito más
+        cercano (multiplicado por 'insercion_factor_desvio').
+
+        Los costos salen de las matrices del objetivo (mismo método de distancia,
+        calibración y unidades que la solución); la matriz anterior se extiende solo
+        con las filas y columnas de los pedidos nuevos. Con el objetivo 'vehiculos',
+        insertar en un vehículo sin usar suma además su costo fijo.
+
+        Modifica el optimizador: los pedidos insertados pasan a self.destinos, las
+        matrices quedan extendidas con sus nodos y self.solution pasa a ser el plan
+        actualizado, de modo que un solve() posterior (con este plan como arranque
+        en caliente) re-optimiza el problema ampliado.
+
+        Args:
+            solution: Solución actual (formato de extract_solution)
+            nuevos_destinos: Filas nuevas con las columnas de destinos (con latitud/longitud)
+
+        Returns:
+            Solución actualizada con la clave 'insercion':
+            {'insertados', 'requieren_reoptimizar': [{'id', 'nombre', 'motivo'}], 'tiempo_ms'}
+        """
+        inicio = time.perf_counter()
+        updated = copy.deepcopy(solution)
+        updated.setdefault('unassigned', [])
+        factor_desvio = float(self.config.get('insercion_factor_desvio', CALCULATION_CONFIG['insercion_factor_desvio']))
+
+        existing_ids = set(self.destinos['destino_id'])
+        insertados = []
+        requieren_reoptimizar = []
+        filas_validas = []
+
+        nuevos = nuevos_destinos.sort_values('demanda', ascending=False, kind='stable')
+        for _, dest_row in nuevos.iterrows():
+            if dest_row['destino_id'] in existing_ids:
+                requieren_reoptimizar.append({'id': dest_row['destino_id'], 'nombre': dest_row['nombre_cliente'],
+                                              'motivo': 'destino_id ya existe en el plan'})
+                continue
+            if pd.isna(dest_row.get('latitud')) or pd.isna(dest_row.get('longitud')):
+                requieren_reoptimizar.append({'id': dest_row['destino_id'], 'nombre': dest_row['nombre_cliente'],
+                                              'motivo': 'sin coordenadas'})
+                continue
+            existing_ids.add(dest_row['destino_id'])
+            filas_validas.append(dest_row)
+
+        if filas_validas:
+            # Los nuevos destinos pasan a formar parte del problema; la matriz actual se
+            # extiende de forma incremental (solo filas y columnas de los nodos nuevos)
+            self.previous_matrices = self.get_matrix_snapshot() or self.previous_matrices
+            self.destinos = pd.concat([self.destinos, pd.DataFrame(filas_validas)], ignore_index=True)
+            self.distance_matrix = None
+            self.time_matrix = None
+            self.duration_matrix = None
+            self.cost_matrix = None
+            self.create_distance_matrix()
+            matrices = self.get_objective_matrices()
+        else:
+            matrices = []
+
+        num_origenes = len(self.origenes)
+        origen_node = {origen_id: idx for idx, origen_id in enumerate(self.origenes['origen_id'])}
+        destino_node = {destino_id: num_origenes + idx for idx, destino_id in enumerate(self.destinos['destino_id'])}
+        vehiculo_row = {vehiculo_id: row for row, vehiculo_id in enumerate(self.flota['vehiculo_id'])}
+
+        # Rutas candidatas: las del plan y una ruta vacía por cada vehículo sin usar
+        routes = updated['routes']
+        costo_fijo = self.get_vehicle_fixed_cost() / 1000
+        used_vehicles = {r['vehicle_id'] for r in routes}
+        for _, vehiculo in self.flota.iterrows():
+            if vehiculo['vehiculo_id'] in used_vehicles:
+                continue
+            origen_row = self.origenes[self.origenes['origen_id'] == vehiculo['origen_id']].iloc[0]
+            depot_info = {
+                'type': 'origen',
+                'id': origen_row['origen_id'],
+                'nombre': origen_row['nombre_origen'],
+                'direccion': origen_row.get('direccion_original', origen_row['direccion']),
+                'direccion_geocodificada': origen_row['direccion'],
+                'ciudad': origen_row['ciudad'],
+                'latitud': origen_row['latitud'],
+                'longitud': origen_row['longitud'],
+                'demanda': 0
+            }
+            routes.append({
+                'vehicle_id': vehiculo['vehiculo_id'],
+                'vehicle_type': vehiculo.get('tipo_vehiculo'),
+                'origen_id': vehiculo['origen_id'],
+                'origen_nombre': origen_row['nombre_origen'],
+                'route': [depot_info, dict(depot_info)],
+                'distance_km': 0.0,
+                'load': 0,
+                'capacity': vehiculo['capacidad'],
+                'utilization': 0
+            })
+
+        loads = np.array([r['load'] for r in routes], dtype=float)
+        capacities = np.array([r['capacity'] for r in routes], dtype=float)
+        route_rows = [vehiculo_row[r['vehicle_id']] for r in routes]
+        depot_nodes = np.array(sorted({origen_node[r['origen_id']] for r in routes}), dtype=np.int64)
+        route_nodes = [
+            [origen_node[loc['id']] if loc['type'] == 'origen' else destino_node[loc['id']] for loc in r['route']]
+            for r in routes
+        ]
+
+        for dest_row in filas_validas:
+            nodo = destino_node[dest_row['destino_id']]
+            demanda = float(dest_row['demanda'])
+
+            # Costo de insertar el nodo en cada arista (parada i -> parada i+1) de cada ruta,
+            # con la matriz del vehículo de la ruta; en las mismas unidades que 'distance_km'
+            delta = np.concatenate([
+                (matrices[row][nodos[:-1], nodo] + matrices[row][nodo, nodos[1:]]
+                 - matrices[row][nodos[:-1], nodos[1:]]) / 1000
+                for row, nodos in zip(route_rows, map(np.asarray, route_nodes))
+            ]).astype(float)
+            ruta_de_arista = np.concatenate([np.full(len(n) - 1, i) for i, n in enumerate(route_nodes)])
+            posicion = np.concatenate([np.arange(len(n) - 1) for n in route_nodes])
+            factible = loads[ruta_de_arista] + demanda <= capacities[ruta_de_arista]
+            # Abrir un vehículo sin paradas paga su costo fijo (objetivo 'vehiculos')
+            arranque = np.array([costo_fijo if len(n) == 2 else 0.0 for n in route_nodes])
+            costo = delta + arranque[ruta_de_arista]
+
+            location_info = {
+                'type': 'destino',
+                'id': dest_row['destino_id'],
+                'nombre': dest_row['nombre_cliente'],
+                'direccion': dest_row.get('direccion_original', dest_row['direccion']),
+                'direccion_geocodificada': dest_row['direccion'],
+                'ciudad': dest_row['ciudad'],
+                'latitud': float(dest_row['latitud']),
+                'longitud': float(dest_row['longitud']),
+                'demanda': dest_row['demanda']
+            }
+
+            if not factible.any():
+                updated['unassigned'].append(dict({k: location_info[k] for k in
+                                                   ('id', 'nombre', 'direccion', 'direccion_geocodificada', 'ciudad', 'demanda')},
+                                                  motivo='Ningún vehículo tiene capacidad disponible'))
+                requieren_reoptimizar.append({'id': dest_row['destino_id'], 'nombre': dest_row['nombre_cliente'],
+                                              'motivo': 'ningún vehículo tiene capacidad disponible'})
+                continue
+
+            mejor = int(np.argmin(np.where(factible, costo, np.inf)))
+            r = int(ruta_de_arista[mejor])
+            route_info = routes[r]
+            route_info['route'].insert(int(posicion[mejor]) + 1, location_info)
+            route_nodes[r].insert(int(posicion[mejor]) + 1, nodo)
+            route_info['distance_km'] += float(delta[mejor])
+            route_info['load'] += dest_row['demanda']
+            route_info['utilization'] = (route_info['load'] / route_info['capacity'] * 100) if route_info['capacity'] > 0 else 0
+            loads[r] += demanda
+            updated['total_distance'] += float(delta[mejor])
+            insertados.append(dest_row['destino_id'])
+
+            # Un desvío mayor que una ruta dedicada desde el depósito más cercano sugiere re-optimizar
+            matriz = matrices[route_rows[r]]
+            ida_y_vuelta = float(np.min(matriz[depot_nodes, nodo] + matriz[nodo, depot_nodes])) / 1000
+            if delta[mejor] > factor_desvio * ida_y_vuelta:
+                requieren_reoptimizar.append({'id': dest_row['destino_id'], 'nombre': dest_row['nombre_cliente'],
+                                              'motivo': 'desvío al insertarlo mayor que ir y volver desde el depósito más cercano'})
+
+        # Quitar vehículos que siguen sin paradas y conservar el orden de la flota
+        orden_vehiculos = {vehiculo_id: pos for pos, vehiculo_id in enumerate(self.flota['vehiculo_id'])}
+        updated['routes'] = sorted((r for r in routes if len(r['route']) > 2),
+                                   key=lambda r: orden_vehiculos.get(r['vehicle_id'], len(orden_vehiculos)))
+
+        updated['insercion'] = {
+            'insertados': insertados,
+            'requieren_reoptimizar': requieren_reoptimizar,
+            'tiempo_ms': (time.perf_counter() - inicio) * 1000
+        }
+
+        self.solution = updated
+        return updated
+
     def export_to_excel(self, filepath: str) -> bool:
         """
         Exporta la solución a un archivo Excel
         """
         if self.solution is None:
-            st.error("No hay solución para exportar")
+            self.sink.error("No hay solución para exportar")
             return False
 
         try:
@@ -693,7 +1822,8 @@ class RouteOptimizer:
                             'Ciudad': dest.get('ciudad', ''),
                             'Direccion': dest.get('direccion', ''),
                             'Direccion_Geocodificada': dest.get('direccion_geocodificada', dest.get('direccion', '')),
-                            'Demanda': dest['demanda']
+                            'Demanda': dest['demanda'],
+                            'Motivo': dest.get('motivo', '')
                         })
 
                     pd.DataFrame(unassigned_data).to_excel(writer, sheet_name='No_Asignados', index=False)
@@ -701,7 +1831,7 @@ class RouteOptimizer:
             return True
 
         except Exception as e:
-            st.error(f"Error al exportar: {str(e)}")
+            self.sink.error(f"Error al exportar: {str(e)}")
             import traceback
-            st.error(traceback.format_exc())
+            self.sink.error(traceback.format_exc())
             return False
@@ -2,11 +2,12 @@
 Módulo de seguridad para RutaFácil
 Incluye validaciones de archivos, sanitización de datos y protección contra amenazas
 """
+import os
 import pandas as pd
 import re
 import html
-from typing import Any
-import streamlit as st
+from typing import Any, Optional
+from progress import LoggingSink, ProgressSink
 
 
 # Configuración de límites de seguridad
@@ -27,7 +28,8 @@ def validate_file_size(uploaded_file) -> bool:
     Valida que el archivo no exceda el tamaño máximo permitido
 
     Args:
-        uploaded_file: Archivo subido por Streamlit
+        uploaded_file: Archivo subido por Streamlit, ruta a un archivo en disco o
+                       registros JSON (el servicio HTTP limita el tamaño al recibirlos)
 
     Returns:
         True si es válido
@@ -37,9 +39,16 @@ def validate_file_size(uploaded_file) -> bool:
     """
     max_size_bytes = SECURITY_CONFIG['max_file_size_mb'] * 1024 * 1024
 
-    if uploaded_file.size > max_size_bytes:
+    if isinstance(uploaded_file, list):
+        return True
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        file_size = os.path.getsize(uploaded_file)
+    else:
+        file_size = uploaded_file.size
+
+    if file_size > max_size_bytes:
         raise SecurityError(
-            f"❌ Archivo muy grande: {uploaded_file.size / (1024*1024):.2f} MB. "
+            f"❌ Archivo muy grande: {file_size / (1024*1024):.2f} MB. "
             f"Máximo permitido: {SECURITY_CONFIG['max_file_size_mb']} MB"
         )
 
@@ -184,7 +193,7 @@ def validate_and_sanitize_file(uploaded_file, df: pd.DataFrame, file_type: str =
     Ejecuta todas las validaciones de seguridad en un archivo subido
 
     Args:
-        uploaded_file: Archivo subido por Streamlit
+        uploaded_file: Archivo subido por Streamlit o ruta en disco
         df: DataFrame cargado del archivo
         file_type: Tipo de archivo (origenes/destinos/flota/config)
 
@@ -209,13 +218,14 @@ def validate_and_sanitize_file(uploaded_file, df: pd.DataFrame, file_type: str =
     return df_clean
 
 
-def safe_log(message: str, level: str = "info"):
+def safe_log(message: str, level: str = "info", sink: Optional[ProgressSink] = None):
     """
     Muestra mensaje en UI con ofuscación de datos sensibles
 
     Args:
         message: Mensaje a mostrar
-        level: Nivel de log (info/warning/error)
+        level: Nivel de log (info/caption/warning/error)
+        sink: Receptor donde se muestra (por defecto el módulo logging)
     """
     # Ofuscar API keys
     message = re.sub(r'AIza[A-Za-z0-9_-]{35}', 'AIza***[REDACTED]***', message)
@@ -228,9 +238,12 @@ def safe_log(message: str, level: str = "info"):
     )
 
     # Mostrar según nivel
+    sink = sink or LoggingSink()
     if level == "error":
-        st.error(message)
+        sink.error(message)
     elif level == "warning":
-        st.warning(message)
+        sink.warning(message)
+    elif level == "caption":
+        sink.caption(message)
     else:
-        st.info(message)
+        sink.info(message)
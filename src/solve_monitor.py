@@ -0,0 +1,165 @@
+"""
+Monitor de la búsqueda de OR-Tools
+Registra cada solución mejorada con su tiempo, permite cancelar la búsqueda
+(se conserva la mejor solución encontrada) y la detiene cuando el objetivo
+deja de mejorar lo suficiente (estancamiento).
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from config import SOLVE_MONITOR_CONFIG
+
+
+class SolveMonitor:
+    """
+    Se conecta a un RoutingModel antes de resolver (ver RouteOptimizer.solve)
+
+    La búsqueda se detiene si:
+    - Se llamó a cancel() (por ejemplo, desde un botón de la interfaz)
+    - Parada temprana activa y el objetivo no mejoró al menos 'mejora_minima_pct'
+      en los últimos 'ventana_s' segundos
+
+    Las condiciones se evalúan al llegar cada solución y, además, cada
+    'intervalo_vigilancia_s' en un hilo aparte, para que la cancelación y la
+    parada temprana funcionen también antes de la primera solución o en tramos
+    largos sin soluciones nuevas. No se usa un límite personalizado, que
+    OR-Tools consultaría en cada nodo de la búsqueda. La detención se pide con
+    FinishCurrentSearch() desde el callback y con CancelSearch() (segura entre
+    hilos) desde el vigilante.
+
+    Es seguro consultar snapshot() y llamar cancel() desde otro hilo.
+    """
+
+    def __init__(self, mejora_minima_pct: Optional[float] = None, ventana_s: Optional[float] = None,
+                 parada_temprana: Optional[bool] = None,
+                 progress_callback: Optional[Callable[[Dict], None]] = None,
+                 intervalo_s: Optional[float] = None, intervalo_vigilancia_s: Optional[float] = None):
+        """
+        Args:
+            mejora_minima_pct: Mejora porcentual mínima exigida dentro de la ventana
+            ventana_s: Segundos de la ventana de estancamiento
+            parada_temprana: Activa la detención por estancamiento
+            progress_callback: Función (snapshot) llamada al mejorar el objetivo,
+                               como máximo una vez cada 'intervalo_s' segundos
+            intervalo_s: Intervalo mínimo entre llamadas a progress_callback
+            intervalo_vigilancia_s: Cada cuánto se revisan cancelación y estancamiento
+                                    sin esperar una solución nueva
+        """
+        self.mejora_minima_pct = SOLVE_MONITOR_CONFIG['mejora_minima_pct'] if mejora_minima_pct is None else mejora_minima_pct
+        self.ventana_s = SOLVE_MONITOR_CONFIG['ventana_s'] if ventana_s is None else ventana_s
+        self.parada_temprana = SOLVE_MONITOR_CONFIG['parada_temprana'] if parada_temprana is None else parada_temprana
+        self.intervalo_s = SOLVE_MONITOR_CONFIG['intervalo_actualizacion_s'] if intervalo_s is None else intervalo_s
+        self.intervalo_vigilancia_s = (SOLVE_MONITOR_CONFIG['intervalo_vigilancia_s'] if intervalo_vigilancia_s is None
+                                       else intervalo_vigilancia_s)
+        self.progress_callback = progress_callback
+
+        self.historial: List[Dict] = []  # [{'t': segundos, 'objetivo': valor}] solo mejoras
+        self.soluciones = 0
+        self.detenido_por: Optional[str] = None
+        self._routing = None
+        self._inicio = None
+        self._ultimo_reporte = 0.0
+        self._cancelado = threading.Event()
+        self._terminado = threading.Event()
+        self._vigilante: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def attach(self, routing):
+        """Registra el callback de soluciones en el modelo e inicia el vigilante"""
+        self._routing = routing
+        self._inicio = time.monotonic()
+        routing.AddAtSolutionCallback(self._on_solution)
+
+        self._terminado.clear()
+        if hasattr(routing, 'CancelSearch'):
+            self._vigilante = threading.Thread(target=self._vigilar, name='vigilante-busqueda', daemon=True)
+            self._vigilante.start()
+
+    def detach(self):
+        """Detiene el vigilante (llamar al terminar la búsqueda)"""
+        self._terminado.set()
+        if self._vigilante is not None:
+            self._vigilante.join()
+            self._vigilante = None
+
+    def _vigilar(self):
+        while not self._terminado.wait(self.intervalo_vigilancia_s):
+            if self.detenido_por is None and self._should_stop(self.elapsed()):
+                self._routing.CancelSearch()
+                return
+
+    def cancel(self):
+        """Solicita detener la búsqueda; el solver retorna la mejor solución hasta el momento"""
+        self._cancelado.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self._cancelado.is_set()
+
+    def elapsed(self) -> float:
+        return 0.0 if self._inicio is None else time.monotonic() - self._inicio
+
+    def _on_solution(self):
+        objetivo = self._routing.CostVar().Max()
+        ahora = self.elapsed()
+
+        with self._lock:
+            self.soluciones += 1
+            mejora = not self.historial or objetivo < self.historial[-1]['objetivo']
+            if mejora:
+                self.historial.append({'t': ahora, 'objetivo': objetivo})
+
+        if self.detenido_por is None and self._should_stop(ahora):
+            self._routing.solver().FinishCurrentSearch()
+
+        if not mejora:
+            return
+
+        if self.progress_callback is not None and ahora - self._ultimo_reporte >= self.intervalo_s:
+            self._ultimo_reporte = ahora
+            self.progress_callback(self.snapshot())
+
+    def _should_stop(self, ahora: float) -> bool:
+        if self._cancelado.is_set():
+            self.detenido_por = 'cancelado'
+            return True
+
+        if not self.parada_temprana:
+            return False
+
+        with self._lock:
+            historial = self.historial
+            if not historial:
+                return False
+
+            # Sin suficiente historia todavía para evaluar la ventana completa
+            if ahora - historial[0]['t'] < self.ventana_s:
+                return False
+
+            # Mejor objetivo conocido al inicio de la ventana vs el actual
+            referencia = historial[0]['objetivo']
+            for punto in historial:
+                if punto['t'] > ahora - self.ventana_s:
+                    break
+                referencia = punto['objetivo']
+            actual = historial[-1]['objetivo']
+
+        mejora_pct = (referencia - actual) / referencia * 100 if referencia > 0 else 0.0
+        if mejora_pct < self.mejora_minima_pct:
+            self.detenido_por = 'estancamiento'
+            return True
+        return False
+
+    def snapshot(self) -> Dict:
+        """Estado actual de la búsqueda (apto para mostrar en la interfaz)"""
+        with self._lock:
+            historial = list(self.historial)
+            soluciones = self.soluciones
+        return {
+            'transcurrido_s': self.elapsed(),
+            'soluciones': soluciones,
+            'mejor_objetivo': historial[-1]['objetivo'] if historial else None,
+            'historial': historial,
+            'detenido_por': self.detenido_por
+        }
@@ -0,0 +1,51 @@
+"""
+Configuración común de pytest: módulos de src/ e instancias sintéticas de benchmarks/
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+RAIZ = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(RAIZ, 'src'))
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+from config import ROAD_NETWORK_CONFIG  # noqa: E402
+from road_network import RoadNetwork  # noqa: E402
+
+
+def construir_cuadricula(lat0: float, lon0: float, filas: int = 25, columnas: int = 25,
+                         paso_grados: float = 0.003) -> RoadNetwork:
+    """
+    Red vial en cuadrícula alrededor de (lat0, lon0); las calles de filas impares
+    son de un solo sentido (hacia el este), así las matrices no son simétricas
+    """
+    lat = np.repeat(lat0 + (np.arange(filas) - filas // 2) * paso_grados, columnas)
+    lon = np.tile(lon0 + (np.arange(columnas) - columnas // 2) * paso_grados, filas)
+    aristas = []
+    for f in range(filas):
+        for c in range(columnas):
+            nodo = f * columnas + c
+            if c + 1 < columnas:
+                aristas.append((nodo, nodo + 1))
+                if f % 2 == 0:
+                    aristas.append((nodo + 1, nodo))
+            if f + 1 < filas:
+                aristas.append((nodo, nodo + columnas))
+                aristas.append((nodo + columnas, nodo))
+    aristas.sort()
+    u = np.array([a[0] for a in aristas])
+    v = np.array([a[1] for a in aristas])
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(u, minlength=filas * columnas))])
+    longitud = paso_grados * 111_000 * np.ones(len(u))
+    return RoadNetwork(lat, lon, indptr, v, longitud, longitud / (30 / 3.6))
+
+
+@pytest.fixture
+def red_vial(tmp_path, monkeypatch):
+    """Grafo en cuadrícula sobre Medellín guardado como el grafo configurado"""
+    path = str(tmp_path / 'red_vial.npz')
+    construir_cuadricula(6.2442, -75.5812).save(path)
+    monkeypatch.setitem(ROAD_NETWORK_CONFIG, 'archivo_grafo', path)
+    return path
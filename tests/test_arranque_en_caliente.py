@@ -0,0 +1,30 @@
+"""
+Re-optimización con arranque en caliente desde una solución anterior
+"""
+import pandas as pd
+
+from instancias import generar_instancia
+from route_optimizer import RouteOptimizer
+
+
+def test_reoptimizar_con_pedidos_cambiados():
+    origenes, destinos, flota = generar_instancia(60, 4, capacidad=2000, ciudades=['Medellin'])
+    anterior = RouteOptimizer(origenes, destinos, flota)
+    previa = anterior.solve(time_limit_seconds=1)
+
+    # Se cancela un pedido y llega uno nuevo
+    cambiados = pd.concat([destinos.iloc[1:], destinos.iloc[[0]].assign(destino_id='NUEVO')], ignore_index=True)
+    optimizer = RouteOptimizer(origenes, cambiados, flota, previous_matrices=anterior.get_matrix_snapshot())
+    data = optimizer.create_data_model()
+    rutas = optimizer.build_initial_routes(previa, data)
+
+    asignados = sorted(node for route in rutas for node in route)
+    num_origenes = len(origenes)
+    # Las paradas que siguen existiendo conservan su ruta; el pedido nuevo no está en ninguna
+    assert asignados == list(range(num_origenes, num_origenes + len(cambiados) - 1))
+
+    solution = optimizer.solve(time_limit_seconds=1, initial_solution=previa)
+    assert optimizer.search_stats['arranque_en_caliente']
+    assert not solution['unassigned']
+    visitados = [loc['id'] for route in solution['routes'] for loc in route['route'] if loc['type'] == 'destino']
+    assert sorted(visitados) == sorted(cambiados['destino_id'])
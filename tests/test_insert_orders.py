@@ -0,0 +1,80 @@
+"""
+Inserción de pedidos tardíos (RouteOptimizer.insert_orders) y extensión incremental
+de matrices con la red vial local
+"""
+import numpy as np
+import pandas as pd
+
+from instancias import generar_instancia
+from road_network import RoadNetwork
+from route_optimizer import RouteOptimizer
+
+
+def pedido(destino_id: str, lat: float, lon: float, demanda: int = 10) -> pd.DataFrame:
+    return pd.DataFrame([{
+        'destino_id': destino_id, 'nombre_cliente': f'Cliente {destino_id}', 'direccion': 'Calle 3 #3-3',
+        'ciudad': 'Bogota', 'pais': 'Colombia', 'demanda': demanda, 'latitud': lat, 'longitud': lon,
+    }])
+
+
+def test_insert_orders_extiende_el_optimizador():
+    origenes, destinos, flota = generar_instancia(20, 2, ciudades=['Medellin'])
+    optimizer = RouteOptimizer(origenes, destinos, flota, config={'separar_regiones': False})
+    solution = optimizer.solve(time_limit_seconds=1)
+
+    nuevo = pedido('TARDE_1', 6.25, -75.57)
+    updated = optimizer.insert_orders(solution, nuevo)
+
+    assert updated['insercion']['insertados'] == ['TARDE_1']
+    assert 'TARDE_1' in set(optimizer.destinos['destino_id'])
+    assert optimizer.distance_matrix.shape == (len(origenes) + 21, len(origenes) + 21)
+    assert optimizer.solution is updated
+    # La solución original no se modifica
+    assert all(loc['id'] != 'TARDE_1' for r in solution['routes'] for loc in r['route'])
+
+
+def test_insert_orders_con_objetivo_vehiculos_cobra_el_costo_fijo():
+    origenes, destinos, flota = generar_instancia(40, 1, capacidad=5000, ciudades=['Medellin', 'Bogota'])
+    destinos = destinos[destinos['ciudad'] == 'Medellin'].reset_index(drop=True)
+    nuevo = pedido('TARDE_BOG', 4.69, -74.05)
+
+    asignado = {}
+    for objetivo in ('distancia', 'vehiculos'):
+        optimizer = RouteOptimizer(origenes, destinos.copy(), flota, config={'separar_regiones': False},
+                                   optimization_type=objetivo)
+        updated = optimizer.insert_orders(optimizer.solve(time_limit_seconds=1), nuevo)
+        asignado[objetivo] = next(r['origen_id'] for r in updated['routes']
+                                  for loc in r['route'] if loc['id'] == 'TARDE_BOG')
+
+    # Por distancia abre el vehículo de Bogotá; por vehículos el desvío cuesta menos que su costo fijo
+    assert asignado == {'distancia': 'ORG_02', 'vehiculos': 'ORG_01'}
+
+
+def test_red_vial_incremental_igual_a_la_completa(red_vial, monkeypatch):
+    origenes, destinos, flota = generar_instancia(12, 1, ciudades=['Medellin'], radio_grados=0.04)
+    # Un destino fuera del mapa obliga a completar sus pares con línea recta
+    fuera = pedido('FUERA', 6.40, -75.58)
+    nuevos = pd.concat([pedido('NUEVO', 6.25, -75.57), fuera], ignore_index=True)
+
+    anterior = RouteOptimizer(origenes, destinos, flota, distance_method='osm_local')
+    anterior.create_distance_matrix()
+
+    llamadas = []
+    matrices = RoadNetwork.matrices
+
+    def registrar(self, lats, *args):
+        llamadas.append(len(lats))
+        return matrices(self, lats, *args)
+
+    monkeypatch.setattr(RoadNetwork, 'matrices', registrar)
+    todos = pd.concat([destinos, nuevos], ignore_index=True)
+    incremental = RouteOptimizer(origenes, todos, flota, distance_method='osm_local',
+                                 previous_matrices=anterior.get_matrix_snapshot())
+    incremental.create_distance_matrix()
+    # Solo filas (2 nodos nuevos) y columnas de los nuevos, nunca la matriz completa de una vez
+    assert llamadas == [2, len(origenes) + len(todos)]
+
+    completa = RouteOptimizer(origenes, todos, flota, distance_method='osm_local')
+    completa.create_distance_matrix()
+    np.testing.assert_array_equal(incremental.distance_matrix, completa.distance_matrix)
+    np.testing.assert_array_equal(incremental.duration_matrix, completa.duration_matrix)
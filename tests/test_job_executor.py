@@ -0,0 +1,79 @@
+"""
+Ejecutor de trabajos en segundo plano: ciclo de vida, cola, cancelación y purga
+"""
+import threading
+import time
+
+import pytest
+
+from job_executor import JobExecutor, QueueFullError
+
+
+def esperar_estado(executor: JobExecutor, job_id: str, estado: str, timeout: float = 5.0) -> dict:
+    limite = time.time() + timeout
+    while time.time() < limite:
+        status = executor.status(job_id)
+        if status is not None and status['estado'] == estado:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"{job_id} no llegó a '{estado}': {executor.status(job_id)}")
+
+
+def test_ciclo_de_vida_y_cola():
+    executor = JobExecutor(max_trabajos=1, max_cola=1)
+    liberar = threading.Event()
+
+    primero = executor.submit(liberar.wait, 5, etiqueta='primero')
+    esperar_estado(executor, primero, 'ejecutando')
+    segundo = executor.submit(lambda: 42, etiqueta='segundo')
+    assert executor.status(segundo)['posicion_en_cola'] == 1
+    assert executor.stats()['en_cola'] == 1 and executor.stats()['ejecutando'] == 1
+
+    with pytest.raises(QueueFullError):
+        executor.submit(lambda: None)
+    assert executor.pop(primero) is None  # Sigue en ejecución
+
+    liberar.set()
+    esperar_estado(executor, segundo, 'terminado')
+    job = executor.pop(segundo)
+    assert job.resultado == 42 and job.terminado >= job.iniciado
+    assert executor.status(segundo) is None
+
+
+def test_error_y_cancelacion():
+    executor = JobExecutor(max_trabajos=1, max_cola=2)
+    liberar = threading.Event()
+
+    def fallar():
+        raise ValueError('sin rutas')
+
+    bloqueo = executor.submit(liberar.wait, 5)
+    esperar_estado(executor, bloqueo, 'ejecutando')
+    cancelado = executor.submit(lambda: 1)
+    fallido = executor.submit(fallar)
+
+    assert executor.cancel(cancelado)
+    assert not executor.cancel(bloqueo)  # Ya empezó
+    liberar.set()
+
+    status = esperar_estado(executor, fallido, 'error')
+    assert status['error'] == 'sin rutas'
+    assert executor.status(cancelado)['estado'] == 'cancelado'
+
+
+def test_purga_solo_trabajos_finalizados_vencidos():
+    executor = JobExecutor(max_trabajos=1, max_cola=5, retener_resultados_s=0)
+    liberar = threading.Event()
+
+    terminado = executor.submit(lambda: 'listo')
+    esperar_estado(executor, terminado, 'terminado')
+    en_ejecucion = executor.submit(liberar.wait, 5)
+    esperar_estado(executor, en_ejecucion, 'ejecutando')
+
+    # Cada submit purga: se va el terminado sin recoger, no el que sigue corriendo
+    time.sleep(0.01)
+    en_cola = executor.submit(lambda: None)
+    assert executor.status(terminado) is None
+    assert executor.status(en_ejecucion)['estado'] == 'ejecutando'
+    assert executor.status(en_cola)['estado'] == 'en_cola'
+    liberar.set()
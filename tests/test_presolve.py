@@ -0,0 +1,58 @@
+"""
+Preproceso (presolve): cotas de vehículos, recorte de flota y ruptura de simetría
+"""
+import numpy as np
+
+from instancias import generar_instancia
+from presolve import bin_packing_lower_bound, run_presolve
+from route_optimizer import RouteOptimizer
+
+
+def test_cota_bin_packing():
+    # Por capacidad bastan 2 vehículos, pero ninguna pareja de paradas de 60 cabe junta
+    assert bin_packing_lower_bound([60, 60, 60], [100, 100, 100]) == 3
+    assert bin_packing_lower_bound([30, 30, 30], [100, 50, 50]) == 1
+    assert bin_packing_lower_bound([], [100]) == 0
+    assert bin_packing_lower_bound([80, 80], [100]) is None
+
+
+def test_destinos_infactibles():
+    _, destinos, flota = generar_instancia(20, 3, ciudades=['Medellin'])
+    destinos.loc[5, 'demanda'] = 5000
+
+    presolve = run_presolve(destinos, flota)
+
+    assert list(presolve['infactibles']) == [5]
+    assert '5000' in presolve['motivos'][5]
+
+
+def test_recorte_de_flota_conserva_cota_y_margen():
+    _, destinos, flota = generar_instancia(40, 20, ciudades=['Medellin'])
+
+    presolve = run_presolve(destinos, flota)
+    resumen = presolve['resumen']
+
+    cota = resumen['cota_por_deposito']['ORG_01']
+    assert cota == resumen['cota_inferior_vehiculos'] > 0
+    # Margen por defecto: max(2, ceil(20 % de la cota))
+    assert resumen['vehiculos_modelo'] == cota + max(2, int(np.ceil(cota * 0.2))) < len(flota)
+    assert list(presolve['vehiculos_modelo']) == list(range(resumen['vehiculos_modelo']))
+
+    sin_recorte = run_presolve(destinos, flota, config={'podar_flota': False})
+    assert sin_recorte['resumen']['vehiculos_modelo'] == len(flota)
+
+
+def test_simetria_con_grupos_intercalados():
+    origenes, destinos, flota = generar_instancia(30, 4, capacidad=300, ciudades=['Medellin'])
+    # Dos tipos alternados en la flota: A, B, A, B
+    flota['tipo_vehiculo'] = ['A', 'B', 'A', 'B']
+    flota['capacidad'] = [300, 600, 300, 600]
+
+    optimizer = RouteOptimizer(origenes, destinos, flota, config={'separar_regiones': False})
+    solution = optimizer.solve(time_limit_seconds=1)
+
+    # Cada vehículo se liga al anterior de su grupo, aunque no sean contiguos
+    assert optimizer.search_stats['presolve']['pares_simetricos'] == 2
+    usados = {r['vehicle_id'] for r in solution['routes']}
+    for primero, segundo in (('V_ORG_01_01', 'V_ORG_01_03'), ('V_ORG_01_02', 'V_ORG_01_04')):
+        assert segundo not in usados or primero in usados
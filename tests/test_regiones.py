@@ -0,0 +1,57 @@
+"""
+Separación en regiones independientes (parallel_solver)
+"""
+from instancias import generar_instancia
+from parallel_solver import find_independent_regions, regions_to_split, slice_solution, solve_regions, solve_standard
+from route_optimizer import RouteOptimizer
+from solve_monitor import SolveMonitor
+
+
+def dos_ciudades(config=None) -> RouteOptimizer:
+    origenes, destinos, flota = generar_instancia(40, 4, capacidad=1000)
+    return RouteOptimizer(origenes, destinos, flota, config=config)
+
+
+def test_ciudades_lejanas_forman_regiones():
+    grupos = find_independent_regions(dos_ciudades())
+    assert [grupo['origen_indices'] for grupo in grupos] == [[0], [1]]
+
+
+def test_region_sin_capacidad_se_une_a_otra():
+    origenes, destinos, flota = generar_instancia(40, 4, capacidad=1000)
+    # Medellín: 3 pedidos de 60 con 2 vehículos de 100 (200 >= 180, pero se necesitan 3 vehículos)
+    medellin = destinos['ciudad'] == 'Medellin'
+    destinos = destinos[~medellin | (destinos.index < destinos[medellin].index[3])].copy()
+    destinos.loc[destinos['ciudad'] == 'Medellin', 'demanda'] = 60
+    flota = flota[(flota['origen_id'] != 'ORG_01') | (flota.index < 2)].copy()
+    flota.loc[flota['origen_id'] == 'ORG_01', 'capacidad'] = 100
+
+    optimizer = RouteOptimizer(origenes, destinos.reset_index(drop=True), flota.reset_index(drop=True))
+    assert len(find_independent_regions(optimizer)) == 1
+
+
+def test_separar_regiones_es_opcional():
+    assert regions_to_split(dos_ciudades()) == []
+    assert len(regions_to_split(dos_ciudades({'separar_regiones': True}))) == 2
+
+
+def test_con_monitor_no_se_separa():
+    optimizer = dos_ciudades({'separar_regiones': True})
+    solution = solve_standard(optimizer, time_limit_seconds=1, monitor=SolveMonitor(parada_temprana=False))
+    assert 'regiones' not in solution
+
+
+def test_resolver_por_regiones():
+    optimizer = dos_ciudades({'separar_regiones': True})
+    solution = solve_regions(optimizer, time_limit_seconds=1, max_workers=1)
+
+    assert len(solution['regiones']) == 2
+    assert not solution['unassigned']
+    ciudad_de_origen = dict(zip(optimizer.origenes['origen_id'], optimizer.origenes['ciudad']))
+    for route in solution['routes']:
+        assert {loc['ciudad'] for loc in route['route']} == {ciudad_de_origen[route['origen_id']]}
+
+    # El arranque en caliente de cada región solo conserva las rutas de sus vehículos
+    grupo = find_independent_regions(optimizer)[0]
+    rutas = slice_solution(optimizer, grupo, solution)['routes']
+    assert rutas and all(route['origen_id'] == 'ORG_01' for route in rutas)
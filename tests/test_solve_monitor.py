@@ -0,0 +1,51 @@
+"""
+Monitor de búsqueda: cancelación y parada por estancamiento
+"""
+import threading
+import time
+
+from instancias import generar_instancia
+from route_optimizer import RouteOptimizer
+from solve_monitor import SolveMonitor
+
+
+def resolver(monitor: SolveMonitor, tiempo: int = 30):
+    origenes, destinos, flota = generar_instancia(150, 6)
+    optimizer = RouteOptimizer(origenes, destinos, flota)
+    inicio = time.monotonic()
+    solution = optimizer.solve(time_limit_seconds=tiempo, monitor=monitor)
+    return solution, time.monotonic() - inicio
+
+
+def test_estancamiento_sin_solver():
+    monitor = SolveMonitor(parada_temprana=True, ventana_s=1.0, mejora_minima_pct=1.0)
+    assert not monitor._should_stop(5.0)  # Sin soluciones todavía
+
+    monitor.historial = [{'t': 0.0, 'objetivo': 1000}, {'t': 0.5, 'objetivo': 900}]
+    assert not monitor._should_stop(0.8)  # Ventana incompleta
+    assert not monitor._should_stop(1.2)  # 10 % de mejora dentro de la ventana
+    assert monitor._should_stop(2.0)
+    assert monitor.detenido_por == 'estancamiento'
+
+
+def test_cancelar_desde_otro_hilo():
+    monitor = SolveMonitor(parada_temprana=False, intervalo_vigilancia_s=0.1)
+    threading.Timer(1.0, monitor.cancel).start()
+
+    solution, segundos = resolver(monitor)
+
+    assert monitor.detenido_por == 'cancelado'
+    assert segundos < 10
+    assert solution is not None and solution['routes']
+    assert monitor._vigilante is None  # solve() detiene el vigilante al terminar
+
+
+def test_parada_temprana_por_estancamiento():
+    monitor = SolveMonitor(parada_temprana=True, ventana_s=0.5, mejora_minima_pct=50,
+                           intervalo_vigilancia_s=0.1)
+
+    solution, segundos = resolver(monitor)
+
+    assert monitor.detenido_por == 'estancamiento'
+    assert segundos < 10
+    assert solution is not None and monitor.snapshot()['mejor_objetivo'] is not None